@@ -23,6 +23,11 @@ from app.models.achievement import Achievement
 from app.models.work_experience import WorkExperience
 from app.models.education import Education
 from app.models.career_request import CareerRequest
+from app.models.employee_embedding import EmployeeEmbedding
+from app.models.embedding_job import EmbeddingJob
+from app.models.embedding_generation import EmbeddingGeneration
+from app.models.saved_search import SavedSearch, SavedSearchMatch
+from app.models.search_index_change import SearchIndexChange
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
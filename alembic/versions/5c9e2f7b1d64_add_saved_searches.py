@@ -0,0 +1,63 @@
+"""add_saved_searches
+
+Revision ID: 5c9e2f7b1d64
+Revises: d2a7c4e91f38
+Create Date: 2026-10-19 14:05:12.318907
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c9e2f7b1d64'
+down_revision: Union[str, Sequence[str], None] = 'd2a7c4e91f38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('saved_searches',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('query', sa.Text(), nullable=False),
+    sa.Column('parsed_query', sa.JSON(), nullable=False),
+    sa.Column('model', sa.String(), nullable=False),
+    sa.Column('query_embedding', sa.JSON(), nullable=False),
+    sa.Column('threshold', sa.Float(), nullable=False),
+    sa.Column('last_viewed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_saved_searches_id'), 'saved_searches', ['id'], unique=False)
+    op.create_index(op.f('ix_saved_searches_model'), 'saved_searches', ['model'], unique=False)
+    op.create_table('saved_search_matches',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('saved_search_id', sa.Integer(), nullable=False),
+    sa.Column('employee_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('matched_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['employee_id'], ['employees.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['saved_search_id'], ['saved_searches.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('saved_search_id', 'employee_id', name='uq_saved_search_matches_search_employee')
+    )
+    op.create_index(op.f('ix_saved_search_matches_id'), 'saved_search_matches', ['id'], unique=False)
+    op.create_index(op.f('ix_saved_search_matches_employee_id'), 'saved_search_matches', ['employee_id'], unique=False)
+    op.create_index(op.f('ix_saved_search_matches_matched_at'), 'saved_search_matches', ['matched_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_saved_search_matches_matched_at'), table_name='saved_search_matches')
+    op.drop_index(op.f('ix_saved_search_matches_employee_id'), table_name='saved_search_matches')
+    op.drop_index(op.f('ix_saved_search_matches_id'), table_name='saved_search_matches')
+    op.drop_table('saved_search_matches')
+    op.drop_index(op.f('ix_saved_searches_model'), table_name='saved_searches')
+    op.drop_index(op.f('ix_saved_searches_id'), table_name='saved_searches')
+    op.drop_table('saved_searches')
@@ -0,0 +1,45 @@
+"""add_employee_section_embeddings
+
+Revision ID: 6d4b8e1f9a23
+Revises: a3f8d5e20c17
+Create Date: 2026-10-19 16:42:37.512804
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6d4b8e1f9a23'
+down_revision: Union[str, Sequence[str], None] = 'a3f8d5e20c17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('employee_section_embeddings',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('employee_id', sa.Integer(), nullable=False),
+    sa.Column('model', sa.String(), nullable=False),
+    sa.Column('section', sa.String(length=64), nullable=False),
+    sa.Column('embedding', sa.JSON(), nullable=False),
+    sa.Column('section_text', sa.Text(), nullable=False),
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['employee_id'], ['employees.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('employee_id', 'model', 'section', name='uq_employee_section_embeddings_employee_model_section')
+    )
+    op.create_index(op.f('ix_employee_section_embeddings_id'), 'employee_section_embeddings', ['id'], unique=False)
+    op.create_index(op.f('ix_employee_section_embeddings_model'), 'employee_section_embeddings', ['model'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_employee_section_embeddings_model'), table_name='employee_section_embeddings')
+    op.drop_index(op.f('ix_employee_section_embeddings_id'), table_name='employee_section_embeddings')
+    op.drop_table('employee_section_embeddings')
@@ -0,0 +1,28 @@
+"""add_embedding_content_hash
+
+Revision ID: 8e3f1a6b2c45
+Revises: 4b1e2c9d7a10
+Create Date: 2026-10-19 11:02:17.093482
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e3f1a6b2c45'
+down_revision: Union[str, Sequence[str], None] = '4b1e2c9d7a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('employee_embeddings', sa.Column('content_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('employee_embeddings', 'content_hash')
@@ -0,0 +1,83 @@
+"""add_search_index_change_triggers
+
+Revision ID: a3f8d5e20c17
+Revises: 5c9e2f7b1d64
+Create Date: 2026-10-19 16:42:37.104562
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3f8d5e20c17'
+down_revision: Union[str, Sequence[str], None] = '5c9e2f7b1d64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Таблица -> (колонка с ID сотрудника, события). У employees изменения XP
+# и прочих полей, не влияющих на поиск, уведомлений не порождают.
+TRIGGER_TABLES = {
+    'employees': (
+        'id',
+        'INSERT OR DELETE OR UPDATE OF first_name, last_name, position, bio, department, experience_years, level'
+    ),
+    'employee_skills': ('employee_id', 'INSERT OR UPDATE OR DELETE'),
+    'employee_embeddings': ('employee_id', 'INSERT OR UPDATE OR DELETE'),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('search_index_changes',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('employee_id', sa.Integer(), nullable=False),
+    sa.Column('source', sa.String(length=32), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_search_index_changes_created_at'), 'search_index_changes', ['created_at'], unique=False)
+    
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notify_search_index_change() RETURNS trigger AS $$
+        DECLARE
+            changed_employee_id INTEGER;
+            change_id BIGINT;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                EXECUTE format('SELECT ($1).%I', TG_ARGV[0]) USING OLD INTO changed_employee_id;
+            ELSE
+                EXECUTE format('SELECT ($1).%I', TG_ARGV[0]) USING NEW INTO changed_employee_id;
+            END IF;
+            
+            INSERT INTO search_index_changes (employee_id, source)
+            VALUES (changed_employee_id, TG_TABLE_NAME)
+            RETURNING id INTO change_id;
+            
+            PERFORM pg_notify(
+                'search_index_changes',
+                json_build_object('id', change_id, 'employee_id', changed_employee_id, 'source', TG_TABLE_NAME)::text
+            );
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    for table, (column, events) in TRIGGER_TABLES.items():
+        op.execute(f"""
+            CREATE TRIGGER {table}_search_index_change
+            AFTER {events} ON {table}
+            FOR EACH ROW EXECUTE FUNCTION notify_search_index_change('{column}')
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TRIGGER_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_search_index_change ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS notify_search_index_change()")
+    
+    op.drop_index(op.f('ix_search_index_changes_created_at'), table_name='search_index_changes')
+    op.drop_table('search_index_changes')
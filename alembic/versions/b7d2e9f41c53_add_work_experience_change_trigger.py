@@ -0,0 +1,32 @@
+"""add_work_experience_change_trigger
+
+Revision ID: b7d2e9f41c53
+Revises: f3c8a1d5e706
+Create Date: 2026-10-19 22:05:43.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d2e9f41c53'
+down_revision: Union[str, Sequence[str], None] = 'f3c8a1d5e706'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Опыт работы входит в текст профиля: слушатели сбрасывают его секцию на всех узлах
+    op.execute("""
+        CREATE TRIGGER work_experiences_search_index_change
+        AFTER INSERT OR UPDATE OR DELETE ON work_experiences
+        FOR EACH ROW EXECUTE FUNCTION notify_search_index_change('employee_id')
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS work_experiences_search_index_change ON work_experiences")
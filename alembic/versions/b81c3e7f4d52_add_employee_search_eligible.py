@@ -0,0 +1,111 @@
+"""add_employee_search_eligible
+
+Revision ID: b81c3e7f4d52
+Revises: 6d4b8e1f9a23
+Create Date: 2026-10-19 17:20:05.846213
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b81c3e7f4d52'
+down_revision: Union[str, Sequence[str], None] = '6d4b8e1f9a23'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Поля employees, от которых зависит допуск к поиску
+ELIGIBILITY_COLUMNS = 'first_name, last_name, position, bio, is_active'
+
+# Уведомления индекса поиска: прежний набор полей плюс is_active и сам флаг
+SEARCH_INDEX_EVENTS_BEFORE = 'INSERT OR DELETE OR UPDATE OF first_name, last_name, position, bio, department, experience_years, level'
+SEARCH_INDEX_EVENTS = (
+    'INSERT OR DELETE OR UPDATE OF first_name, last_name, position, bio, department, experience_years, level, '
+    'is_active, search_eligible'
+)
+
+
+def _recreate_search_index_trigger(events: str) -> None:
+    op.execute("DROP TRIGGER IF EXISTS employees_search_index_change ON employees")
+    op.execute(f"""
+        CREATE TRIGGER employees_search_index_change
+        AFTER {events} ON employees
+        FOR EACH ROW EXECUTE FUNCTION notify_search_index_change('id')
+    """)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('employees', sa.Column('search_eligible', sa.Boolean(), server_default=sa.text('false'), nullable=False))
+    
+    # Заполненный профиль, хотя бы один навык и активная учетная запись
+    op.execute("""
+        CREATE OR REPLACE FUNCTION employee_search_eligible(e employees) RETURNS boolean AS $$
+            SELECT COALESCE(e.is_active, TRUE)
+                AND COALESCE(e.first_name, '') <> ''
+                AND COALESCE(e.last_name, '') <> ''
+                AND COALESCE(e.position, '') <> ''
+                AND COALESCE(e.bio, '') <> ''
+                AND EXISTS (SELECT 1 FROM employee_skills s WHERE s.employee_id = e.id)
+        $$ LANGUAGE sql STABLE
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION employees_set_search_eligible() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_eligible := employee_search_eligible(NEW);
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute(f"""
+        CREATE TRIGGER employees_search_eligible
+        BEFORE INSERT OR UPDATE OF {ELIGIBILITY_COLUMNS} ON employees
+        FOR EACH ROW EXECUTE FUNCTION employees_set_search_eligible()
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION employee_skills_refresh_search_eligible() RETURNS trigger AS $$
+        DECLARE
+            changed_employee_id INTEGER;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                changed_employee_id := OLD.employee_id;
+            ELSE
+                changed_employee_id := NEW.employee_id;
+            END IF;
+            
+            UPDATE employees e
+            SET search_eligible = employee_search_eligible(e)
+            WHERE e.id = changed_employee_id
+              AND e.search_eligible IS DISTINCT FROM employee_search_eligible(e);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER employee_skills_search_eligible
+        AFTER INSERT OR UPDATE OR DELETE ON employee_skills
+        FOR EACH ROW EXECUTE FUNCTION employee_skills_refresh_search_eligible()
+    """)
+    
+    op.execute("UPDATE employees e SET search_eligible = employee_search_eligible(e)")
+    op.create_index(
+        'ix_employees_search_eligible', 'employees', ['id'], unique=False,
+        postgresql_where=sa.text('search_eligible')
+    )
+    _recreate_search_index_trigger(SEARCH_INDEX_EVENTS)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _recreate_search_index_trigger(SEARCH_INDEX_EVENTS_BEFORE)
+    op.drop_index('ix_employees_search_eligible', table_name='employees', postgresql_where=sa.text('search_eligible'))
+    op.execute("DROP TRIGGER IF EXISTS employee_skills_search_eligible ON employee_skills")
+    op.execute("DROP FUNCTION IF EXISTS employee_skills_refresh_search_eligible()")
+    op.execute("DROP TRIGGER IF EXISTS employees_search_eligible ON employees")
+    op.execute("DROP FUNCTION IF EXISTS employees_set_search_eligible()")
+    op.execute("DROP FUNCTION IF EXISTS employee_search_eligible(employees)")
+    op.drop_column('employees', 'search_eligible')
@@ -0,0 +1,142 @@
+"""add_search_documents
+
+Revision ID: c4e9a2d61b85
+Revises: b81c3e7f4d52
+Create Date: 2026-10-19 18:03:51.297430
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e9a2d61b85'
+down_revision: Union[str, Sequence[str], None] = 'b81c3e7f4d52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Поля employees, попадающие в документ поиска
+DOCUMENT_COLUMNS = (
+    'first_name, last_name, middle_name, position, department, experience_years, level, xp_points, search_eligible'
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('search_documents',
+    sa.Column('employee_id', sa.Integer(), nullable=False),
+    sa.Column('full_name', sa.String(), nullable=False),
+    sa.Column('position', sa.String(), nullable=True),
+    sa.Column('department', sa.String(), nullable=True),
+    sa.Column('experience_years', sa.Integer(), nullable=False),
+    sa.Column('grade', sa.String(length=16), nullable=False),
+    sa.Column('level', sa.Integer(), nullable=False),
+    sa.Column('xp_points', sa.Integer(), nullable=False),
+    sa.Column('skills', postgresql.ARRAY(sa.String()), server_default='{}', nullable=False),
+    sa.Column('search_eligible', sa.Boolean(), server_default='false', nullable=False),
+    sa.Column('model', sa.String(), nullable=True),
+    sa.Column('embedding', sa.LargeBinary(), nullable=True),
+    sa.Column('content_hash', sa.String(length=64), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['employee_id'], ['employees.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('employee_id')
+    )
+    op.create_index(
+        'ix_search_documents_search_eligible', 'search_documents', ['employee_id'], unique=False,
+        postgresql_where=sa.text('search_eligible')
+    )
+    
+    # Пересборка полей документа (эмбеддинг не трогается)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION refresh_search_document(target_employee_id INTEGER) RETURNS void AS $$
+            INSERT INTO search_documents AS d (
+                employee_id, full_name, position, department, experience_years, grade,
+                level, xp_points, skills, search_eligible, updated_at
+            )
+            SELECT
+                e.id,
+                concat_ws(' ', e.first_name, NULLIF(e.middle_name, ''), e.last_name),
+                e.position,
+                e.department,
+                COALESCE(e.experience_years, 0),
+                CASE
+                    WHEN COALESCE(e.experience_years, 0) < 2 THEN 'junior'
+                    WHEN e.experience_years < 4 THEN 'middle'
+                    WHEN e.experience_years < 6 THEN 'senior'
+                    ELSE 'lead'
+                END,
+                COALESCE(e.level, 1),
+                COALESCE(e.xp_points, 0),
+                ARRAY(
+                    SELECT s.name FROM employee_skills es
+                    JOIN skills s ON s.id = es.skill_id
+                    WHERE es.employee_id = e.id
+                    ORDER BY s.name
+                ),
+                e.search_eligible,
+                now()
+            FROM employees e
+            WHERE e.id = target_employee_id
+            ON CONFLICT (employee_id) DO UPDATE SET
+                full_name = EXCLUDED.full_name,
+                position = EXCLUDED.position,
+                department = EXCLUDED.department,
+                experience_years = EXCLUDED.experience_years,
+                grade = EXCLUDED.grade,
+                level = EXCLUDED.level,
+                xp_points = EXCLUDED.xp_points,
+                skills = EXCLUDED.skills,
+                search_eligible = EXCLUDED.search_eligible,
+                updated_at = EXCLUDED.updated_at
+        $$ LANGUAGE sql
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION search_document_change() RETURNS trigger AS $$
+        BEGIN
+            IF TG_TABLE_NAME = 'employees' THEN
+                PERFORM refresh_search_document(NEW.id);
+            ELSIF TG_TABLE_NAME = 'skills' THEN
+                PERFORM refresh_search_document(es.employee_id)
+                FROM employee_skills es WHERE es.skill_id = NEW.id;
+            ELSIF TG_OP = 'DELETE' THEN
+                PERFORM refresh_search_document(OLD.employee_id);
+            ELSE
+                PERFORM refresh_search_document(NEW.employee_id);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute(f"""
+        CREATE TRIGGER employees_search_document
+        AFTER INSERT OR UPDATE OF {DOCUMENT_COLUMNS} ON employees
+        FOR EACH ROW EXECUTE FUNCTION search_document_change()
+    """)
+    op.execute("""
+        CREATE TRIGGER employee_skills_search_document
+        AFTER INSERT OR UPDATE OR DELETE ON employee_skills
+        FOR EACH ROW EXECUTE FUNCTION search_document_change()
+    """)
+    op.execute("""
+        CREATE TRIGGER skills_search_document
+        AFTER UPDATE OF name ON skills
+        FOR EACH ROW EXECUTE FUNCTION search_document_change()
+    """)
+    
+    # Эмбеддинги заполняются командой python -m app.services.search_documents rebuild
+    op.execute("SELECT refresh_search_document(id) FROM employees")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS skills_search_document ON skills")
+    op.execute("DROP TRIGGER IF EXISTS employee_skills_search_document ON employee_skills")
+    op.execute("DROP TRIGGER IF EXISTS employees_search_document ON employees")
+    op.execute("DROP FUNCTION IF EXISTS search_document_change()")
+    op.execute("DROP FUNCTION IF EXISTS refresh_search_document(INTEGER)")
+    op.drop_index('ix_search_documents_search_eligible', table_name='search_documents', postgresql_where=sa.text('search_eligible'))
+    op.drop_table('search_documents')
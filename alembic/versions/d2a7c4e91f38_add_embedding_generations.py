@@ -0,0 +1,66 @@
+"""add_embedding_generations
+
+Revision ID: d2a7c4e91f38
+Revises: 8e3f1a6b2c45
+Create Date: 2026-10-19 12:26:54.771530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2a7c4e91f38'
+down_revision: Union[str, Sequence[str], None] = '8e3f1a6b2c45'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('embedding_generations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('model', sa.String(), nullable=False),
+    sa.Column('status', sa.String(length=16), server_default='building', nullable=False),
+    sa.Column('total', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('processed', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('embedded', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('started_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('activated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('model')
+    )
+    op.create_index(op.f('ix_embedding_generations_id'), 'embedding_generations', ['id'], unique=False)
+    
+    # Существующие эмбеддинги построены bge-m3
+    op.add_column('employee_embeddings', sa.Column('model', sa.String(), server_default='bge-m3', nullable=False))
+    op.alter_column('employee_embeddings', 'model', server_default=None)
+    op.drop_constraint('employee_embeddings_employee_id_key', 'employee_embeddings', type_='unique')
+    op.create_unique_constraint('uq_employee_embeddings_employee_model', 'employee_embeddings', ['employee_id', 'model'])
+    op.create_index(op.f('ix_employee_embeddings_model'), 'employee_embeddings', ['model'], unique=False)
+    
+    op.execute("""
+        INSERT INTO embedding_generations (model, status, total, processed, embedded, finished_at, activated_at)
+        SELECT 'bge-m3', 'active', count(*), count(*), count(*), now(), now()
+        FROM employee_embeddings
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("""
+        DELETE FROM employee_embeddings
+        WHERE model <> coalesce((SELECT model FROM embedding_generations WHERE status = 'active'), 'bge-m3')
+    """)
+    op.drop_index(op.f('ix_employee_embeddings_model'), table_name='employee_embeddings')
+    op.drop_constraint('uq_employee_embeddings_employee_model', 'employee_embeddings', type_='unique')
+    op.create_unique_constraint('employee_embeddings_employee_id_key', 'employee_embeddings', ['employee_id'])
+    op.drop_column('employee_embeddings', 'model')
+    
+    op.drop_index(op.f('ix_embedding_generations_id'), table_name='embedding_generations')
+    op.drop_table('embedding_generations')
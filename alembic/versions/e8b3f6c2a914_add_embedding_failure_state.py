@@ -0,0 +1,57 @@
+"""add_embedding_failure_state
+
+Revision ID: e8b3f6c2a914
+Revises: c4e9a2d61b85
+Create Date: 2026-10-19 19:12:40.518362
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8b3f6c2a914'
+down_revision: Union[str, Sequence[str], None] = 'c4e9a2d61b85'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('employee_embeddings', sa.Column('status', sa.String(length=16), server_default='ready', nullable=False))
+    op.add_column('employee_embeddings', sa.Column('attempts', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('employee_embeddings', sa.Column('retry_after', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('employee_embeddings', sa.Column('last_error', sa.Text(), nullable=True))
+    op.alter_column('employee_embeddings', 'embedding', existing_type=sa.JSON(), nullable=True)
+    
+    # Сохраненные раньше пустые векторы - это неудачные расчеты: отдаем их воркеру восстановления
+    op.execute(
+        "UPDATE employee_embeddings "
+        "SET status = 'failed', embedding = NULL, content_hash = NULL, retry_after = now(), "
+        "last_error = 'empty embedding' "
+        "WHERE json_typeof(embedding) = 'array' AND json_array_length(embedding) = 0"
+    )
+    op.create_index(
+        'ix_employee_embeddings_failed_retry_after',
+        'employee_embeddings',
+        ['retry_after'],
+        unique=False,
+        postgresql_where=sa.text("status = 'failed'")
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        'ix_employee_embeddings_failed_retry_after',
+        table_name='employee_embeddings',
+        postgresql_where=sa.text("status = 'failed'")
+    )
+    op.execute("UPDATE employee_embeddings SET embedding = '[]'::json WHERE embedding IS NULL")
+    op.alter_column('employee_embeddings', 'embedding', existing_type=sa.JSON(), nullable=False)
+    op.drop_column('employee_embeddings', 'last_error')
+    op.drop_column('employee_embeddings', 'retry_after')
+    op.drop_column('employee_embeddings', 'attempts')
+    op.drop_column('employee_embeddings', 'status')
@@ -0,0 +1,37 @@
+"""add_faceted_searches
+
+Revision ID: f3c8a1d5e706
+Revises: e8b3f6c2a914
+Create Date: 2026-10-19 20:31:08.742113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c8a1d5e706'
+down_revision: Union[str, Sequence[str], None] = 'e8b3f6c2a914'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('faceted_searches',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('query', sa.Text(), nullable=False),
+    sa.Column('ranked', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_faceted_searches_expires_at'), 'faceted_searches', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_faceted_searches_expires_at'), table_name='faceted_searches')
+    op.drop_table('faceted_searches')
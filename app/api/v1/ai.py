@@ -1,7 +1,7 @@
 """
 API роутер для ИИ сервиса
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from typing import List
 from sqlalchemy import select
 
@@ -10,6 +10,7 @@ from app.core.dependencies import get_current_employee
 from app.schemas.ai import CareerRequestCreate, CareerRecommendation, CareerRequest, AssistantMessageCreate, AssistantMessage
 from app.services.ai_assistant import AIAssistantService
 from app.services.gamification import GamificationService
+from app.services.query_log import log_query
 from app.models.employee import Employee
 from app.models.career_request import CareerRequest as CareerRequestModel
 
@@ -19,16 +20,21 @@ router = APIRouter()
 @router.post("/career-recommendation", response_model=CareerRecommendation)
 async def get_career_recommendation(
     request_data: CareerRequestCreate,
+    request: Request,
     current_employee: Employee = Depends(get_current_employee),
     ai_assistant_service: AIAssistantService = Depends(get_ai_assistant_service),
     gamification_service: GamificationService = Depends(get_gamification_service)
 ):
     """Получить карьерные рекомендации от ИИ"""
     try:
-        recommendations = await ai_assistant_service.get_career_recommendations(
-            current_employee, 
-            request_data.request_text
-        )
+        async with log_query(
+            request, "ai.career_recommendation",
+            body={"request_text": request_data.request_text}, user_id=current_employee.id
+        ):
+            recommendations = await ai_assistant_service.get_career_recommendations(
+                current_employee, 
+                request_data.request_text
+            )
         
         # Сохраняем запрос в базу данных
         career_request = CareerRequestModel(
@@ -69,12 +75,14 @@ async def get_career_requests(
 
 @router.get("/assistant/welcome", response_model=AssistantMessage)
 async def get_assistant_welcome(
+    request: Request,
     current_employee: Employee = Depends(get_current_employee),
     ai_assistant_service: AIAssistantService = Depends(get_ai_assistant_service)
 ):
     """Получить приветственное сообщение от AI-ассистента"""
     try:
-        welcome_message = await ai_assistant_service.get_welcome_message(current_employee)
+        async with log_query(request, "ai.assistant_welcome", user_id=current_employee.id):
+            welcome_message = await ai_assistant_service.get_welcome_message(current_employee)
         return AssistantMessage(message=welcome_message, is_welcome=True)
     except Exception as e:
         raise HTTPException(
@@ -86,15 +94,20 @@ async def get_assistant_welcome(
 @router.post("/assistant/chat", response_model=AssistantMessage)
 async def chat_with_assistant(
     message_data: AssistantMessageCreate,
+    request: Request,
     current_employee: Employee = Depends(get_current_employee),
     ai_assistant_service: AIAssistantService = Depends(get_ai_assistant_service)
 ):
     """Отправить сообщение AI-ассистенту"""
     try:
-        response = await ai_assistant_service.get_assistant_response(
-            current_employee, 
-            message_data.message
-        )
+        async with log_query(
+            request, "ai.assistant_chat",
+            body={"message": message_data.message}, user_id=current_employee.id
+        ):
+            response = await ai_assistant_service.get_assistant_response(
+                current_employee, 
+                message_data.message
+            )
         return AssistantMessage(message=response, is_welcome=False)
     except Exception as e:
         raise HTTPException(
@@ -1,12 +1,23 @@
 """
 API роутер для HR функций
 """
-from fastapi import APIRouter, Depends
-from typing import List, Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from typing import List, Dict, Any, Optional
 
 from app.api.deps import get_hr_service
 from app.services.hr import HRService
+from app.services.query_log import log_query
 from app.models.employee import Employee
+from app.schemas.saved_search import SavedSearchCreate
+from app.services.skill_query import SkillQuerySyntaxError
+from app.utils.exceptions import (
+    AIServiceError,
+    EmployeeNotFoundError,
+    SearchOverloadedError,
+    ai_service_exception,
+    employee_not_found_exception,
+    search_overloaded_exception
+)
 
 router = APIRouter()
 
@@ -14,10 +25,137 @@ router = APIRouter()
 @router.get("/search", response_model=List[Dict[str, Any]])
 async def search_employees(
     query: str,
+    request: Request,
     hr_service: HRService = Depends(get_hr_service)
 ):
     """Умный поиск сотрудников с ранжированием"""
-    return await hr_service.search_employees(query)
+    try:
+        async with log_query(request, "hr.search", params={"query": query}) as entry:
+            results = await hr_service.search_employees(query)
+            entry.set_results([item["id"] for item in results])
+        return results
+    except SearchOverloadedError as e:
+        raise search_overloaded_exception(str(e))
+
+
+@router.get("/search/faceted", response_model=Dict[str, Any])
+async def faceted_search_employees(
+    query: Optional[str] = None,
+    search_id: Optional[str] = None,
+    department: List[str] = Query(default=[]),
+    grade: List[str] = Query(default=[]),
+    level: List[str] = Query(default=[]),
+    skill: List[str] = Query(default=[]),
+    limit: int = 20,
+    hr_service: HRService = Depends(get_hr_service)
+):
+    """Поиск с фасетными счетчиками; search_id позволяет уточнять фильтры без повторного поиска"""
+    filters = {
+        "department": department,
+        "grade": grade,
+        "level": level,
+        "skill": skill
+    }
+    try:
+        return await hr_service.faceted_search(query, filters, search_id, limit)
+    except SearchOverloadedError as e:
+        raise search_overloaded_exception(str(e))
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.get("/search/skills", response_model=Dict[str, Any])
+async def skill_query_search(
+    q: str,
+    rank: bool = False,
+    limit: int = 20,
+    hr_service: HRService = Depends(get_hr_service)
+):
+    """Поиск по булеву запросу: (Python OR Go) AND Kubernetes AND NOT 1C, dept:..., exp:3..7.
+
+    rank=true - найденные сотрудники ранжируются умным поиском.
+    """
+    try:
+        return await hr_service.skill_query_search(q, rank, limit)
+    except SearchOverloadedError as e:
+        raise search_overloaded_exception(str(e))
+    except SkillQuerySyntaxError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Ошибка в запросе: {e}"
+        )
+
+
+@router.post("/saved-searches", response_model=Dict[str, Any], status_code=status.HTTP_201_CREATED)
+async def create_saved_search(
+    search_data: SavedSearchCreate,
+    hr_service: HRService = Depends(get_hr_service)
+):
+    """Сохранить поиск: новые и измененные профили будут сопоставляться с ним автоматически"""
+    try:
+        return await hr_service.create_saved_search(search_data.name, search_data.query, search_data.threshold)
+    except AIServiceError as e:
+        raise ai_service_exception(str(e))
+
+
+@router.get("/saved-searches", response_model=List[Dict[str, Any]])
+async def get_saved_searches(
+    hr_service: HRService = Depends(get_hr_service)
+):
+    """Получить сохраненные поиски с количеством новых совпадений"""
+    return await hr_service.get_saved_searches()
+
+
+@router.get("/saved-searches/{saved_search_id}/matches", response_model=Dict[str, Any])
+async def get_saved_search_matches(
+    saved_search_id: int,
+    only_new: bool = True,
+    hr_service: HRService = Depends(get_hr_service)
+):
+    """Совпадения сохраненного поиска с последнего просмотра (only_new=false - все)"""
+    result = await hr_service.get_saved_search_matches(saved_search_id, only_new)
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Сохраненный поиск не найден"
+        )
+    return result
+
+
+@router.delete("/saved-searches/{saved_search_id}")
+async def delete_saved_search(
+    saved_search_id: int,
+    hr_service: HRService = Depends(get_hr_service)
+):
+    """Удалить сохраненный поиск"""
+    if not await hr_service.delete_saved_search(saved_search_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Сохраненный поиск не найден"
+        )
+    return {"message": "Сохраненный поиск удален"}
+
+
+@router.get("/employees/{employee_id}/similar", response_model=List[Dict[str, Any]])
+async def get_similar_employees(
+    employee_id: int,
+    limit: int = 10,
+    hr_service: HRService = Depends(get_hr_service)
+):
+    """Сотрудники, похожие на заданного (по его сохраненному эмбеддингу, без вызова SciBox)"""
+    try:
+        result = await hr_service.find_similar_employees(employee_id, limit)
+    except EmployeeNotFoundError:
+        raise employee_not_found_exception()
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Эмбеддинг профиля сотрудника еще не построен"
+        )
+    return result
 
 
 @router.get("/employees", response_model=List[Dict[str, Any]])
@@ -35,7 +173,7 @@ async def get_all_employees(
             "position": emp.position,
             "department": emp.department,
             "experience_years": emp.experience_years,
-            "skills": [skill.name for skill in emp.skills],
+            "skills": list(emp.skills),
             "level": emp.level,
             "xp_points": emp.xp_points
         }
@@ -51,6 +189,22 @@ async def get_employee_analytics(
     return await hr_service.get_employee_analytics()
 
 
+@router.get("/embeddings/generations", response_model=List[Dict[str, Any]])
+async def get_embedding_generations(
+    hr_service: HRService = Depends(get_hr_service)
+):
+    """Получить прогресс построения поколений эмбеддингов"""
+    return await hr_service.get_embedding_generations()
+
+
+@router.get("/embeddings/states", response_model=List[Dict[str, Any]])
+async def get_embedding_states(
+    hr_service: HRService = Depends(get_hr_service)
+):
+    """Получить число эмбеддингов по состояниям: посчитанные и ожидающие повтора после ошибки"""
+    return await hr_service.get_embedding_states()
+
+
 @router.post("/create-skills")
 async def create_skills(
     hr_service: HRService = Depends(get_hr_service)
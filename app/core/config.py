@@ -24,6 +24,108 @@ class Settings(BaseSettings):
     # AI сервис
     scibox_api_key: str = ""
     scibox_base_url: str = "https://llm.t1v.scibox.tech/v1"
+    # Модель по умолчанию, пока в embedding_generations нет активного поколения
+    embedding_model: str = "bge-m3"
+    embedding_model_cache_ttl_seconds: float = 30.0
+    embedding_batch_size: int = 32
+    profile_document_cache_size: int = 20000
+    
+    # Провайдер эмбеддингов для поиска: remote (SciBox), local (scikit-learn)
+    # или hybrid (локальный первый этап + пересчет шорт-листа через SciBox)
+    embedding_provider: str = "remote"
+    local_embedding_path: str = "data/local_embedding.joblib"
+    local_embedding_dimensions: int = 256
+    local_embedding_max_features: int = 32768
+    hybrid_shortlist_size: int = 100
+    search_embedding_timeout_seconds: float = 5.0
+    
+    # Локальный разбор запросов: LLM вызывается только при низкой уверенности
+    query_parser_confidence_threshold: float = 0.6
+    skill_catalog_ttl_seconds: float = 300.0
+    
+    # Исправление опечаток в запросах по справочнику навыков и должностей
+    spell_correction_enabled: bool = True
+    spell_correction_max_distance: int = 2
+    spell_correction_prefix_length: int = 7
+    
+    # Граф связанности навыков для расширения запроса без LLM
+    skill_graph_enabled: bool = True
+    skill_graph_path: str = "data/skill_graph.npz"
+    skill_graph_neighbours: int = 20
+    skill_graph_min_cooccurrence: int = 2
+    skill_graph_expansion_limit: int = 5
+    skill_graph_min_weight: float = 0.2
+    
+    # Индекс поиска и фасеты
+    search_index_ttl_seconds: float = 60.0
+    # Кандидатов фасетного поиска, если в запросе нет навыков из индекса
+    faceted_search_candidates: int = 200
+    faceted_search_cache_ttl_seconds: float = 600.0
+    
+    # Отдельные векторы секций профиля: место работы, био, навыки
+    section_embeddings_enabled: bool = False
+    section_score_mode: str = "max"  # max | softmax
+    section_softmax_temperature: float = 0.05
+    
+    # Сохраненные поиски
+    saved_search_default_threshold: float = 0.6
+    saved_search_cache_ttl_seconds: float = 60.0
+    
+    # Проекция эмбеддингов для первого этапа поиска
+    vector_projection_enabled: bool = True
+    vector_projection_dir: str = "data/projections"
+    vector_projection_dimensions: int = 256
+    vector_projection_shortlist_size: int = 200
+    vector_projection_cache_ttl_seconds: float = 300.0
+    
+    # Пул потоков для ранжирования (0 - выполнять в event loop)
+    cpu_pool_workers: int = 2
+    cpu_pool_min_size: int = 2000
+    cpu_pool_max_queue: int = 16
+    cpu_pool_queue_timeout_seconds: float = 2.0
+    
+    # Шардированный перебор первого этапа в отдельных процессах (0 - выключено)
+    search_shard_count: int = 4
+    search_shard_min_rows: int = 50000
+    
+    # Снимок индекса поиска на диске (общий для воркеров через mmap)
+    index_snapshot_enabled: bool = True
+    index_snapshot_dir: str = "data/index_snapshots"
+    
+    # Уведомления об изменениях индекса поиска между узлами (LISTEN/NOTIFY)
+    search_index_listener_enabled: bool = True
+    search_index_listener_batch_delay_seconds: float = 0.2
+    search_index_listener_flush_seconds: float = 5.0
+    search_index_listener_reconnect_seconds: float = 5.0
+    search_index_listener_catch_up_limit: int = 10000
+    search_index_change_retention_seconds: float = 86400.0
+    
+    # Журнал запросов поиска и ИИ для воспроизведения нагрузки (JSONL)
+    query_log_enabled: bool = False
+    query_log_dir: str = "data/query_log"
+    query_log_sample_rate: float = 1.0
+    query_log_batch_size: int = 200
+    query_log_flush_seconds: float = 1.0
+    query_log_max_queue: int = 10000
+    query_log_salt: str = ""
+    
+    # Очередь пересчета эмбеддингов
+    embedding_worker_enabled: bool = True
+    embedding_worker_count: int = 1
+    embedding_worker_batch_size: int = 10
+    embedding_worker_poll_interval: float = 2.0
+    embedding_job_debounce_seconds: float = 10.0
+    embedding_job_lease_seconds: float = 300.0
+    embedding_job_max_attempts: int = 5
+    embedding_job_retry_base_seconds: float = 30.0
+    
+    # Неудачные расчеты эмбеддингов: задержка повтора и воркер восстановления
+    embedding_failure_retry_base_seconds: float = 60.0
+    embedding_failure_retry_max_seconds: float = 3600.0
+    embedding_repair_enabled: bool = True
+    embedding_repair_batch_size: int = 50
+    embedding_repair_poll_interval: float = 30.0
+    embedding_repair_lease_seconds: float = 300.0
     
     # CORS
     cors_origins: list = ["*"]
@@ -1,6 +1,8 @@
 """
 Главный файл приложения HR Consultant
 """
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -9,15 +11,50 @@ from fastapi.responses import HTMLResponse
 from app.core.config import settings
 from app.core.database import Base
 from app.api.v1 import auth, employees, gamification, ai, hr
+from app.services.embedding_queue import start_embedding_workers, stop_embedding_workers
+from app.services.embedding_repair import start_embedding_repair_worker, stop_embedding_repair_worker
+from app.services.search_shards import shutdown_search_shards
+from app.services.cpu_pool import start_cpu_pool, shutdown_cpu_pool, get_cpu_pool_stats
+from app.services.search_index_listener import start_search_index_listener, stop_search_index_listener
+from app.services.query_log import start_query_log, stop_query_log, get_query_log_stats
 
 # Импортируем все модели для правильной инициализации
 from app.models import *
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Запуск и остановка фоновых воркеров, слушателя изменений, пулов поиска и журнала запросов"""
+    start_cpu_pool()
+    start_query_log()
+    embedding_workers = []
+    if settings.embedding_worker_enabled:
+        embedding_workers = start_embedding_workers()
+    repair_worker = None
+    if settings.embedding_repair_enabled:
+        repair_worker = start_embedding_repair_worker()
+    index_listener = None
+    if settings.search_index_listener_enabled:
+        index_listener = start_search_index_listener()
+    try:
+        yield
+    finally:
+        if index_listener is not None:
+            await stop_search_index_listener(*index_listener)
+        await stop_embedding_workers(embedding_workers)
+        if repair_worker is not None:
+            await stop_embedding_repair_worker(*repair_worker)
+        shutdown_search_shards()
+        shutdown_cpu_pool()
+        await stop_query_log()
+
+
 # Создание приложения
 app = FastAPI(
     title=settings.app_name,
     version=settings.app_version,
-    description="Персональный ИИ-консультант для карьерного развития сотрудников"
+    description="Персональный ИИ-консультант для карьерного развития сотрудников",
+    lifespan=lifespan
 )
 
 # CORS настройки
@@ -62,7 +99,9 @@ async def health_check():
     return {
         "status": "ok", 
         "message": f"{settings.app_name} API is running",
-        "version": settings.app_version
+        "version": settings.app_version,
+        "cpu_pool": get_cpu_pool_stats(),
+        "query_log": get_query_log_stats()
     }
 
 
@@ -6,6 +6,13 @@ from .work_experience import WorkExperience
 from .education import Education
 from .career_request import CareerRequest
 from .employee_embedding import EmployeeEmbedding
+from .employee_section_embedding import EmployeeSectionEmbedding
+from .embedding_job import EmbeddingJob
+from .embedding_generation import EmbeddingGeneration
+from .saved_search import SavedSearch, SavedSearchMatch
+from .search_index_change import SearchIndexChange
+from .search_document import SearchDocument
+from .faceted_search import FacetedSearch
 
 __all__ = [
     "Employee",
@@ -14,5 +21,13 @@ __all__ = [
     "WorkExperience",
     "Education",
     "CareerRequest",
-    "EmployeeEmbedding"
+    "EmployeeEmbedding",
+    "EmployeeSectionEmbedding",
+    "EmbeddingJob",
+    "EmbeddingGeneration",
+    "SavedSearch",
+    "SavedSearchMatch",
+    "SearchIndexChange",
+    "SearchDocument",
+    "FacetedSearch"
 ]
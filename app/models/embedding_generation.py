@@ -0,0 +1,32 @@
+"""
+Модель поколений эмбеддингов (версий модели эмбеддингов)
+"""
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class EmbeddingGeneration(Base):
+    """Поколение эмбеддингов, построенное одной моделью.
+
+    Поиск читает только активное поколение; новое поколение строится
+    в статусе building, затем атомарно переключается в active.
+    """
+    __tablename__ = "embedding_generations"
+
+    STATUS_BUILDING = "building"
+    STATUS_ACTIVE = "active"
+    STATUS_RETIRED = "retired"
+
+    id = Column(Integer, primary_key=True, index=True)
+    model = Column(String, nullable=False, unique=True)
+    status = Column(String(16), nullable=False, default=STATUS_BUILDING, server_default=STATUS_BUILDING)
+    total = Column(Integer, nullable=False, default=0, server_default="0")
+    processed = Column(Integer, nullable=False, default=0, server_default="0")
+    embedded = Column(Integer, nullable=False, default=0, server_default="0")
+    last_error = Column(Text, nullable=True)
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    activated_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
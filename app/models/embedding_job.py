@@ -0,0 +1,37 @@
+"""
+Модель очереди задач на пересчет эмбеддингов
+"""
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class EmbeddingJob(Base):
+    """Задача на пересчет эмбеддинга сотрудника.
+
+    На каждого сотрудника хранится не более одной задачи: повторные
+    постановки в очередь только сдвигают run_after (дебаунс) и увеличивают
+    generation, поэтому серия изменений профиля схлопывается в один пересчет.
+    """
+    __tablename__ = "embedding_jobs"
+
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_FAILED = "failed"
+
+    id = Column(Integer, primary_key=True, index=True)
+    employee_id = Column(Integer, ForeignKey("employees.id", ondelete="CASCADE"), nullable=False, unique=True)
+    status = Column(String(16), nullable=False, default=STATUS_PENDING, server_default=STATUS_PENDING)
+    # Номер постановки в очередь: воркер удаляет задачу, только если он не изменился
+    generation = Column(Integer, nullable=False, default=1, server_default="1")
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    run_after = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    locked_by = Column(String, nullable=True)
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    employee = relationship("Employee")
@@ -1,7 +1,7 @@
 """
 Модель сотрудника
 """
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Table
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Table, Index, FetchedValue, false, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -27,6 +27,10 @@ employee_achievements = Table(
 class Employee(Base):
     """Модель сотрудника"""
     __tablename__ = "employees"
+    __table_args__ = (
+        # Загрузка кандидатов поиска - один проход по частичному индексу
+        Index("ix_employees_search_eligible", "id", postgresql_where=text("search_eligible")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True, nullable=False)
@@ -40,6 +44,9 @@ class Employee(Base):
     bio = Column(Text)
     experience_years = Column(Integer, default=0)
     is_active = Column(Boolean, default=True)
+    # Допуск к поиску: заполненный профиль, хотя бы один навык и is_active.
+    # Поддерживается триггерами на employees и employee_skills
+    search_eligible = Column(Boolean, nullable=False, server_default=false(), server_onupdate=FetchedValue())
     
     # Геймификация
     xp_points = Column(Integer, default=0)
@@ -55,7 +62,8 @@ class Employee(Base):
     work_experiences = relationship("WorkExperience", back_populates="employee", cascade="all, delete-orphan")
     educations = relationship("Education", back_populates="employee", cascade="all, delete-orphan")
     career_requests = relationship("CareerRequest", back_populates="employee", cascade="all, delete-orphan")
-    embedding = relationship("EmployeeEmbedding", back_populates="employee", uselist=False, cascade="all, delete-orphan")
+    embeddings = relationship("EmployeeEmbedding", back_populates="employee", cascade="all, delete-orphan")
+    section_embeddings = relationship("EmployeeSectionEmbedding", back_populates="employee", cascade="all, delete-orphan")
     
     @property
     def full_name(self) -> str:
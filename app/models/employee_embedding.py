@@ -1,21 +1,47 @@
 """
 Модель для хранения эмбеддингов сотрудников
 """
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, JSON
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, JSON, UniqueConstraint, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
 
 
 class EmployeeEmbedding(Base):
-    """Модель для хранения эмбеддингов сотрудников"""
+    """Модель для хранения эмбеддингов сотрудников.
+
+    Неудачный расчет сохраняется как status = failed с retry_after
+    (экспоненциальная задержка): поиск не обращается к API для таких строк,
+    их пересчитывает воркер восстановления. Вектор, посчитанный раньше,
+    при неудаче сохраняется; у новых строк embedding - NULL, а не [].
+    """
     __tablename__ = "employee_embeddings"
+    __table_args__ = (
+        # На сотрудника по одной строке на каждую модель (поколение) эмбеддингов
+        UniqueConstraint("employee_id", "model", name="uq_employee_embeddings_employee_model"),
+        # Очередь воркера восстановления
+        Index(
+            "ix_employee_embeddings_failed_retry_after",
+            "retry_after",
+            postgresql_where=text("status = 'failed'")
+        ),
+    )
+    
+    STATUS_READY = "ready"
+    STATUS_FAILED = "failed"
     
     id = Column(Integer, primary_key=True, index=True)
-    employee_id = Column(Integer, ForeignKey("employees.id"), nullable=False, unique=True)
-    embedding = Column(JSON, nullable=False)
+    employee_id = Column(Integer, ForeignKey("employees.id"), nullable=False)
+    model = Column(String, nullable=False, index=True)
+    embedding = Column(JSON(none_as_null=True), nullable=True)
     profile_text = Column(Text, nullable=False) 
+    # sha256(модель + текст профиля): позволяет не пересчитывать неизменившиеся профили
+    content_hash = Column(String(64), nullable=True)
+    status = Column(String(16), nullable=False, default=STATUS_READY, server_default=STATUS_READY)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    retry_after = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
-    employee = relationship("Employee", back_populates="embedding")
+    employee = relationship("Employee", back_populates="embeddings")
@@ -0,0 +1,32 @@
+"""
+Модель для хранения эмбеддингов отдельных секций профиля
+"""
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, JSON, UniqueConstraint
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class EmployeeSectionEmbedding(Base):
+    """Эмбеддинг секции профиля: отдельного места работы, био или навыков.
+
+    Дополняет общий эмбеддинг профиля: сотрудник ранжируется
+    по наиболее похожему из своих векторов.
+    """
+    __tablename__ = "employee_section_embeddings"
+    __table_args__ = (
+        UniqueConstraint("employee_id", "model", "section", name="uq_employee_section_embeddings_employee_model_section"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    employee_id = Column(Integer, ForeignKey("employees.id", ondelete="CASCADE"), nullable=False)
+    model = Column(String, nullable=False, index=True)
+    # Ключ секции: bio, skills или work_experience:<id места работы>
+    section = Column(String(64), nullable=False)
+    embedding = Column(JSON, nullable=False)
+    section_text = Column(Text, nullable=False)
+    content_hash = Column(String(64), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    employee = relationship("Employee", back_populates="section_embeddings")
@@ -0,0 +1,23 @@
+"""
+Модель наборов кандидатов фасетного поиска
+"""
+from sqlalchemy import Column, String, Text, DateTime, JSON
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class FacetedSearch(Base):
+    """Ранжированный набор кандидатов фасетного поиска.
+
+    Хранится в базе, чтобы уточнение по search_id работало на любом
+    воркере приложения; строки удаляются после expires_at.
+    """
+    __tablename__ = "faceted_searches"
+
+    id = Column(String(32), primary_key=True)
+    query = Column(Text, nullable=False)
+    # Ранжированные кандидаты: ID и оценки релевантности, без полей выдачи
+    ranked = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
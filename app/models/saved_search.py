@@ -0,0 +1,50 @@
+"""
+Модели сохраненных поисков и найденных по ним совпадений
+"""
+from sqlalchemy import Column, Integer, String, Text, Float, DateTime, ForeignKey, JSON, UniqueConstraint
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class SavedSearch(Base):
+    """Сохраненный поиск: разобранный запрос и его эмбеддинг.
+
+    Эмбеддинг хранится вместе с именем модели, которой он построен;
+    новые и измененные профили сравниваются только с запросами той же модели.
+    """
+    __tablename__ = "saved_searches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False)
+    query = Column(Text, nullable=False)
+    parsed_query = Column(JSON, nullable=False)
+    model = Column(String, nullable=False, index=True)
+    query_embedding = Column(JSON, nullable=False)
+    # Порог косинусного сходства, с которого профиль считается совпадением
+    threshold = Column(Float, nullable=False)
+    last_viewed_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    matches = relationship("SavedSearchMatch", back_populates="saved_search", cascade="all, delete-orphan")
+
+
+class SavedSearchMatch(Base):
+    """Сотрудник, прошедший порог сохраненного поиска"""
+    __tablename__ = "saved_search_matches"
+    __table_args__ = (
+        UniqueConstraint("saved_search_id", "employee_id", name="uq_saved_search_matches_search_employee"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    saved_search_id = Column(Integer, ForeignKey("saved_searches.id", ondelete="CASCADE"), nullable=False)
+    employee_id = Column(Integer, ForeignKey("employees.id", ondelete="CASCADE"), nullable=False, index=True)
+    score = Column(Float, nullable=False)
+    # Момент первого прохождения порога: по нему отбираются новые совпадения
+    matched_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    saved_search = relationship("SavedSearch", back_populates="matches")
+    employee = relationship("Employee")
@@ -0,0 +1,37 @@
+"""
+Денормализованный документ поиска (read-модель)
+"""
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, LargeBinary, Index, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class SearchDocument(Base):
+    """Одна строка на сотрудника со всем, что нужно поиску и списку HR.
+
+    Поля профиля, навыки и допуск к поиску поддерживаются триггерами
+    на employees, employee_skills и skills. Эмбеддинг (float32) копируется
+    воркером очереди для модели, по которой идет первый этап поиска.
+    """
+    __tablename__ = "search_documents"
+    __table_args__ = (
+        Index("ix_search_documents_search_eligible", "employee_id", postgresql_where=text("search_eligible")),
+    )
+
+    employee_id = Column(Integer, ForeignKey("employees.id", ondelete="CASCADE"), primary_key=True)
+    full_name = Column(String, nullable=False)
+    position = Column(String)
+    department = Column(String)
+    experience_years = Column(Integer, nullable=False, default=0)
+    # junior / middle / senior / lead по стажу
+    grade = Column(String(16), nullable=False)
+    level = Column(Integer, nullable=False, default=1)
+    xp_points = Column(Integer, nullable=False, default=0)
+    skills = Column(ARRAY(String), nullable=False, server_default="{}")
+    search_eligible = Column(Boolean, nullable=False, server_default="false")
+    model = Column(String, nullable=True)
+    embedding = Column(LargeBinary, nullable=True)
+    content_hash = Column(String(64), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,33 @@
+"""
+Модель журнала изменений, влияющих на индекс поиска
+"""
+from sqlalchemy import Column, BigInteger, Integer, String, DateTime
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class SearchIndexChange(Base):
+    """Изменение сотрудника, его навыков или эмбеддинга.
+
+    Строки пишут триггеры на employees, employee_skills, work_experiences
+    и employee_embeddings; они же отправляют NOTIFY. Журнал нужен, чтобы после переподключения
+    слушатель дочитал пропущенные уведомления.
+    """
+    __tablename__ = "search_index_changes"
+
+    CHANNEL = "search_index_changes"
+    SOURCE_EMPLOYEES = "employees"
+    SOURCE_SKILLS = "employee_skills"
+    SOURCE_WORK_EXPERIENCES = "work_experiences"
+    SOURCE_EMBEDDINGS = "employee_embeddings"
+
+    # Запас при дочитывании журнала: BIGSERIAL выдается до коммита, поэтому
+    # изменение с меньшим id может стать видимым позже изменения с большим.
+    # Повторное применение безопасно - патчи читают актуальное состояние.
+    CATCH_UP_OVERLAP = 100
+
+    id = Column(BigInteger, primary_key=True)
+    employee_id = Column(Integer, nullable=False)
+    source = Column(String(32), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
@@ -0,0 +1,103 @@
+"""
+Репозиторий поколений эмбеддингов
+"""
+from typing import Optional, List
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, func
+
+from app.repositories.base import BaseRepository
+from app.models.embedding_generation import EmbeddingGeneration
+
+
+class EmbeddingGenerationRepository(BaseRepository[EmbeddingGeneration]):
+    """Репозиторий для работы с поколениями эмбеддингов"""
+    
+    def __init__(self, db: AsyncSession):
+        super().__init__(EmbeddingGeneration, db)
+    
+    async def get_by_model(self, model: str) -> Optional[EmbeddingGeneration]:
+        """Получить поколение по имени модели (всегда с актуальными полями из БД,
+        даже если объект уже загружен в сессию)"""
+        result = await self.db.execute(
+            select(EmbeddingGeneration)
+            .where(EmbeddingGeneration.model == model)
+            .execution_options(populate_existing=True)
+        )
+        return result.scalar_one_or_none()
+    
+    async def get_by_status(self, status: str) -> List[EmbeddingGeneration]:
+        """Получить поколения в заданном статусе"""
+        result = await self.db.execute(
+            select(EmbeddingGeneration)
+            .where(EmbeddingGeneration.status == status)
+            .order_by(EmbeddingGeneration.id)
+        )
+        return result.scalars().all()
+    
+    async def get_all_generations(self) -> List[EmbeddingGeneration]:
+        """Получить все поколения"""
+        result = await self.db.execute(
+            select(EmbeddingGeneration).order_by(EmbeddingGeneration.id)
+        )
+        return result.scalars().all()
+    
+    async def update_progress(self, model: str, total: int, processed: int, embedded: int) -> None:
+        """Сохранить прогресс построения поколения"""
+        await self.db.execute(
+            update(EmbeddingGeneration)
+            .where(EmbeddingGeneration.model == model)
+            .values(total=total, processed=processed, embedded=embedded, updated_at=func.now())
+        )
+        await self.db.commit()
+    
+    async def mark_finished(self, model: str, error: Optional[str] = None) -> None:
+        """Отметить завершение (или ошибку) построения поколения"""
+        values = {"last_error": error, "updated_at": func.now()}
+        if error is None:
+            values["finished_at"] = func.now()
+        await self.db.execute(
+            update(EmbeddingGeneration)
+            .where(EmbeddingGeneration.model == model)
+            .values(**values)
+        )
+        await self.db.commit()
+    
+    async def restart(self, model: str, total: int) -> None:
+        """Вернуть поколение в статус building со сброшенным прогрессом"""
+        await self.db.execute(
+            update(EmbeddingGeneration)
+            .where(EmbeddingGeneration.model == model)
+            .values(
+                status=EmbeddingGeneration.STATUS_BUILDING,
+                total=total,
+                processed=0,
+                embedded=0,
+                last_error=None,
+                started_at=func.now(),
+                finished_at=None,
+                activated_at=None,
+                updated_at=func.now()
+            )
+        )
+        await self.db.commit()
+    
+    async def activate(self, model: str) -> None:
+        """Атомарно сделать поколение активным, выведя текущее из эксплуатации"""
+        await self.db.execute(
+            update(EmbeddingGeneration)
+            .where(
+                EmbeddingGeneration.status == EmbeddingGeneration.STATUS_ACTIVE,
+                EmbeddingGeneration.model != model
+            )
+            .values(status=EmbeddingGeneration.STATUS_RETIRED, updated_at=func.now())
+        )
+        await self.db.execute(
+            update(EmbeddingGeneration)
+            .where(EmbeddingGeneration.model == model)
+            .values(
+                status=EmbeddingGeneration.STATUS_ACTIVE,
+                activated_at=func.now(),
+                updated_at=func.now()
+            )
+        )
+        await self.db.commit()
@@ -0,0 +1,149 @@
+"""
+Репозиторий очереди задач на пересчет эмбеддингов
+"""
+from datetime import timedelta
+from typing import List
+
+from sqlalchemy import select, update, delete, or_, and_, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.repositories.base import BaseRepository
+from app.models.embedding_job import EmbeddingJob
+
+
+class EmbeddingJobRepository(BaseRepository[EmbeddingJob]):
+    """Репозиторий задач на пересчет эмбеддингов (Postgres-очередь)"""
+    
+    def __init__(self, db: AsyncSession):
+        super().__init__(EmbeddingJob, db)
+    
+    async def enqueue(self, employee_id: int, delay_seconds: float = 0) -> None:
+        """Поставить сотрудника в очередь на пересчет эмбеддинга.
+
+        Повторная постановка не создает новую задачу, а откладывает уже
+        существующую (дебаунс) и увеличивает её generation.
+        """
+        await self.enqueue_many([employee_id], delay_seconds)
+    
+    async def enqueue_many(self, employee_ids: List[int], delay_seconds: float = 0) -> None:
+        """Поставить в очередь несколько сотрудников одним запросом"""
+        if not employee_ids:
+            return
+        
+        run_after = func.now() + timedelta(seconds=delay_seconds)
+        stmt = insert(EmbeddingJob).values([
+            {
+                "employee_id": employee_id,
+                "status": EmbeddingJob.STATUS_PENDING,
+                "generation": 1,
+                "attempts": 0,
+                "run_after": run_after
+            }
+            for employee_id in employee_ids
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[EmbeddingJob.employee_id],
+            set_={
+                "generation": EmbeddingJob.generation + 1,
+                "run_after": run_after,
+                # Задачу, которую сейчас обрабатывает воркер, не трогаем:
+                # он увидит новый generation и вернет её в очередь сам
+                "status": func.coalesce(
+                    func.nullif(EmbeddingJob.status, EmbeddingJob.STATUS_FAILED),
+                    EmbeddingJob.STATUS_PENDING
+                ),
+                "attempts": 0,
+                "last_error": None,
+                "updated_at": func.now()
+            }
+        )
+        await self.db.execute(stmt)
+        await self.db.commit()
+    
+    async def claim_batch(self, worker_id: str, limit: int, lease_seconds: float) -> List[EmbeddingJob]:
+        """Захватить пачку готовых к выполнению задач.
+
+        Используется FOR UPDATE SKIP LOCKED, поэтому несколько воркеров (в том
+        числе на разных узлах) разбирают очередь без пересечений. Задачи,
+        зависшие в статусе running дольше lease_seconds, считаются брошенными
+        и захватываются повторно.
+        """
+        now = func.now()
+        result = await self.db.execute(
+            select(EmbeddingJob)
+            .where(
+                or_(
+                    and_(
+                        EmbeddingJob.status == EmbeddingJob.STATUS_PENDING,
+                        EmbeddingJob.run_after <= now
+                    ),
+                    and_(
+                        EmbeddingJob.status == EmbeddingJob.STATUS_RUNNING,
+                        EmbeddingJob.locked_at < now - timedelta(seconds=lease_seconds)
+                    )
+                )
+            )
+            .order_by(EmbeddingJob.run_after)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        jobs = result.scalars().all()
+        
+        for job in jobs:
+            job.status = EmbeddingJob.STATUS_RUNNING
+            job.locked_by = worker_id
+            job.locked_at = now
+            job.attempts = (job.attempts or 0) + 1
+        
+        await self.db.commit()
+        return jobs
+    
+    async def complete(self, job_id: int, generation: int) -> None:
+        """Завершить задачу.
+
+        Если пока задача выполнялась, сотрудника снова поставили в очередь,
+        задача не удаляется, а возвращается в статус pending.
+        """
+        result = await self.db.execute(
+            delete(EmbeddingJob).where(
+                EmbeddingJob.id == job_id,
+                EmbeddingJob.generation == generation
+            )
+        )
+        if result.rowcount == 0:
+            await self.db.execute(
+                update(EmbeddingJob)
+                .where(EmbeddingJob.id == job_id)
+                .values(
+                    status=EmbeddingJob.STATUS_PENDING,
+                    locked_by=None,
+                    locked_at=None,
+                    attempts=0
+                )
+            )
+        await self.db.commit()
+    
+    async def fail(
+        self,
+        job_id: int,
+        attempts: int,
+        error: str,
+        retry_base_seconds: float,
+        max_attempts: int
+    ) -> None:
+        """Отметить неудачную попытку с экспоненциальной задержкой повтора"""
+        status = EmbeddingJob.STATUS_FAILED if attempts >= max_attempts else EmbeddingJob.STATUS_PENDING
+        delay = retry_base_seconds * (2 ** max(0, attempts - 1))
+        await self.db.execute(
+            update(EmbeddingJob)
+            .where(EmbeddingJob.id == job_id)
+            .values(
+                status=status,
+                run_after=func.now() + timedelta(seconds=delay),
+                locked_by=None,
+                locked_at=None,
+                last_error=error[:1000]
+            )
+        )
+        await self.db.commit()
@@ -1,13 +1,14 @@
 """
 Асинхронный репозиторий сотрудников
 """
-from typing import Optional, List
+from collections import defaultdict
+from typing import Optional, List, Dict, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, or_, insert
 from sqlalchemy.orm import selectinload
 
 from app.repositories.base import BaseRepository
-from app.models.employee import Employee, employee_achievements
+from app.models.employee import Employee, employee_achievements, employee_skills
 from app.models.skill import Skill
 from app.models.achievement import Achievement
 
@@ -38,6 +39,60 @@ class EmployeeRepository(BaseRepository[Employee]):
         )
         return result.scalar_one_or_none()
     
+    async def get_index_rows(self, employee_ids: Optional[List[int]] = None) -> Tuple[list, Dict[int, List[str]]]:
+        """Колонки индекса поиска для допущенных к поиску сотрудников (без ORM-объектов).
+
+        Возвращает строки (id, department, experience_years, level, is_active) и навыки по ID.
+        """
+        query = (
+            select(Employee.id, Employee.department, Employee.experience_years, Employee.level, Employee.is_active)
+            .where(Employee.search_eligible)
+            .order_by(Employee.id)
+        )
+        skills_query = (
+            select(employee_skills.c.employee_id, Skill.name)
+            .join(Skill, Skill.id == employee_skills.c.skill_id)
+        )
+        if employee_ids is not None:
+            query = query.where(Employee.id.in_(employee_ids))
+            skills_query = skills_query.where(employee_skills.c.employee_id.in_(employee_ids))
+        
+        rows = (await self.db.execute(query)).all()
+        skills_by_employee = defaultdict(list)
+        for employee_id, skill_name in (await self.db.execute(skills_query)).all():
+            skills_by_employee[employee_id].append(skill_name)
+        return rows, skills_by_employee
+    
+    async def is_search_eligible(self, employee_id: int) -> bool:
+        """Участвует ли сотрудник в поиске"""
+        result = await self.db.execute(
+            select(Employee.id).where(Employee.id == employee_id, Employee.search_eligible)
+        )
+        return result.scalar_one_or_none() is not None
+    
+    async def get_with_skills_by_ids(self, employee_ids: List[int]) -> List[Employee]:
+        """Получить сотрудников с навыками по списку ID"""
+        if not employee_ids:
+            return []
+        result = await self.db.execute(
+            select(Employee)
+            .options(selectinload(Employee.skills))
+            .where(Employee.id.in_(employee_ids))
+        )
+        return result.scalars().all()
+    
+    async def get_with_profile_relations(self, employee_id: int) -> Optional[Employee]:
+        """Получить сотрудника с навыками и опытом работы (данные для эмбеддинга)"""
+        result = await self.db.execute(
+            select(Employee)
+            .options(
+                selectinload(Employee.skills),
+                selectinload(Employee.work_experiences)
+            )
+            .where(Employee.id == employee_id)
+        )
+        return result.scalar_one_or_none()
+    
     async def get_with_all_relations(self, employee_id: int) -> Optional[Employee]:
         """Получить сотрудника со всеми связанными данными"""
         result = await self.db.execute(
@@ -1,14 +1,17 @@
 """
 Репозиторий для работы с эмбеддингами сотрудников
 """
+import re
 import nltk
-from typing import Optional, List
+from typing import Optional, List, Dict, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, delete, func, case, literal_column
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import selectinload
 
 from app.repositories.base import BaseRepository
 from app.models.employee_embedding import EmployeeEmbedding
+from app.models.employee import Employee
 
 from pymorphy3 import MorphAnalyzer
 
@@ -18,10 +21,13 @@ class EmployeeEmbeddingRepository(BaseRepository[EmployeeEmbedding]):
     def __init__(self, db: AsyncSession):
         super().__init__(EmployeeEmbedding, db)
     
-    async def get_by_employee_id(self, employee_id: int) -> Optional[EmployeeEmbedding]:
-        """Получить эмбеддинг по ID сотрудника"""
+    async def get_by_employee_id(self, employee_id: int, model: str) -> Optional[EmployeeEmbedding]:
+        """Получить эмбеддинг по ID сотрудника для заданной модели"""
         result = await self.db.execute(
-            select(EmployeeEmbedding).where(EmployeeEmbedding.employee_id == employee_id)
+            select(EmployeeEmbedding).where(
+                EmployeeEmbedding.employee_id == employee_id,
+                EmployeeEmbedding.model == model
+            )
         )
         return result.scalar_one_or_none()
     
@@ -39,22 +45,44 @@ class EmployeeEmbeddingRepository(BaseRepository[EmployeeEmbedding]):
         
         return ' '.join(processed_query)
     
+    async def get_content_hashes(self, employee_ids: List[int], model: str) -> Dict[int, Optional[str]]:
+        """Получить хеши содержимого сохраненных эмбеддингов"""
+        if not employee_ids:
+            return {}
+        result = await self.db.execute(
+            select(EmployeeEmbedding.employee_id, EmployeeEmbedding.content_hash)
+            .where(
+                EmployeeEmbedding.employee_id.in_(employee_ids),
+                EmployeeEmbedding.model == model
+            )
+        )
+        return {employee_id: content_hash for employee_id, content_hash in result.all()}
+    
     async def create_or_update_embedding(
         self, 
         employee_id: int, 
         embedding: List[float], 
-        profile_text: str
+        profile_text: str,
+        content_hash: Optional[str] = None,
+        model: str = None
     ) -> EmployeeEmbedding:
-        """Создать или обновить эмбеддинг сотрудника"""
+        """Создать или обновить эмбеддинг сотрудника (сбрасывает состояние ошибки)"""
+        if not embedding:
+            # Пустой вектор - это ошибка расчета, ее записывает mark_failed
+            raise ValueError(f"Пустой эмбеддинг для сотрудника {employee_id}")
+        
         # Проверяем, существует ли уже эмбеддинг
-        existing = await self.get_by_employee_id(employee_id)
-        # Делаем обработку текста
-        processed_profile_text = await self._process_text(profile_text)
+        existing = await self.get_by_employee_id(employee_id, model)
 
         if existing:
             # Обновляем существующий
             existing.embedding = embedding
             existing.profile_text = profile_text
+            existing.content_hash = content_hash
+            existing.status = EmployeeEmbedding.STATUS_READY
+            existing.attempts = 0
+            existing.retry_after = None
+            existing.last_error = None
             await self.db.commit()
             await self.db.refresh(existing)
             return existing
@@ -62,14 +90,115 @@ class EmployeeEmbeddingRepository(BaseRepository[EmployeeEmbedding]):
             # Создаем новый
             new_embedding = EmployeeEmbedding(
                 employee_id=employee_id,
+                model=model,
                 embedding=embedding,
-                profile_text=profile_text
+                profile_text=profile_text,
+                content_hash=content_hash
             )
             self.db.add(new_embedding)
             await self.db.commit()
             await self.db.refresh(new_embedding)
             return new_embedding
     
+    async def mark_failed(
+        self,
+        profiles: List[Tuple[int, str]],
+        model: str,
+        error: str,
+        retry_base_seconds: float,
+        retry_max_seconds: float
+    ) -> None:
+        """Записать неудачный расчет для (employee_id, текст профиля).
+
+        Повтор не раньше retry_after: base * 2^(attempts - 1), но не больше max.
+        Ранее посчитанный вектор и его content_hash не трогаются, поэтому
+        изменившийся профиль по-прежнему считается непосчитанным.
+        """
+        if not profiles:
+            return
+        second = literal_column("interval '1 second'")
+        stmt = insert(EmployeeEmbedding).values([
+            {
+                "employee_id": employee_id,
+                "model": model,
+                "embedding": None,
+                "profile_text": profile_text,
+                "status": EmployeeEmbedding.STATUS_FAILED,
+                "attempts": 1,
+                "retry_after": func.now() + retry_base_seconds * second,
+                "last_error": error[:1000]
+            }
+            for employee_id, profile_text in profiles
+        ])
+        delay_seconds = func.least(
+            retry_base_seconds * func.power(2, EmployeeEmbedding.attempts),
+            retry_max_seconds
+        )
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_employee_embeddings_employee_model",
+            set_={
+                "status": EmployeeEmbedding.STATUS_FAILED,
+                "attempts": EmployeeEmbedding.attempts + 1,
+                "retry_after": func.now() + delay_seconds * second,
+                "last_error": stmt.excluded.last_error,
+                "updated_at": func.now()
+            }
+        )
+        await self.db.execute(stmt)
+        await self.db.commit()
+    
+    async def claim_due_failures(self, models: List[str], limit: int, lease_seconds: float) -> List[tuple]:
+        """Захватить (employee_id, model) неудачных расчетов, для которых истекла задержка повтора.
+
+        Строки выбираются с FOR UPDATE SKIP LOCKED, и в той же транзакции
+        retry_after сдвигается на lease_seconds: воркеры других процессов
+        и узлов не возьмут ту же пачку, пока идет запрос к API. Если воркер
+        упадет, строки снова станут доступны по истечении аренды.
+        """
+        result = await self.db.execute(
+            select(EmployeeEmbedding)
+            .where(
+                EmployeeEmbedding.status == EmployeeEmbedding.STATUS_FAILED,
+                EmployeeEmbedding.retry_after <= func.now(),
+                EmployeeEmbedding.model.in_(models)
+            )
+            .order_by(EmployeeEmbedding.retry_after)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        embeddings = result.scalars().all()
+        
+        claimed = [(embedding.employee_id, embedding.model) for embedding in embeddings]
+        lease_until = func.now() + lease_seconds * literal_column("interval '1 second'")
+        for embedding in embeddings:
+            embedding.retry_after = lease_until
+        
+        await self.db.commit()
+        return claimed
+    
+    async def count_by_state(self) -> List[Dict]:
+        """Число эмбеддингов по моделям и состояниям; failed делится на ждущие задержку и готовые к повтору"""
+        # Без параметров запроса: выражение повторяется в GROUP BY
+        state = case(
+            (EmployeeEmbedding.status != literal_column(f"'{EmployeeEmbedding.STATUS_FAILED}'"), EmployeeEmbedding.status),
+            (EmployeeEmbedding.retry_after > func.now(), literal_column("'failed_backoff'")),
+            else_=literal_column("'failed_due'")
+        )
+        result = await self.db.execute(
+            select(
+                EmployeeEmbedding.model,
+                state.label("state"),
+                func.count().label("count"),
+                func.count(EmployeeEmbedding.embedding).label("with_vector")
+            )
+            .group_by(EmployeeEmbedding.model, state)
+            .order_by(EmployeeEmbedding.model, state)
+        )
+        return [
+            {"model": model, "state": state, "count": count, "with_vector": with_vector}
+            for model, state, count, with_vector in result.all()
+        ]
+    
     async def get_all_embeddings(self) -> List[EmployeeEmbedding]:
         """Получить все эмбеддинги с информацией о сотрудниках"""
         result = await self.db.execute(
@@ -78,26 +207,60 @@ class EmployeeEmbeddingRepository(BaseRepository[EmployeeEmbedding]):
         )
         return result.scalars().all()
     
-    async def get_embeddings_by_employee_ids(self, employee_ids: List[int]) -> List[EmployeeEmbedding]:
-        """Получить эмбеддинги по списку ID сотрудников"""
+    async def get_embeddings_by_employee_ids(self, employee_ids: List[int], model: str) -> List[EmployeeEmbedding]:
+        """Получить эмбеддинги по списку ID сотрудников для заданной модели"""
         result = await self.db.execute(
             select(EmployeeEmbedding)
-            .where(EmployeeEmbedding.employee_id.in_(employee_ids))
+            .where(
+                EmployeeEmbedding.employee_id.in_(employee_ids),
+                EmployeeEmbedding.model == model
+            )
         )
         return result.scalars().all()
     
-    async def get_embedding_vector(self, employee_id: int) -> Optional[List[float]]:
+    async def get_eligible_vectors(self, model: str) -> List[tuple]:
+        """Получить (employee_id, вектор) всех участвующих в поиске сотрудников"""
+        result = await self.db.execute(
+            select(EmployeeEmbedding.employee_id, EmployeeEmbedding.embedding)
+            .join(Employee, Employee.id == EmployeeEmbedding.employee_id)
+            .where(
+                EmployeeEmbedding.model == model,
+                EmployeeEmbedding.embedding.isnot(None),
+                Employee.search_eligible
+            )
+        )
+        return result.all()
+    
+    async def get_vectors_with_hashes(self, model: str, employee_ids: Optional[List[int]] = None) -> List[tuple]:
+        """Получить (employee_id, вектор, хеш содержимого) для модели"""
+        query = (
+            select(EmployeeEmbedding.employee_id, EmployeeEmbedding.embedding, EmployeeEmbedding.content_hash)
+            .where(EmployeeEmbedding.model == model, EmployeeEmbedding.embedding.isnot(None))
+        )
+        if employee_ids is not None:
+            query = query.where(EmployeeEmbedding.employee_id.in_(employee_ids))
+        result = await self.db.execute(query)
+        return result.all()
+    
+    async def get_embedding_vector(self, employee_id: int, model: str) -> Optional[List[float]]:
         """Получить вектор эмбеддинга по ID сотрудника"""
-        embedding = await self.get_by_employee_id(employee_id)
+        embedding = await self.get_by_employee_id(employee_id, model)
         if embedding:
             return embedding.embedding
         return None
     
     async def delete_by_employee_id(self, employee_id: int) -> bool:
-        """Удалить эмбеддинг по ID сотрудника"""
-        embedding = await self.get_by_employee_id(employee_id)
-        if embedding:
-            await self.db.delete(embedding)
-            await self.db.commit()
-            return True
-        return False
+        """Удалить эмбеддинги сотрудника во всех поколениях"""
+        result = await self.db.execute(
+            delete(EmployeeEmbedding).where(EmployeeEmbedding.employee_id == employee_id)
+        )
+        await self.db.commit()
+        return result.rowcount > 0
+    
+    async def delete_except_models(self, models: List[str]) -> int:
+        """Удалить эмбеддинги всех моделей, кроме перечисленных"""
+        result = await self.db.execute(
+            delete(EmployeeEmbedding).where(EmployeeEmbedding.model.notin_(models))
+        )
+        await self.db.commit()
+        return result.rowcount
@@ -0,0 +1,76 @@
+"""
+Репозиторий эмбеддингов секций профиля
+"""
+from typing import List, Dict, Tuple
+
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.repositories.base import BaseRepository
+from app.models.employee_section_embedding import EmployeeSectionEmbedding
+
+
+class EmployeeSectionEmbeddingRepository(BaseRepository[EmployeeSectionEmbedding]):
+    """Репозиторий для работы с эмбеддингами секций профиля"""
+    
+    def __init__(self, db: AsyncSession):
+        super().__init__(EmployeeSectionEmbedding, db)
+    
+    async def get_content_hashes(self, employee_id: int, model: str) -> Dict[str, str]:
+        """Хеши сохраненных секций сотрудника по ключу секции"""
+        result = await self.db.execute(
+            select(EmployeeSectionEmbedding.section, EmployeeSectionEmbedding.content_hash)
+            .where(
+                EmployeeSectionEmbedding.employee_id == employee_id,
+                EmployeeSectionEmbedding.model == model
+            )
+        )
+        return {section: content_hash for section, content_hash in result.all()}
+    
+    async def replace_sections(
+        self,
+        employee_id: int,
+        model: str,
+        rows: List[Dict],
+        keep_sections: List[str]
+    ) -> None:
+        """Записать измененные секции (section, embedding, section_text, content_hash)
+        и удалить секции, которых больше нет в профиле"""
+        if rows:
+            stmt = insert(EmployeeSectionEmbedding).values([
+                {**row, "employee_id": employee_id, "model": model} for row in rows
+            ])
+            stmt = stmt.on_conflict_do_update(
+                constraint="uq_employee_section_embeddings_employee_model_section",
+                set_={
+                    "embedding": stmt.excluded.embedding,
+                    "section_text": stmt.excluded.section_text,
+                    "content_hash": stmt.excluded.content_hash,
+                    "updated_at": func.now()
+                }
+            )
+            await self.db.execute(stmt)
+        
+        await self.db.execute(
+            delete(EmployeeSectionEmbedding).where(
+                EmployeeSectionEmbedding.employee_id == employee_id,
+                EmployeeSectionEmbedding.model == model,
+                EmployeeSectionEmbedding.section.notin_(keep_sections)
+            )
+        )
+        await self.db.commit()
+    
+    async def get_vectors(self, employee_ids: List[int], model: str) -> List[Tuple[int, List[float]]]:
+        """Векторы секций сотрудников, упорядоченные по сотруднику"""
+        if not employee_ids:
+            return []
+        result = await self.db.execute(
+            select(EmployeeSectionEmbedding.employee_id, EmployeeSectionEmbedding.embedding)
+            .where(
+                EmployeeSectionEmbedding.employee_id.in_(employee_ids),
+                EmployeeSectionEmbedding.model == model
+            )
+            .order_by(EmployeeSectionEmbedding.employee_id)
+        )
+        return result.all()
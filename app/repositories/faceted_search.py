@@ -0,0 +1,40 @@
+"""
+Репозиторий наборов кандидатов фасетного поиска
+"""
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional, List, Dict, Any
+
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.repositories.base import BaseRepository
+from app.models.faceted_search import FacetedSearch
+
+
+class FacetedSearchRepository(BaseRepository[FacetedSearch]):
+    """Репозиторий для работы с наборами кандидатов фасетного поиска"""
+    
+    def __init__(self, db: AsyncSession):
+        super().__init__(FacetedSearch, db)
+    
+    async def get_valid(self, search_id: str) -> Optional[FacetedSearch]:
+        """Набор по search_id, если он еще не истек"""
+        result = await self.db.execute(
+            select(FacetedSearch).where(
+                FacetedSearch.id == search_id,
+                FacetedSearch.expires_at > datetime.now(timezone.utc)
+            )
+        )
+        return result.scalar_one_or_none()
+    
+    async def save(self, query: str, ranked: List[Dict[str, Any]], ttl_seconds: float) -> FacetedSearch:
+        """Сохранить набор с новым search_id; заодно удаляются истекшие наборы"""
+        now = datetime.now(timezone.utc)
+        await self.db.execute(delete(FacetedSearch).where(FacetedSearch.expires_at <= now))
+        return await self.create({
+            "id": uuid.uuid4().hex,
+            "query": query,
+            "ranked": ranked,
+            "expires_at": now + timedelta(seconds=ttl_seconds)
+        })
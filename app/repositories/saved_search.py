@@ -0,0 +1,106 @@
+"""
+Репозиторий сохраненных поисков
+"""
+from datetime import datetime
+from typing import Optional, List, Dict
+
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.repositories.base import BaseRepository
+from app.models.saved_search import SavedSearch, SavedSearchMatch
+
+
+class SavedSearchRepository(BaseRepository[SavedSearch]):
+    """Репозиторий для работы с сохраненными поисками и их совпадениями"""
+    
+    def __init__(self, db: AsyncSession):
+        super().__init__(SavedSearch, db)
+    
+    async def get_all_searches(self) -> List[SavedSearch]:
+        """Получить все сохраненные поиски"""
+        result = await self.db.execute(
+            select(SavedSearch).order_by(SavedSearch.id)
+        )
+        return result.scalars().all()
+    
+    async def get_new_match_counts(self) -> Dict[int, int]:
+        """Количество совпадений после последнего просмотра по каждому поиску"""
+        result = await self.db.execute(
+            select(SavedSearchMatch.saved_search_id, func.count())
+            .join(SavedSearch, SavedSearch.id == SavedSearchMatch.saved_search_id)
+            .where(SavedSearchMatch.matched_at > SavedSearch.last_viewed_at)
+            .group_by(SavedSearchMatch.saved_search_id)
+        )
+        return {search_id: count for search_id, count in result.all()}
+    
+    async def update_embedding(self, saved_search_id: int, model: str, embedding: List[float]) -> None:
+        """Сохранить эмбеддинг запроса, построенный другой моделью"""
+        await self.db.execute(
+            update(SavedSearch)
+            .where(SavedSearch.id == saved_search_id)
+            .values(model=model, query_embedding=embedding, updated_at=func.now())
+        )
+        await self.db.commit()
+    
+    async def mark_viewed(self, saved_search_id: int) -> None:
+        """Отметить просмотр совпадений"""
+        await self.db.execute(
+            update(SavedSearch)
+            .where(SavedSearch.id == saved_search_id)
+            .values(last_viewed_at=func.now())
+        )
+        await self.db.commit()
+    
+    async def upsert_matches(self, rows: List[Dict]) -> None:
+        """Записать совпадения (saved_search_id, employee_id, score).
+
+        Для уже найденных сотрудников обновляется только score: matched_at
+        остается моментом первого прохождения порога.
+        """
+        if not rows:
+            return
+        
+        stmt = insert(SavedSearchMatch).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_saved_search_matches_search_employee",
+            set_={"score": stmt.excluded.score, "updated_at": func.now()}
+        )
+        await self.db.execute(stmt)
+        await self.db.commit()
+    
+    async def delete_employee_matches(self, employee_id: int, saved_search_ids: List[int]) -> None:
+        """Удалить совпадения сотрудника, который перестал проходить порог"""
+        if not saved_search_ids:
+            return
+        
+        await self.db.execute(
+            delete(SavedSearchMatch).where(
+                SavedSearchMatch.employee_id == employee_id,
+                SavedSearchMatch.saved_search_id.in_(saved_search_ids)
+            )
+        )
+        await self.db.commit()
+    
+    async def get_matches(
+        self,
+        saved_search_id: int,
+        since: Optional[datetime] = None,
+        limit: int = 100
+    ) -> List[SavedSearchMatch]:
+        """Получить совпадения поиска (при since - только найденные позже).
+
+        Профили сотрудников не подгружаются: их читают из документов поиска.
+        """
+        query = (
+            select(SavedSearchMatch)
+            .where(SavedSearchMatch.saved_search_id == saved_search_id)
+            .order_by(SavedSearchMatch.score.desc())
+            .limit(limit)
+        )
+        if since is not None:
+            query = query.where(SavedSearchMatch.matched_at > since)
+        
+        result = await self.db.execute(query)
+        return result.scalars().all()
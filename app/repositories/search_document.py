@@ -0,0 +1,103 @@
+"""
+Репозиторий документов поиска
+"""
+from typing import Optional, List, Dict
+
+from sqlalchemy import select, update, func, exists
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.repositories.base import BaseRepository
+from app.models.search_document import SearchDocument
+
+# Колонки, которые читают поиск и список HR (id - ID сотрудника)
+DOCUMENT_COLUMNS = (
+    SearchDocument.employee_id.label("id"),
+    SearchDocument.full_name,
+    SearchDocument.position,
+    SearchDocument.department,
+    SearchDocument.experience_years,
+    SearchDocument.grade,
+    SearchDocument.level,
+    SearchDocument.xp_points,
+    SearchDocument.skills,
+)
+
+
+# Колонки, по которым ранжирует поиск
+RANKING_COLUMNS = (
+    SearchDocument.employee_id.label("id"),
+    SearchDocument.grade,
+    SearchDocument.level,
+    SearchDocument.skills,
+    SearchDocument.model,
+    SearchDocument.embedding,
+)
+
+
+class SearchDocumentRepository(BaseRepository[SearchDocument]):
+    """Чтение документов поиска одной таблицей, без ORM-связей"""
+    
+    def __init__(self, db: AsyncSession):
+        super().__init__(SearchDocument, db)
+    
+    async def get_ranking_rows(self, employee_ids: Optional[List[int]] = None) -> list:
+        """Компактные строки для ранжирования допущенных к поиску сотрудников:
+        ID, грейд, уровень, навыки и эмбеддинг (без полей для выдачи)"""
+        query = (
+            select(*RANKING_COLUMNS)
+            .where(SearchDocument.search_eligible)
+            .order_by(SearchDocument.employee_id)
+        )
+        if employee_ids is not None:
+            query = query.where(SearchDocument.employee_id.in_(employee_ids))
+        result = await self.db.execute(query)
+        return result.all()
+    
+    async def get_rows_by_ids(self, employee_ids: List[int]) -> list:
+        """Документы сотрудников по списку ID (без эмбеддингов)"""
+        if not employee_ids:
+            return []
+        result = await self.db.execute(
+            select(*DOCUMENT_COLUMNS).where(SearchDocument.employee_id.in_(employee_ids))
+        )
+        return result.all()
+    
+    async def search_by_skills(self, skill_names: List[str]) -> list:
+        """Документы допущенных к поиску сотрудников, у которых есть хотя бы один
+        из навыков (без учета регистра), в порядке ID"""
+        if not skill_names:
+            return []
+        skill = func.unnest(SearchDocument.skills).table_valued("skill").render_derived()
+        result = await self.db.execute(
+            select(*DOCUMENT_COLUMNS)
+            .where(
+                SearchDocument.search_eligible,
+                exists(
+                    select(1).select_from(skill)
+                    .where(func.lower(skill.c.skill).in_({name.lower() for name in skill_names}))
+                )
+            )
+            .order_by(SearchDocument.employee_id)
+        )
+        return result.all()
+    
+    async def get_page(self, skip: int = 0, limit: int = 100) -> list:
+        """Страница документов всех сотрудников для списка HR"""
+        result = await self.db.execute(
+            select(*DOCUMENT_COLUMNS)
+            .order_by(SearchDocument.employee_id)
+            .offset(skip)
+            .limit(limit)
+        )
+        return result.all()
+    
+    async def set_embeddings(self, model: str, rows: List[Dict]) -> None:
+        """Записать эмбеддинги (employee_id, embedding, content_hash) модели первого этапа"""
+        if not rows:
+            return
+        # Пакетное обновление по первичному ключу
+        await self.db.execute(
+            update(SearchDocument),
+            [{**row, "model": model} for row in rows]
+        )
+        await self.db.commit()
@@ -0,0 +1,49 @@
+"""
+Репозиторий журнала изменений индекса поиска
+"""
+from typing import List
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.repositories.base import BaseRepository
+from app.models.search_index_change import SearchIndexChange
+
+
+class SearchIndexChangeRepository(BaseRepository[SearchIndexChange]):
+    """Репозиторий для чтения журнала изменений индекса поиска"""
+    
+    def __init__(self, db: AsyncSession):
+        super().__init__(SearchIndexChange, db)
+    
+    async def get_last_id(self) -> int:
+        """ID последнего изменения (0 - журнал пуст)"""
+        result = await self.db.execute(select(func.coalesce(func.max(SearchIndexChange.id), 0)))
+        return result.scalar_one()
+    
+    async def get_changed_profile_ids(self, after_id: int, limit: int) -> List[int]:
+        """Сотрудники, чьи метаданные в индексе менялись после изменения after_id
+        (с запасом CATCH_UP_OVERLAP); изменения одних эмбеддингов не учитываются"""
+        result = await self.db.execute(
+            select(SearchIndexChange.employee_id)
+            .where(
+                SearchIndexChange.id > after_id - SearchIndexChange.CATCH_UP_OVERLAP,
+                SearchIndexChange.source != SearchIndexChange.SOURCE_EMBEDDINGS
+            )
+            .distinct()
+            .limit(limit)
+        )
+        return result.scalars().all()
+    
+    async def get_changed_embedding_ids(self, after_id: int, limit: int) -> List[int]:
+        """Сотрудники, чьи эмбеддинги менялись после изменения after_id (с запасом CATCH_UP_OVERLAP)"""
+        result = await self.db.execute(
+            select(SearchIndexChange.employee_id)
+            .where(
+                SearchIndexChange.id > after_id - SearchIndexChange.CATCH_UP_OVERLAP,
+                SearchIndexChange.source == SearchIndexChange.SOURCE_EMBEDDINGS
+            )
+            .distinct()
+            .limit(limit)
+        )
+        return result.scalars().all()
@@ -0,0 +1,12 @@
+"""
+Схемы для сохраненных поисков
+"""
+from pydantic import BaseModel
+from typing import Optional
+
+
+class SavedSearchCreate(BaseModel):
+    """Схема для создания сохраненного поиска"""
+    name: str
+    query: str
+    threshold: Optional[float] = None
@@ -0,0 +1,135 @@
+"""
+Пул для CPU-нагрузки поиска (ранжирование, свертки векторов)
+
+Пул потоков принадлежит lifespan приложения. Задача получает только
+собственные массивы, собранные в event loop: матрицы float32, копии колонок
+индекса, собранную CSR-матрицу навыков - индекс, который патчится в event
+loop, из пула не читается. В потоках идут лишь матричные операции
+NumPy/SciPy, отпускающие GIL, а результат собирается снова в event loop.
+Небольшие задачи выполняются на месте: передача в пул для них дороже
+самих вычислений.
+"""
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import settings
+from app.utils.exceptions import SearchOverloadedError
+
+
+class CpuPool:
+    """Пул потоков с ограничением очереди и счетчиками"""
+    
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="search-cpu")
+        # Допуск в пул: выполняемые задачи плюс очередь
+        self._slots = asyncio.Semaphore(workers + max_queue)
+        # running и время ожидания меняются из потоков пула
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.running = 0
+        self.max_queue_depth = 0
+        self.submitted = 0
+        self.completed = 0
+        self.inline = 0
+        self.rejected = 0
+        self.total_wait_seconds = 0.0
+    
+    @property
+    def queue_depth(self) -> int:
+        """Задачи, ожидающие свободного потока"""
+        return self.in_flight - self.running
+    
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Выполнить функцию в пуле; при заполненной очереди ждать слот не дольше
+        cpu_pool_queue_timeout_seconds, затем SearchOverloadedError"""
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=settings.cpu_pool_queue_timeout_seconds)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise SearchOverloadedError("Поиск перегружен, повторите запрос позже")
+        
+        self.in_flight += 1
+        self.submitted += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        queued_at = time.monotonic()
+        
+        def call():
+            with self._lock:
+                self.total_wait_seconds += time.monotonic() - queued_at
+                self.running += 1
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.running -= 1
+        
+        # run_in_executor не переносит contextvars (журнал запросов и т.п.) в поток
+        context = contextvars.copy_context()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, context.run, call)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self._slots.release()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Метрики пула: глубина очереди, отказы, среднее ожидание"""
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "running": self.running,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "inline": self.inline,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.total_wait_seconds / self.completed * 1000, 2) if self.completed else 0.0
+        }
+    
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+_pool: Optional[CpuPool] = None
+
+
+def start_cpu_pool() -> Optional[CpuPool]:
+    """Создать пул (вызывается из lifespan приложения)"""
+    global _pool
+    if _pool is None and settings.cpu_pool_workers > 0:
+        _pool = CpuPool(settings.cpu_pool_workers, settings.cpu_pool_max_queue)
+    return _pool
+
+
+def shutdown_cpu_pool() -> None:
+    """Дождаться текущих задач и остановить пул"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+
+
+async def run_cpu(size: int, func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Выполнить CPU-задачу: от cpu_pool_min_size элементов - в пуле, иначе на месте.
+
+    Без запущенного пула (скрипты, CLI) задача всегда выполняется на месте.
+    """
+    if _pool is None or size < settings.cpu_pool_min_size:
+        if _pool is not None:
+            _pool.inline += 1
+        return func(*args, **kwargs)
+    return await _pool.run(partial(func, *args, **kwargs))
+
+
+def get_cpu_pool_stats() -> Optional[Dict[str, Any]]:
+    """Метрики пула или None, если пул не запущен"""
+    return _pool.stats() if _pool is not None else None
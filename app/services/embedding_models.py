@@ -0,0 +1,76 @@
+"""
+Определение активной модели эмбеддингов
+"""
+import time
+from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.embedding_generation import EmbeddingGeneration
+from app.repositories.embedding_generation import EmbeddingGenerationRepository
+from app.services.embedding_providers import LOCAL_MODEL_PREFIX, get_local_embedding_provider
+
+# Кэш на процесс: после переключения поколения остальные воркеры увидят
+# новую модель не позже чем через embedding_model_cache_ttl_seconds
+_model_cache = {"expires_at": 0.0, "active": None, "targets": []}
+
+
+async def _load_models(db: AsyncSession) -> None:
+    repo = EmbeddingGenerationRepository(db)
+    generations = await repo.get_all_generations()
+    
+    active = next(
+        (g.model for g in generations if g.status == EmbeddingGeneration.STATUS_ACTIVE),
+        settings.embedding_model
+    )
+    building = [g.model for g in generations if g.status == EmbeddingGeneration.STATUS_BUILDING]
+    
+    # Если локальная модель обучена, её эмбеддинги поддерживаются всегда:
+    # они нужны для режимов local/hybrid и как запасной вариант без SciBox.
+    # Активное поколение остается в списке и в локальном режиме, чтобы
+    # cleanup не удалил его векторы
+    local = get_local_embedding_provider()
+    targets = [active] + building
+    if local:
+        targets.append(local.model)
+    
+    _model_cache["active"] = active
+    _model_cache["targets"] = list(dict.fromkeys(targets))
+    _model_cache["expires_at"] = time.monotonic() + settings.embedding_model_cache_ttl_seconds
+
+
+async def get_active_embedding_model(db: AsyncSession) -> str:
+    """Модель, по эмбеддингам которой выполняется поиск"""
+    if _model_cache["active"] is None or time.monotonic() >= _model_cache["expires_at"]:
+        await _load_models(db)
+    return _model_cache["active"]
+
+
+async def get_search_embedding_model(db: AsyncSession) -> str:
+    """Модель, векторы которой сравниваются при поиске по сохраненным эмбеддингам
+    (в локальном режиме - локальная модель, иначе активное поколение)"""
+    local = get_local_embedding_provider()
+    if local and settings.embedding_provider == "local":
+        return local.model
+    return await get_active_embedding_model(db)
+
+
+async def get_target_embedding_models(db: AsyncSession) -> List[str]:
+    """Модели, для которых нужно поддерживать эмбеддинги: активная и строящиеся"""
+    if _model_cache["active"] is None or time.monotonic() >= _model_cache["expires_at"]:
+        await _load_models(db)
+    return list(_model_cache["targets"])
+
+
+async def get_computed_embedding_models(db: AsyncSession) -> List[str]:
+    """Модели, для которых воркеры пересчитывают эмбеддинги: целевые,
+    а в локальном режиме - только локальные (SciBox не вызывается совсем)"""
+    targets = await get_target_embedding_models(db)
+    if settings.embedding_provider == "local" and get_local_embedding_provider():
+        return [model for model in targets if model.startswith(LOCAL_MODEL_PREFIX)]
+    return targets
+
+
+def invalidate_embedding_model_cache() -> None:
+    """Сбросить кэш (после переключения поколения в текущем процессе)"""
+    _model_cache["expires_at"] = 0.0
@@ -0,0 +1,212 @@
+"""
+Провайдеры эмбеддингов: удаленный SciBox (bge-m3) и локальная CPU-модель
+
+Обучение локальной модели на корпусе профилей и расчет её эмбеддингов:
+    python -m app.services.embedding_providers fit --dimensions 256
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import time
+from typing import List, Optional
+
+import httpx
+import joblib
+import numpy as np
+
+from app.core.config import settings
+
+# Префикс имен локальных моделей: по нему выбирается провайдер
+LOCAL_MODEL_PREFIX = "local-"
+
+
+class EmbeddingProvider:
+    """Базовый провайдер эмбеддингов"""
+    
+    model: str
+    
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """Получить эмбеддинги для пачки текстов"""
+        raise NotImplementedError
+
+
+class SciBoxEmbeddingProvider(EmbeddingProvider):
+    """Эмбеддинги через OpenAI-совместимый API SciBox"""
+    
+    def __init__(self, model: str, timeout: float = 30.0):
+        self.model = model
+        self.timeout = timeout
+        self.api_key = settings.scibox_api_key
+        self.base_url = settings.scibox_base_url
+    
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        async with httpx.AsyncClient() as client:
+            response = await client.post(
+                f"{self.base_url}/embeddings",
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "model": self.model,
+                    "input": texts
+                },
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            data = response.json()
+            items = sorted(data["data"], key=lambda item: item.get("index", 0))
+            return [item["embedding"] for item in items]
+
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """Локальная модель: TF-IDF по символьным n-граммам + TruncatedSVD.
+
+    Обучается на наших же текстах профилей, работает на CPU без сети
+    и тратит на один текст доли миллисекунды. Для расчета хранится только
+    словарь TF-IDF и плотная матрица проекции (признаки x измерения).
+    """
+    
+    def __init__(self, model: str, vectorizer, projection: np.ndarray):
+        self.model = model
+        self.vectorizer = vectorizer
+        self.projection = np.ascontiguousarray(projection, dtype=np.float32)
+    
+    @classmethod
+    def fit(cls, corpus: List[str], dimensions: int) -> "LocalEmbeddingProvider":
+        """Обучить модель на корпусе текстов профилей"""
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.decomposition import TruncatedSVD
+        
+        if len(corpus) < 2:
+            raise ValueError("Для обучения локальной модели нужно хотя бы два профиля")
+        
+        vectorizer = TfidfVectorizer(
+            analyzer="char_wb",
+            ngram_range=(3, 5),
+            max_features=settings.local_embedding_max_features,
+            sublinear_tf=True,
+            lowercase=True,
+            dtype=np.float32
+        )
+        matrix = vectorizer.fit_transform(corpus)
+        
+        # Число компонент не может превышать размерность данных
+        components = max(1, min(dimensions, len(corpus) - 1, matrix.shape[1] - 1))
+        svd = TruncatedSVD(n_components=components, random_state=42)
+        svd.fit(matrix)
+        
+        # Имя модели зависит от корпуса и параметров: новое обучение - новое поколение
+        digest = hashlib.sha256()
+        for text in corpus:
+            digest.update(text.encode("utf-8"))
+        digest.update(str(components).encode("utf-8"))
+        model = f"{LOCAL_MODEL_PREFIX}svd{components}-{digest.hexdigest()[:8]}"
+        return cls(model, vectorizer, svd.components_.T)
+    
+    def save(self, path: str) -> None:
+        """Сохранить модель на диск"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        joblib.dump(
+            {"model": self.model, "vectorizer": self.vectorizer, "projection": self.projection},
+            tmp_path
+        )
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path: str) -> "LocalEmbeddingProvider":
+        """Загрузить модель с диска"""
+        artifact = joblib.load(path)
+        return cls(artifact["model"], artifact["vectorizer"], artifact["projection"])
+    
+    def embed_sync(self, texts: List[str]) -> np.ndarray:
+        """Синхронный расчет эмбеддингов (float32, нормированы по L2)"""
+        vectors = np.asarray(self.vectorizer.transform(texts) @ self.projection, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+    
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_sync(texts).tolist()
+
+
+_local_provider_cache = {"path": None, "mtime": None, "provider": None}
+
+
+def get_local_embedding_provider() -> Optional[LocalEmbeddingProvider]:
+    """Локальная модель, если она обучена; перечитывается при обновлении файла"""
+    path = settings.local_embedding_path
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    
+    if _local_provider_cache["path"] != path or _local_provider_cache["mtime"] != mtime:
+        try:
+            provider = LocalEmbeddingProvider.load(path)
+        except Exception as e:
+            print(f"Ошибка загрузки локальной модели эмбеддингов: {e}")
+            return None
+        _local_provider_cache.update({"path": path, "mtime": mtime, "provider": provider})
+    return _local_provider_cache["provider"]
+
+
+def get_embedding_provider(model: str = None) -> EmbeddingProvider:
+    """Провайдер для модели: локальные модели распознаются по префиксу имени"""
+    model = model or settings.embedding_model
+    if model.startswith(LOCAL_MODEL_PREFIX):
+        provider = get_local_embedding_provider()
+        if provider is None or provider.model != model:
+            raise ValueError(f"Локальная модель эмбеддингов {model} недоступна")
+        return provider
+    return SciBoxEmbeddingProvider(model)
+
+
+async def _fit_local_model(dimensions: int) -> None:
+    """Обучить локальную модель на текстах профилей и посчитать эмбеддинги всем сотрудникам"""
+    from sqlalchemy import select
+    from sqlalchemy.orm import selectinload
+    
+    from app.core.database import AsyncSessionLocal
+    from app.models.employee import Employee
+    from app.repositories.employee_embedding import EmployeeEmbeddingRepository
+    from app.services.profile_document import profile_document_builder
+    
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Employee).options(
+                selectinload(Employee.skills),
+                selectinload(Employee.work_experiences)
+            )
+        )
+        documents = [profile_document_builder.build(emp) for emp in result.scalars().all()]
+        
+        started = time.monotonic()
+        provider = LocalEmbeddingProvider.fit([document.text for document in documents], dimensions)
+        provider.save(settings.local_embedding_path)
+        print(f"Модель {provider.model} обучена на {len(documents)} профилях за {time.monotonic() - started:.1f} с")
+        
+        started = time.monotonic()
+        vectors = provider.embed_sync([document.text for document in documents])
+        embedding_repo = EmployeeEmbeddingRepository(db)
+        for document, vector in zip(documents, vectors):
+            await embedding_repo.create_or_update_embedding(
+                document.employee_id,
+                vector.tolist(),
+                document.text,
+                document.content_hash(provider.model),
+                provider.model
+            )
+        elapsed = time.monotonic() - started
+        print(f"Локальные эмбеддинги сохранены: {len(documents)} за {elapsed:.1f} с")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Локальная модель эмбеддингов")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    fit_parser = subparsers.add_parser("fit")
+    fit_parser.add_argument("--dimensions", type=int, default=settings.local_embedding_dimensions)
+    args = parser.parse_args()
+    asyncio.run(_fit_local_model(args.dimensions))
@@ -0,0 +1,147 @@
+"""
+Фоновые воркеры очереди пересчета эмбеддингов
+
+Запуск отдельным процессом:
+    python -m app.services.embedding_queue --workers 2
+
+Поставить в очередь всех сотрудников (платно только для изменившихся профилей):
+    python -m app.services.embedding_queue --reembed-all
+"""
+import argparse
+import asyncio
+import os
+import socket
+from typing import List, Optional
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.employee import Employee
+from app.repositories.embedding_job import EmbeddingJobRepository
+from app.services.employee import EmployeeService
+from app.services.index_snapshot import append_snapshot_delta
+
+
+class EmbeddingWorker:
+    """Воркер, разбирающий очередь embedding_jobs"""
+    
+    def __init__(
+        self,
+        worker_id: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        poll_interval: Optional[float] = None
+    ):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.batch_size = batch_size or settings.embedding_worker_batch_size
+        self.poll_interval = poll_interval or settings.embedding_worker_poll_interval
+        self._stop_event = asyncio.Event()
+    
+    def stop(self) -> None:
+        """Попросить воркер остановиться после текущей пачки"""
+        self._stop_event.set()
+    
+    async def run(self) -> None:
+        """Основной цикл воркера"""
+        while not self._stop_event.is_set():
+            try:
+                processed = await self.run_once()
+            except Exception as e:
+                print(f"Ошибка воркера эмбеддингов {self.worker_id}: {e}")
+                processed = 0
+            
+            if processed == 0:
+                try:
+                    await asyncio.wait_for(self._stop_event.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+    
+    async def run_once(self) -> int:
+        """Захватить и обработать одну пачку задач"""
+        async with AsyncSessionLocal() as db:
+            jobs = await EmbeddingJobRepository(db).claim_batch(
+                self.worker_id,
+                self.batch_size,
+                settings.embedding_job_lease_seconds
+            )
+            claimed = [(job.id, job.employee_id, job.generation, job.attempts) for job in jobs]
+        
+        for job_id, employee_id, generation, attempts in claimed:
+            await self._process_job(job_id, employee_id, generation, attempts)
+        
+        return len(claimed)
+    
+    async def _process_job(self, job_id: int, employee_id: int, generation: int, attempts: int) -> None:
+        """Пересчитать эмбеддинг одного сотрудника"""
+        async with AsyncSessionLocal() as db:
+            job_repo = EmbeddingJobRepository(db)
+            try:
+                await EmployeeService(db).refresh_employee_embedding(employee_id)
+            except Exception as e:
+                await db.rollback()
+                print(f"Ошибка пересчета эмбеддинга для сотрудника {employee_id}: {e}")
+                await job_repo.fail(
+                    job_id,
+                    attempts,
+                    str(e),
+                    settings.embedding_job_retry_base_seconds,
+                    settings.embedding_job_max_attempts
+                )
+            else:
+                await job_repo.complete(job_id, generation)
+                try:
+                    await append_snapshot_delta(db, employee_id)
+                except Exception as e:
+                    print(f"Ошибка записи журнала снимка индекса для сотрудника {employee_id}: {e}")
+
+
+def start_embedding_workers(count: Optional[int] = None) -> List[tuple]:
+    """Запустить воркеры в текущем event loop (используется в lifespan приложения)"""
+    count = settings.embedding_worker_count if count is None else count
+    workers = []
+    for index in range(count):
+        worker = EmbeddingWorker(worker_id=f"{socket.gethostname()}:{os.getpid()}:{index}")
+        workers.append((worker, asyncio.create_task(worker.run())))
+    return workers
+
+
+async def stop_embedding_workers(workers: List[tuple]) -> None:
+    """Остановить воркеры и дождаться завершения текущих задач"""
+    for worker, _ in workers:
+        worker.stop()
+    await asyncio.gather(*(task for _, task in workers), return_exceptions=True)
+
+
+async def enqueue_all_employees() -> int:
+    """Поставить всех сотрудников в очередь на пересчет.
+
+    Неизменившиеся профили отсекаются по content_hash без обращения к API.
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(Employee.id))
+        employee_ids = list(result.scalars().all())
+        await EmbeddingJobRepository(db).enqueue_many(employee_ids)
+    return len(employee_ids)
+
+
+async def _main(worker_count: int) -> None:
+    workers = start_embedding_workers(worker_count)
+    try:
+        await asyncio.gather(*(task for _, task in workers))
+    finally:
+        await stop_embedding_workers(workers)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Воркеры пересчета эмбеддингов")
+    parser.add_argument("--workers", type=int, default=settings.embedding_worker_count)
+    parser.add_argument("--reembed-all", action="store_true", help="Поставить в очередь всех сотрудников и выйти")
+    args = parser.parse_args()
+    if args.reembed_all:
+        count = asyncio.run(enqueue_all_employees())
+        print(f"Поставлено в очередь сотрудников: {count}")
+        raise SystemExit(0)
+    try:
+        asyncio.run(_main(args.workers))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,224 @@
+"""
+Онлайн-переиндексация эмбеддингов новой моделью
+
+Новое поколение строится в фоне, пока поиск читает активное:
+    python -m app.services.embedding_reindex start <model>
+    python -m app.services.embedding_reindex run <model>
+    python -m app.services.embedding_reindex cutover <model>
+    python -m app.services.embedding_reindex cleanup
+    python -m app.services.embedding_reindex status
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import List, Dict, Any
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.employee import Employee
+from app.models.embedding_generation import EmbeddingGeneration
+from app.repositories.embedding_generation import EmbeddingGenerationRepository
+from app.repositories.employee_embedding import EmployeeEmbeddingRepository
+from app.services.embedding_models import get_target_embedding_models, invalidate_embedding_model_cache
+from app.services.smart_search import SmartSearchService
+from app.services.profile_document import profile_document_builder
+from app.services.search_documents import sync_document_embeddings
+
+
+class EmbeddingReindexService:
+    """Построение, переключение и очистка поколений эмбеддингов"""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.generation_repo = EmbeddingGenerationRepository(db)
+        self.embedding_repo = EmployeeEmbeddingRepository(db)
+    
+    async def start(self, model: str) -> EmbeddingGeneration:
+        """Зарегистрировать новое поколение в статусе building.
+
+        С этого момента воркер очереди дописывает изменения профилей
+        и в новое поколение. Выведенное из эксплуатации или упавшее
+        поколение той же модели перезапускается со сброшенным прогрессом;
+        активное и строящееся возвращаются без изменений.
+        """
+        generation = await self.generation_repo.get_by_model(model)
+        if generation and (
+            generation.status == EmbeddingGeneration.STATUS_ACTIVE
+            or (generation.status == EmbeddingGeneration.STATUS_BUILDING and generation.last_error is None)
+        ):
+            return generation
+        
+        total = await self._count_employees()
+        if generation:
+            await self.generation_repo.restart(model, total)
+            invalidate_embedding_model_cache()
+            return await self.generation_repo.get_by_model(model)
+        
+        generation = await self.generation_repo.create({
+            "model": model,
+            "status": EmbeddingGeneration.STATUS_BUILDING,
+            "total": total
+        })
+        invalidate_embedding_model_cache()
+        return generation
+    
+    async def run(self, model: str, batch_size: int = None) -> Dict[str, Any]:
+        """Построить эмбеддинги поколения.
+
+        Можно перезапускать после сбоя: уже посчитанные профили
+        пропускаются по content_hash.
+        """
+        generation = await self.generation_repo.get_by_model(model)
+        if not generation or generation.status != EmbeddingGeneration.STATUS_BUILDING:
+            raise ValueError(f"Поколение {model} не находится в статусе building")
+        
+        batch_size = batch_size or settings.embedding_batch_size
+        smart_search = SmartSearchService()
+        total = await self._count_employees()
+        processed = 0
+        embedded = 0
+        last_id = 0
+        started = time.monotonic()
+        
+        try:
+            while True:
+                result = await self.db.execute(
+                    select(Employee)
+                    .options(
+                        selectinload(Employee.skills),
+                        selectinload(Employee.work_experiences)
+                    )
+                    .where(Employee.id > last_id)
+                    .order_by(Employee.id)
+                    .limit(batch_size)
+                )
+                employees = result.scalars().all()
+                if not employees:
+                    break
+                last_id = employees[-1].id
+                
+                documents = [profile_document_builder.build(emp) for emp in employees]
+                stored_hashes = await self.embedding_repo.get_content_hashes(
+                    [document.employee_id for document in documents],
+                    model
+                )
+                changed = [
+                    document for document in documents
+                    if stored_hashes.get(document.employee_id) != document.content_hash(model)
+                ]
+                
+                if changed:
+                    vectors = await smart_search._get_embeddings([document.text for document in changed], model)
+                    for document, vector in zip(changed, vectors):
+                        await self.embedding_repo.create_or_update_embedding(
+                            document.employee_id,
+                            vector,
+                            document.text,
+                            document.content_hash(model),
+                            model
+                        )
+                
+                processed += len(employees)
+                embedded += len(changed)
+                await self.generation_repo.update_progress(model, total, processed, embedded)
+                
+                elapsed = time.monotonic() - started
+                rate = processed / elapsed if elapsed > 0 else 0.0
+                print(f"[{model}] {processed}/{total} профилей, пересчитано {embedded}, {rate:.1f} профилей/с")
+        except Exception as e:
+            await self.db.rollback()
+            await self.generation_repo.mark_finished(model, error=str(e))
+            raise
+        
+        await self.generation_repo.mark_finished(model)
+        return await self._generation_status(await self.generation_repo.get_by_model(model))
+    
+    async def cutover(self, model: str, force: bool = False) -> None:
+        """Атомарно переключить поиск на новое поколение"""
+        generation = await self.generation_repo.get_by_model(model)
+        if not generation:
+            raise ValueError(f"Поколение {model} не найдено")
+        if generation.status == EmbeddingGeneration.STATUS_ACTIVE:
+            return
+        if not force and (generation.finished_at is None or generation.processed < generation.total):
+            raise ValueError(f"Поколение {model} построено не полностью ({generation.processed}/{generation.total})")
+        
+        await self.generation_repo.activate(model)
+        invalidate_embedding_model_cache()
+        # Документы поиска переходят на эмбеддинги новой модели
+        await sync_document_embeddings(self.db)
+    
+    async def cleanup(self) -> int:
+        """Удалить эмбеддинги выведенных из эксплуатации поколений.
+
+        Запускать не раньше чем через embedding_model_cache_ttl_seconds после
+        переключения, чтобы все воркеры успели перейти на новую модель.
+        Активное и строящиеся поколения сохраняются при любом провайдере.
+        """
+        invalidate_embedding_model_cache()
+        keep_models = await get_target_embedding_models(self.db)
+        return await self.embedding_repo.delete_except_models(keep_models)
+    
+    async def get_status(self) -> List[Dict[str, Any]]:
+        """Состояние всех поколений с прогрессом и скоростью построения"""
+        generations = await self.generation_repo.get_all_generations()
+        return [await self._generation_status(generation) for generation in generations]
+    
+    async def _generation_status(self, generation: EmbeddingGeneration) -> Dict[str, Any]:
+        end = generation.finished_at or datetime.now(timezone.utc)
+        elapsed = (end - generation.started_at).total_seconds() if generation.started_at else 0.0
+        return {
+            "model": generation.model,
+            "status": generation.status,
+            "total": generation.total,
+            "processed": generation.processed,
+            "embedded": generation.embedded,
+            "progress": round(generation.processed / generation.total, 3) if generation.total else 1.0,
+            "throughput_per_second": round(generation.processed / elapsed, 2) if elapsed > 0 else 0.0,
+            "last_error": generation.last_error,
+            "started_at": generation.started_at,
+            "finished_at": generation.finished_at,
+            "activated_at": generation.activated_at
+        }
+    
+    async def _count_employees(self) -> int:
+        result = await self.db.execute(select(func.count(Employee.id)))
+        return result.scalar_one()
+
+
+async def _main(args: argparse.Namespace) -> None:
+    async with AsyncSessionLocal() as db:
+        service = EmbeddingReindexService(db)
+        if args.command == "start":
+            generation = await service.start(args.model)
+            print(f"Поколение {generation.model}: {generation.status}")
+        elif args.command == "run":
+            print(await service.run(args.model, args.batch_size))
+        elif args.command == "cutover":
+            await service.cutover(args.model, force=args.force)
+            print(f"Активная модель: {args.model}")
+        elif args.command == "cleanup":
+            print(f"Удалено эмбеддингов: {await service.cleanup()}")
+        else:
+            for status in await service.get_status():
+                print(status)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Переиндексация эмбеддингов")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for command in ("start", "run", "cutover"):
+        subparser = subparsers.add_parser(command)
+        subparser.add_argument("model")
+        if command == "run":
+            subparser.add_argument("--batch-size", type=int, default=None)
+        if command == "cutover":
+            subparser.add_argument("--force", action="store_true")
+    subparsers.add_parser("cleanup")
+    subparsers.add_parser("status")
+    asyncio.run(_main(parser.parse_args()))
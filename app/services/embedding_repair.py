@@ -0,0 +1,178 @@
+"""
+Воркер восстановления неудачных расчетов эмбеддингов
+
+Строки employee_embeddings со status = failed и истекшим retry_after
+захватываются пачками (FOR UPDATE SKIP LOCKED с арендой через retry_after,
+поэтому воркеры разных процессов не берут одни и те же строки) и
+пересчитываются: один запрос к API на пачку. Если API все еще
+недоступен, вся пачка получает следующую (удвоенную) задержку, и воркер
+ждет до следующего опроса.
+
+Запуск отдельным процессом и состояние эмбеддингов:
+    python -m app.services.embedding_repair run
+    python -m app.services.embedding_repair status
+"""
+import argparse
+import asyncio
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.employee import Employee
+from app.repositories.employee_embedding import EmployeeEmbeddingRepository
+from app.services.embedding_models import get_computed_embedding_models
+from app.services.embedding_providers import get_embedding_provider
+from app.services.index_snapshot import append_snapshot_delta
+from app.services.profile_document import profile_document_builder
+from app.services.search_documents import sync_document_embeddings
+
+
+class EmbeddingRepairWorker:
+    """Воркер, пересчитывающий эмбеддинги после ошибок API"""
+
+    def __init__(self, batch_size: Optional[int] = None, poll_interval: Optional[float] = None):
+        self.batch_size = batch_size or settings.embedding_repair_batch_size
+        self.poll_interval = poll_interval or settings.embedding_repair_poll_interval
+        self.repaired = 0
+        self.failed = 0
+        self._stop_event = asyncio.Event()
+
+    def stop(self) -> None:
+        """Попросить воркер остановиться после текущей пачки"""
+        self._stop_event.set()
+
+    async def run(self) -> None:
+        """Основной цикл: пачки подряд, пока есть что чинить, иначе ожидание"""
+        while not self._stop_event.is_set():
+            try:
+                processed = await self.run_once()
+            except Exception as e:
+                print(f"Ошибка воркера восстановления эмбеддингов: {e}")
+                processed = 0
+
+            if processed == 0:
+                try:
+                    await asyncio.wait_for(self._stop_event.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def run_once(self) -> int:
+        """Пересчитать одну пачку; возвращает число восстановленных эмбеддингов"""
+        async with AsyncSessionLocal() as db:
+            embedding_repo = EmployeeEmbeddingRepository(db)
+            due = await embedding_repo.claim_due_failures(
+                await get_computed_embedding_models(db),
+                self.batch_size,
+                settings.embedding_repair_lease_seconds
+            )
+            if not due:
+                return 0
+
+            ids_by_model: Dict[str, List[int]] = defaultdict(list)
+            for employee_id, model in due:
+                ids_by_model[model].append(employee_id)
+
+            result = await db.execute(
+                select(Employee)
+                .options(
+                    selectinload(Employee.skills),
+                    selectinload(Employee.work_experiences)
+                )
+                .where(Employee.id.in_({employee_id for employee_id, _ in due}))
+            )
+            documents = {emp.id: profile_document_builder.build(emp) for emp in result.scalars().all()}
+
+            repaired_ids = set()
+            for model, employee_ids in ids_by_model.items():
+                batch = [documents[employee_id] for employee_id in employee_ids if employee_id in documents]
+                if not batch:
+                    continue
+                try:
+                    vectors = await get_embedding_provider(model).embed([document.text for document in batch])
+                except Exception as e:
+                    # API все еще недоступен: следующая попытка - после удвоенной задержки
+                    self.failed += len(batch)
+                    await embedding_repo.mark_failed(
+                        [(document.employee_id, document.text) for document in batch],
+                        model,
+                        str(e),
+                        settings.embedding_failure_retry_base_seconds,
+                        settings.embedding_failure_retry_max_seconds
+                    )
+                    continue
+
+                for document, vector in zip(batch, vectors):
+                    if not vector:
+                        self.failed += 1
+                        await embedding_repo.mark_failed(
+                            [(document.employee_id, document.text)],
+                            model,
+                            "API вернул пустой эмбеддинг",
+                            settings.embedding_failure_retry_base_seconds,
+                            settings.embedding_failure_retry_max_seconds
+                        )
+                        continue
+                    await embedding_repo.create_or_update_embedding(
+                        document.employee_id,
+                        vector,
+                        document.text,
+                        document.content_hash(model),
+                        model
+                    )
+                    repaired_ids.add(document.employee_id)
+
+            if repaired_ids:
+                self.repaired += len(repaired_ids)
+                try:
+                    await sync_document_embeddings(db, sorted(repaired_ids))
+                    for employee_id in sorted(repaired_ids):
+                        await append_snapshot_delta(db, employee_id)
+                except Exception as e:
+                    # Поиск возьмет эмбеддинг из employee_embeddings
+                    await db.rollback()
+                    print(f"Ошибка обновления документов поиска после восстановления эмбеддингов: {e}")
+        return len(repaired_ids)
+
+
+def start_embedding_repair_worker() -> tuple:
+    """Запустить воркер в текущем event loop (используется в lifespan приложения)"""
+    worker = EmbeddingRepairWorker()
+    return worker, asyncio.create_task(worker.run())
+
+
+async def stop_embedding_repair_worker(worker: EmbeddingRepairWorker, task: asyncio.Task) -> None:
+    """Остановить воркер и дождаться завершения текущей пачки"""
+    worker.stop()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+async def _main(args: argparse.Namespace) -> None:
+    if args.command == "status":
+        async with AsyncSessionLocal() as db:
+            states = await EmployeeEmbeddingRepository(db).count_by_state()
+        for row in states:
+            print(f"{row['model']:<40} {row['state']:<16} {row['count']:>8} (с вектором: {row['with_vector']})")
+        return
+
+    worker = EmbeddingRepairWorker(args.batch_size)
+    if args.once:
+        print(f"Восстановлено эмбеддингов: {await worker.run_once()}")
+        return
+    await worker.run()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Восстановление неудачных расчетов эмбеддингов")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run")
+    run_parser.add_argument("--batch-size", type=int, default=None)
+    run_parser.add_argument("--once", action="store_true")
+
+    subparsers.add_parser("status")
+
+    asyncio.run(_main(parser.parse_args()))
@@ -5,9 +5,11 @@ from typing import List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, or_
 
+from app.core.config import settings
 from app.repositories.employee import EmployeeRepository
 from app.repositories.skill import SkillRepository
 from app.repositories.employee_embedding import EmployeeEmbeddingRepository
+from app.repositories.embedding_job import EmbeddingJobRepository
 from app.models.employee import Employee
 from app.models.skill import Skill
 from app.models.work_experience import WorkExperience
@@ -17,6 +19,20 @@ from app.schemas.work_experience import WorkExperienceCreate
 from app.schemas.education import EducationCreate
 from app.services.gamification import GamificationService
 from app.services.smart_search import SmartSearchService
+from app.services.embedding_models import get_computed_embedding_models
+from app.services.search_index import invalidate_search_index
+from app.services.saved_search import SavedSearchService
+from app.services.section_embeddings import SectionEmbeddingService
+from app.services.search_documents import sync_document_embeddings
+from app.services.spell_correction import correct_query
+from app.services.profile_document import (
+    profile_document_builder,
+    SECTION_HEADER,
+    SECTION_SKILLS,
+    SECTION_BIO,
+    SECTION_WORK_EXPERIENCE
+)
+from app.utils.exceptions import AIServiceError
 from datetime import datetime
 
 
@@ -28,6 +44,7 @@ class EmployeeService:
         self.employee_repo = EmployeeRepository(db)
         self.skill_repo = SkillRepository(db)
         self.embedding_repo = EmployeeEmbeddingRepository(db)
+        self.embedding_job_repo = EmbeddingJobRepository(db)
         self.gamification_service = GamificationService(db)
     
     def _calculate_experience_years(self, work_experiences: List[WorkExperience]) -> int:
@@ -114,62 +131,100 @@ class EmployeeService:
         
         return EmployeeProfile(**profile_data)
     
-    async def _update_employee_embedding(self, employee: Employee):
-        """Обновить эмбеддинг сотрудника"""
-        try:
-            smart_search = SmartSearchService()
+    async def refresh_employee_embedding(self, employee_id: int) -> bool:
+        """Пересчитать эмбеддинг сотрудника (выполняется воркером очереди).
+
+        Эмбеддинг обновляется для активного поколения и для всех строящихся,
+        чтобы переиндексация не теряла изменения, сделанные во время неё.
+        Возвращает False, если текст профиля не изменился и обращение
+        к API эмбеддингов не понадобилось. При включенных векторах секций
+        пересчитываются и они.
+        """
+        # Задача ставится после изменения профиля: секции, отрисованные по данным,
+        # прочитанным параллельно с записью, не должны попасть в хеш
+        profile_document_builder.invalidate(employee_id)
+        employee = await self.employee_repo.get_with_profile_relations(employee_id)
+        if not employee:
+            return False
+        
+        smart_search = SmartSearchService()
+        
+        # Создаем текст профиля для эмбеддинга
+        document = profile_document_builder.build(employee)
+        
+        refreshed = False
+        for model in await get_computed_embedding_models(self.db):
+            content_hash = document.content_hash(model)
             
-            # Создаем текст профиля для эмбеддинга
-            profile_text = self._build_profile_text(employee)
+            if settings.section_embeddings_enabled:
+                if await SectionEmbeddingService(self.db).refresh(employee, model):
+                    refreshed = True
             
-            # Получаем эмбеддинг
-            embedding = await smart_search._get_embedding(profile_text)
+            # Профиль не изменился с прошлого пересчета - API не вызываем
+            stored_hashes = await self.embedding_repo.get_content_hashes([employee_id], model)
+            if stored_hashes.get(employee_id) == content_hash:
+                continue
+            
+            # Получаем эмбеддинг; ошибку записываем, чтобы поиск не повторял её сам
+            embedding = await smart_search._get_embedding(document.text, model)
+            if not embedding:
+                await self.embedding_repo.mark_failed(
+                    [(employee.id, document.text)],
+                    model,
+                    "Не удалось получить эмбеддинг",
+                    settings.embedding_failure_retry_base_seconds,
+                    settings.embedding_failure_retry_max_seconds
+                )
+                raise AIServiceError(f"Не удалось получить эмбеддинг для сотрудника {employee_id}")
             
             # Сохраняем в базу
             await self.embedding_repo.create_or_update_embedding(
                 employee.id, 
                 embedding, 
-                profile_text
+                document.text,
+                content_hash,
+                model
             )
-        except Exception as e:
-            # Логируем ошибку, но не прерываем выполнение
-            print(f"Ошибка при обновлении эмбеддинга для сотрудника {employee.id}: {e}")
-    
-    def _build_profile_text(self, employee: Employee) -> str:
-        """Создать текст профиля для эмбеддинга"""
-        parts = [
-            f"Должность: {employee.position or 'Не указана'}",
-            f"Отдел: {employee.department or 'Не указан'}",
-            f"Опыт работы: {employee.experience_years} лет",
-        ]
-        
-        if employee.bio:
-            parts.append(f"О себе: {employee.bio}")
+            refreshed = True
+            
+            try:
+                # Точка сохранения: откат не затрагивает остальные объекты сессии
+                async with self.db.begin_nested():
+                    await SavedSearchService(self.db).match_employee(employee.id, model, embedding)
+            except Exception as e:
+                # Эмбеддинг уже сохранен, ошибка сопоставления не должна ронять задачу
+                print(f"Ошибка сопоставления с сохраненными поисками для сотрудника {employee_id}: {e}")
         
-        try:
-            if hasattr(employee, 'skills') and employee.skills:
-                skills_text = ", ".join([skill.name for skill in employee.skills])
-                parts.append(f"Навыки: {skills_text}")
-        except Exception:
-            pass
+        if refreshed:
+            try:
+                async with self.db.begin_nested():
+                    await sync_document_embeddings(self.db, [employee_id])
+            except Exception as e:
+                # Поиск возьмет эмбеддинг из employee_embeddings
+                print(f"Ошибка обновления документа поиска для сотрудника {employee_id}: {e}")
         
-        # Добавляем информацию о работе
+        return refreshed
+    
+    async def _enqueue_embedding_refresh(self, employee_id: int, *sections: str) -> None:
+        """Поставить пересчет эмбеддинга в очередь вместо синхронного вызова.
+
+        sections - изменившиеся секции профиля, их версии увеличиваются.
+        """
+        profile_document_builder.invalidate(employee_id, *sections)
+        if not settings.search_index_listener_enabled:
+            # Со слушателем индекс обновляется точечно по NOTIFY на всех узлах
+            invalidate_search_index()
         try:
-            if hasattr(employee, 'work_experiences') and employee.work_experiences:
-                work_parts = []
-                for work_exp in employee.work_experiences:
-                    work_info = f"Компания: {work_exp.company_name}"
-                    if work_exp.position:
-                        work_info += f", Позиция: {work_exp.position}"
-                    if work_exp.description:
-                        work_info += f", Описание: {work_exp.description}"
-                    work_parts.append(work_info)
-                if work_parts:
-                    parts.append(f"Опыт работы: {'; '.join(work_parts)}")
-        except Exception:
-            pass
-        
-        return " ".join(parts)
+            # Точка сохранения вместо отката всей сессии: объекты сотрудника
+            # не истекают, и начисление опыта после сохранения профиля работает
+            async with self.db.begin_nested():
+                await self.embedding_job_repo.enqueue(
+                    employee_id,
+                    settings.embedding_job_debounce_seconds
+                )
+        except Exception as e:
+            # Логируем ошибку, но не прерываем выполнение
+            print(f"Ошибка постановки в очередь эмбеддинга для сотрудника {employee_id}: {e}")
     
     async def update_employee(self, employee_id: int, update_data: EmployeeUpdate) -> Optional[Employee]:
         """Обновить данные сотрудника"""
@@ -180,9 +235,9 @@ class EmployeeService:
         update_dict = update_data.dict(exclude_unset=True)
         updated_employee = await self.employee_repo.update(employee, update_dict)
         
-        # Обновляем эмбеддинг после изменения профиля
+        # Ставим пересчет эмбеддинга в очередь после изменения профиля
         if updated_employee:
-            await self._update_employee_embedding(updated_employee)
+            await self._enqueue_embedding_refresh(updated_employee.id, SECTION_HEADER, SECTION_BIO)
             
             await self.gamification_service.add_xp(updated_employee, 25, "Обновление профиля")
         
@@ -197,9 +252,9 @@ class EmployeeService:
         skill = await self.skill_repo.get_or_create(skill_name)
         updated_employee = await self.employee_repo.add_skill(employee, skill)
         
-        # Обновляем эмбеддинг после добавления навыка
+        # Ставим пересчет эмбеддинга в очередь после добавления навыка
         if updated_employee:
-            await self._update_employee_embedding(updated_employee)
+            await self._enqueue_embedding_refresh(updated_employee.id, SECTION_SKILLS)
             
             await self.gamification_service.add_xp(updated_employee, 15, f"Добавление навыка: {skill_name}")
         
@@ -213,7 +268,10 @@ class EmployeeService:
         if not employee or not skill:
             return None
         
-        return await self.employee_repo.remove_skill(employee, skill)
+        updated_employee = await self.employee_repo.remove_skill(employee, skill)
+        await self._enqueue_embedding_refresh(employee_id, SECTION_SKILLS)
+        
+        return updated_employee
     
     async def add_work_experience(self, employee_id: int, work_exp_data: WorkExperienceCreate) -> Optional[Employee]:
         """Добавить опыт работы"""
@@ -231,6 +289,7 @@ class EmployeeService:
         
         # Обновляем общий опыт работы сотрудника
         await self._update_employee_experience(employee_id)
+        await self._enqueue_embedding_refresh(employee_id, SECTION_WORK_EXPERIENCE, SECTION_HEADER)
         
         await self.gamification_service.add_xp(employee, 30, f"Добавление опыта работы: {work_exp_data.position}")
         
@@ -274,7 +333,7 @@ class EmployeeService:
             if "department" in filters:
                 employees = [e for e in employees if e.department == filters["department"]]
             if "skills" in filters:
-                skill_names = filters["skills"]
+                skill_names = [await correct_query(self.db, skill) for skill in filters["skills"]]
                 employees = await self.employee_repo.search_by_skills(skill_names)
         
         return employees
@@ -0,0 +1,83 @@
+"""
+Фасетный поиск сотрудников
+"""
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.repositories.faceted_search import FacetedSearchRepository
+from app.services.search_index import get_search_index, FACETS, FACET_SKILL
+from app.services.skill_query import Or, Term
+from app.services.smart_search import SmartSearchService
+from app.utils.exceptions import SearchOverloadedError
+
+
+class FacetedSearchService:
+    """Поиск с фасетными счетчиками по битовым картам индекса.
+
+    Найденный набор - все сотрудники хотя бы с одним навыком запроса
+    (OR битовых карт навыков), ранжированные умным поиском; если навыков
+    из индекса в запросе нет - первые faceted_search_candidates семантического
+    поиска. Набор хранится в базе, поэтому уточнение по search_id работает
+    на любом воркере и не перезапускает поиск.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def search(
+        self,
+        query: Optional[str],
+        filters: Dict[str, List[str]],
+        search_id: Optional[str] = None,
+        limit: int = 20
+    ) -> Dict[str, Any]:
+        """Выполнить поиск (или уточнить ранее найденный набор) и посчитать фасеты"""
+        filters = {facet: values for facet, values in filters.items() if facet in FACETS and values}
+
+        repo = FacetedSearchRepository(self.db)
+        entry = await repo.get_valid(search_id) if search_id else None
+        if entry is None:
+            if not query:
+                raise ValueError("Не указан запрос или search_id устарел")
+            ranked = await self._rank_matches(query)
+            entry = await repo.save(query, ranked, settings.faceted_search_cache_ttl_seconds)
+
+        index = await get_search_index(self.db)
+        candidates = index.bitmap_for_ids(item["id"] for item in entry.ranked)
+        selected = candidates & index.filter_bitmap(filters)
+
+        # Порядок результатов - по релевантности из исходного поиска
+        selected_ids = set(index.ids_for_bitmap(selected))
+        ranked = [item for item in entry.ranked if item["id"] in selected_ids]
+
+        return {
+            "search_id": entry.id,
+            "query": entry.query,
+            "filters": filters,
+            "total": len(ranked),
+            "results": await SmartSearchService(self.db).hydrate_results(ranked[:limit]),
+            "facets": index.facet_counts(candidates, filters)
+        }
+
+    async def _rank_matches(self, query: str) -> List[Dict[str, Any]]:
+        """Ранжированный набор кандидатов: ID и оценки без полей выдачи"""
+        smart_search = SmartSearchService(self.db)
+        parsed_query = await smart_search.prepare_query(query)
+        index = await get_search_index(self.db)
+        matched = Or([Term(FACET_SKILL, skill) for skill in parsed_query["skills"]]).evaluate(index)
+        candidate_ids = index.ids_for_bitmap(matched) if matched else None
+
+        try:
+            ranked = await smart_search.rank_semantic(parsed_query, candidate_ids)
+        except SearchOverloadedError:
+            raise
+        except Exception as e:
+            # Без ранжирования набор остается полным, порядок - по ID
+            print(f"Ошибка ранжирования фасетного поиска: {e}")
+            ranked = [{"id": employee_id, "relevance_score": 0.0} for employee_id in candidate_ids or []]
+
+        if candidate_ids is None:
+            ranked = ranked[:settings.faceted_search_candidates]
+        return ranked
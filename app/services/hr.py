@@ -1,16 +1,26 @@
 """
 Сервис HR
 """
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from sqlalchemy.orm import selectinload
 
 from app.repositories.employee import EmployeeRepository
+from app.repositories.employee_embedding import EmployeeEmbeddingRepository
+from app.repositories.search_document import SearchDocumentRepository
 from app.services.ai_assistant import AIAssistantService
 from app.services.smart_search import SmartSearchService
+from app.services.embedding_reindex import EmbeddingReindexService
+from app.services.faceted_search import FacetedSearchService
+from app.services.saved_search import SavedSearchService
+from app.services.skill_query import SkillQueryService
+from app.services.similar_employees import SimilarEmployeesService
+from app.services.search_index import get_search_index
+from app.services.spell_correction import correct_query
 from app.models.employee import Employee
 from app.models.skill import Skill
+from app.utils.exceptions import SearchOverloadedError
 
 
 class HRService:
@@ -27,27 +37,55 @@ class HRService:
             # Создаем экземпляр умного поиска
             smart_search = SmartSearchService(self.db)
             return await smart_search.smart_search_employees(query)
+        except SearchOverloadedError:
+            raise
         except Exception as e:
             print(f"Ошибка в умном поиске: {e}")
             # Fallback к простому поиску
             return await self._fallback_search(query)
     
+    async def faceted_search(
+        self,
+        query: Optional[str],
+        filters: Dict[str, List[str]],
+        search_id: Optional[str] = None,
+        limit: int = 20
+    ) -> Dict[str, Any]:
+        """Поиск с фасетами; с search_id уточняет ранее найденный набор кандидатов"""
+        return await FacetedSearchService(self.db).search(query, filters, search_id, limit)
+    
+    async def skill_query_search(self, query: str, rank: bool = False, limit: int = 20) -> Dict[str, Any]:
+        """Поиск по языку запросов навыков: (Python OR Go) AND Kubernetes AND NOT 1C"""
+        return await SkillQueryService(self.db).search(query, rank, limit)
+    
+    async def find_similar_employees(self, employee_id: int, limit: int = 10) -> Optional[List[Dict[str, Any]]]:
+        """Сотрудники, похожие на заданного (по сохраненному эмбеддингу)"""
+        return await SimilarEmployeesService(self.db).find_similar(employee_id, limit)
+    
+    async def create_saved_search(self, name: str, query: str, threshold: Optional[float] = None) -> Dict[str, Any]:
+        """Сохранить поиск для отслеживания новых совпадений"""
+        return await SavedSearchService(self.db).create_saved_search(name, query, threshold)
+    
+    async def get_saved_searches(self) -> List[Dict[str, Any]]:
+        """Получить сохраненные поиски с количеством новых совпадений"""
+        return await SavedSearchService(self.db).get_saved_searches()
+    
+    async def get_saved_search_matches(self, saved_search_id: int, only_new: bool = True) -> Optional[Dict[str, Any]]:
+        """Получить совпадения сохраненного поиска"""
+        return await SavedSearchService(self.db).get_matches(saved_search_id, only_new)
+    
+    async def delete_saved_search(self, saved_search_id: int) -> bool:
+        """Удалить сохраненный поиск"""
+        return await SavedSearchService(self.db).delete_saved_search(saved_search_id)
+    
     async def _fallback_search(self, query: str) -> List[Dict[str, Any]]:
         """Простой поиск как fallback"""
         try:
-            # Парсим строку запроса в список навыков
+            # Парсим строку запроса в список навыков (с исправленными опечатками)
+            query = await correct_query(self.db, query)
             skill_names = [skill.strip() for skill in query.replace(',', ' ').split() if skill.strip()]
-            employees = await self.employee_repo.search_by_skills(skill_names)
-            
-            # Предзагружаем навыки для всех найденных сотрудников
-            if employees:
-                employee_ids = [emp.id for emp in employees]
-                result = await self.db.execute(
-                    select(Employee)
-                    .options(selectinload(Employee.skills))
-                    .where(Employee.id.in_(employee_ids))
-                )
-                employees = result.scalars().all()
+            # Только read-модель: допущенные к поиску документы с совпадающим навыком
+            employees = await SearchDocumentRepository(self.db).search_by_skills(skill_names)
             
             # Формируем результат в том же формате
             result = []
@@ -58,7 +96,7 @@ class HRService:
                     "position": emp.position,
                     "department": emp.department,
                     "experience_years": emp.experience_years,
-                    "skills": [skill.name for skill in emp.skills],
+                    "skills": list(emp.skills),
                     "level": emp.level,
                     "xp_points": emp.xp_points,
                     "relevance_score": 1.0,
@@ -73,15 +111,17 @@ class HRService:
             print(f"Ошибка в fallback поиске: {e}")
             return []
     
-    async def get_all_employees(self, skip: int = 0, limit: int = 100) -> List[Employee]:
-        """Получить всех сотрудников"""
-        result = await self.db.execute(
-            select(Employee)
-            .options(selectinload(Employee.skills))
-            .offset(skip)
-            .limit(limit)
-        )
-        return result.scalars().all()
+    async def get_embedding_generations(self) -> List[Dict[str, Any]]:
+        """Получить состояние поколений эмбеддингов (прогресс переиндексации)"""
+        return await EmbeddingReindexService(self.db).get_status()
+    
+    async def get_embedding_states(self) -> List[Dict[str, Any]]:
+        """Число эмбеддингов по моделям и состояниям (ready, failed_backoff, failed_due)"""
+        return await EmployeeEmbeddingRepository(self.db).count_by_state()
+    
+    async def get_all_employees(self, skip: int = 0, limit: int = 100) -> list:
+        """Получить всех сотрудников (строки документов поиска)"""
+        return await SearchDocumentRepository(self.db).get_page(skip, limit)
     
     async def get_employee_analytics(self) -> Dict[str, Any]:
         """Получить аналитику по сотрудникам"""
@@ -111,11 +151,17 @@ class HRService:
         # Топ навыков
         top_skills = sorted(skills_count.items(), key=lambda x: x[1], reverse=True)[:10]
         
+        # Редкие навыки среди участвующих в поиске: (навык, сотрудников, IDF)
+        # по той же TF-IDF матрице, что и ранжирование
+        index = await get_search_index(self.db)
+        rare_skills = index.skill_matrix.top_skills(10, rare=True)
+        
         return {
             "total_employees": len(employees),
             "departments": departments,
             "positions": positions,
             "top_skills": top_skills,
+            "rare_skills": rare_skills,
             "average_experience": sum(e.experience_years for e in employees) / len(employees) if employees else 0
         }
     
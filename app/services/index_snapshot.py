@@ -0,0 +1,505 @@
+"""
+Снимок индекса поиска на диске, общий для всех воркеров gunicorn
+
+Снимок - каталог с векторами первого этапа, ID сотрудников, колонками
+метаданных (.npy) и manifest.json. Воркеры открывают массивы через
+np.load(mmap_mode="r"): страницы делятся через page cache ОС, память
+расходуется один раз на хост, а перезапуск воркера не требует загрузки
+из базы. Изменения после снятия снимка пишет воркер эмбеддингов в delta.jsonl
+того же каталога; читатели дочитывают журнал с последней позиции. Каталог
+локален для хоста, а delta пишет только воркер, захвативший задачу, поэтому
+сотрудники с эмбеддингами, изменившимися после change_id манифеста (по журналу
+search_index_changes при открытии и по уведомлениям слушателя), считаются
+в процессе устаревшими: их строки не участвуют в первом этапе, и они проходят
+во второй этап без отбора. Изменения метаданных без пересчета эмбеддинга
+(is_active, отдел, уровень) в delta не попадают: индекс поиска дочитывает их
+из search_index_changes начиная с change_id манифеста.
+
+Построение снимка (например, по cron) и состояние:
+    python -m app.services.index_snapshot build
+    python -m app.services.index_snapshot status
+"""
+import argparse
+import asyncio
+import fcntl
+import heapq
+import json
+import os
+import shutil
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.repositories.employee import EmployeeRepository
+from app.repositories.employee_embedding import EmployeeEmbeddingRepository
+from app.repositories.search_index_change import SearchIndexChangeRepository
+
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+DELTA_FILE = "delta.jsonl"
+
+OP_UPSERT = "upsert"
+OP_DELETE = "delete"
+
+# Количество хранимых снимков: текущий и предыдущий (его еще могут читать воркеры)
+KEEP_SNAPSHOTS = 2
+
+
+class SnapshotMembership:
+    """Проверка "у сотрудника есть вектор первого этапа" без построения множества"""
+    
+    def __init__(self, snapshot: "IndexSnapshot"):
+        self.snapshot = snapshot
+    
+    def __contains__(self, employee_id: int) -> bool:
+        return self.snapshot.has_vector(employee_id)
+
+
+class IndexSnapshot:
+    """Снимок индекса, открытый только на чтение, с наложенным журналом изменений"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, MANIFEST_FILE), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        
+        self.version = self.manifest["version"]
+        self.model = self.manifest["model"]
+        self.vector_version = self.manifest["vector_version"]
+        self.dimensions = self.manifest["dimensions"]
+        self.departments = self.manifest["departments"]
+        self.skills = self.manifest["skills"]
+        
+        # ID отсортированы: строка сотрудника ищется через searchsorted
+        self.ids = self._load("ids")
+        self.vectors = self._load("vectors")
+        self.has_vectors = self._load("has_vectors")
+        self.department_codes = self._load("department_codes")
+        self.experience_years = self._load("experience_years")
+        self.levels = self._load("levels")
+        self.skill_indptr = self._load("skill_indptr")
+        self.skill_indices = self._load("skill_indices")
+        
+        self.deltas: Dict[int, dict] = {}
+        self._delta_offset = 0
+        self._overlay = None
+        # Сотрудники, чьи эмбеддинги изменились после снятия снимка (журнал этого хоста мог их не получить)
+        self.stale_ids: Set[int] = set()
+        self.stale_replayed = False
+        
+        self.first_stage = {
+            "model": self.model,
+            "version": self.vector_version,
+            "ids": self.ids,
+            "vectors": self.vectors,
+            "known": SnapshotMembership(self),
+            "snapshot": self
+        }
+    
+    def _load(self, name: str) -> np.ndarray:
+        return np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r")
+    
+    @property
+    def vectors_path(self) -> str:
+        return os.path.join(self.path, "vectors.npy")
+    
+    def row(self, employee_id: int) -> Optional[int]:
+        """Строка сотрудника в снимке"""
+        row = int(np.searchsorted(self.ids, employee_id))
+        if row < len(self.ids) and self.ids[row] == employee_id:
+            return row
+        return None
+    
+    def has_vector(self, employee_id: int) -> bool:
+        if employee_id in self.stale_ids:
+            return False
+        delta = self.deltas.get(employee_id)
+        if delta is not None:
+            return delta["op"] == OP_UPSERT and (delta.get("vector") is not None or self._base_has_vector(employee_id))
+        return self._base_has_vector(employee_id)
+    
+    def _base_has_vector(self, employee_id: int) -> bool:
+        row = self.row(employee_id)
+        return row is not None and bool(self.has_vectors[row])
+    
+    def refresh_deltas(self) -> None:
+        """Дочитать журнал изменений с последней прочитанной позиции"""
+        delta_path = os.path.join(self.path, DELTA_FILE)
+        try:
+            size = os.path.getsize(delta_path)
+        except OSError:
+            return
+        if size <= self._delta_offset:
+            return
+        
+        with open(delta_path, "rb") as f:
+            f.seek(self._delta_offset)
+            data = f.read(size - self._delta_offset)
+        
+        # Недописанную последнюю строку оставляем до следующего чтения
+        complete = data.rfind(b"\n") + 1
+        for line in data[:complete].splitlines():
+            if line.strip():
+                record = json.loads(line)
+                self.deltas[record["employee_id"]] = record
+        self._delta_offset += complete
+        if complete:
+            self._overlay = None
+    
+    def mark_stale(self, employee_ids: Iterable[int]) -> None:
+        """Не использовать векторы сотрудников из снимка и журнала до следующего снимка"""
+        added = set(employee_ids) - self.stale_ids
+        if added:
+            self.stale_ids |= added
+            self._overlay = None
+    
+    def _get_overlay(self) -> dict:
+        """Строки снимка, перекрытые журналом, и векторы из журнала"""
+        if self._overlay is None:
+            masked_rows = []
+            overlay_ids = []
+            overlay_vectors = []
+            for employee_id in self.stale_ids:
+                row = self.row(employee_id)
+                if row is not None:
+                    masked_rows.append(row)
+            for employee_id, delta in self.deltas.items():
+                if employee_id in self.stale_ids:
+                    continue
+                row = self.row(employee_id)
+                vector = delta.get("vector") if delta["op"] == OP_UPSERT else None
+                if vector is not None and len(vector) == self.dimensions:
+                    overlay_ids.append(employee_id)
+                    overlay_vectors.append(vector)
+                    if row is not None:
+                        masked_rows.append(row)
+                elif delta["op"] == OP_DELETE and row is not None:
+                    masked_rows.append(row)
+            self._overlay = {
+                "masked_rows": np.array(sorted(masked_rows), dtype=np.int64),
+                "masked_set": set(masked_rows),
+                "ids": np.array(overlay_ids, dtype=np.int64),
+                "vectors": (
+                    np.asarray(overlay_vectors, dtype=np.float32) if overlay_vectors
+                    else np.empty((0, self.dimensions), dtype=np.float32)
+                )
+            }
+        return self._overlay
+    
+    @property
+    def masked_count(self) -> int:
+        return len(self._get_overlay()["masked_rows"])
+    
+    def top_k(self, query: np.ndarray, k: int) -> np.ndarray:
+        """Top-k ID по векторам снимка с учетом журнала (в текущем процессе)"""
+        scores = self.vectors @ query
+        overlay = self._get_overlay()
+        scores[~np.asarray(self.has_vectors)] = -np.inf
+        scores[overlay["masked_rows"]] = -np.inf
+        
+        if k < len(scores):
+            rows = np.argpartition(-scores, k - 1)[:k]
+        else:
+            rows = np.arange(len(scores))
+        partials = [(float(scores[row]), int(row)) for row in rows if np.isfinite(scores[row])]
+        return self.merge(partials, query, k)
+    
+    def merge(self, partials: Iterable[Tuple[float, int]], query: np.ndarray, k: int) -> np.ndarray:
+        """Слить результаты по строкам снимка с векторами из журнала"""
+        overlay = self._get_overlay()
+        masked = overlay["masked_set"]
+        candidates = [
+            (score, int(self.ids[row])) for score, row in partials
+            if row not in masked and self.has_vectors[row]
+        ]
+        if len(overlay["ids"]):
+            overlay_scores = overlay["vectors"] @ query
+            candidates.extend(zip(overlay_scores.tolist(), overlay["ids"].tolist()))
+        return np.array([employee_id for _, employee_id in heapq.nlargest(k, candidates)], dtype=np.int64)
+    
+    def metadata_columns(self) -> dict:
+        """Колонки для фасетного индекса с учетом журнала изменений.
+
+        В снимок попадают только допущенные к поиску сотрудники, а допуск
+        требует is_active, поэтому у строк снимка is_active всегда True.
+        """
+        columns = {
+            "employee_ids": [], "departments": [], "experience_years": [], "levels": [], "skills": [], "is_active": []
+        }
+        
+        def add(employee_id, department, experience_years, level, skills, is_active=True):
+            columns["employee_ids"].append(employee_id)
+            columns["departments"].append(department)
+            columns["experience_years"].append(experience_years)
+            columns["levels"].append(level)
+            columns["skills"].append(skills)
+            columns["is_active"].append(is_active)
+        
+        indptr = np.asarray(self.skill_indptr)
+        indices = np.asarray(self.skill_indices)
+        for row, employee_id in enumerate(np.asarray(self.ids).tolist()):
+            if employee_id in self.deltas:
+                continue
+            code = int(self.department_codes[row])
+            experience = int(self.experience_years[row])
+            add(
+                employee_id,
+                self.departments[code] if code >= 0 else None,
+                experience if experience >= 0 else None,
+                int(self.levels[row]),
+                [self.skills[index] for index in indices[indptr[row]:indptr[row + 1]]]
+            )
+        
+        for employee_id, delta in sorted(self.deltas.items()):
+            if delta["op"] == OP_UPSERT:
+                add(
+                    employee_id, delta["department"], delta["experience_years"], delta["level"], delta["skills"],
+                    delta.get("is_active", True)
+                )
+        return columns
+
+
+_snapshot_cache = {"version": None, "snapshot": None, "checked_at": 0.0}
+
+
+def _current_version() -> Optional[str]:
+    try:
+        with open(os.path.join(settings.index_snapshot_dir, CURRENT_FILE), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def get_index_snapshot() -> Optional[IndexSnapshot]:
+    """Текущий снимок (переоткрывается при смене CURRENT), журнал дочитывается"""
+    if not settings.index_snapshot_enabled:
+        return None
+    
+    version = _current_version()
+    if version is None:
+        return None
+    
+    if _snapshot_cache["version"] != version:
+        try:
+            snapshot = IndexSnapshot(os.path.join(settings.index_snapshot_dir, version))
+        except Exception as e:
+            print(f"Ошибка открытия снимка индекса {version}: {e}")
+            return None
+        _snapshot_cache.update({"version": version, "snapshot": snapshot})
+    
+    snapshot = _snapshot_cache["snapshot"]
+    snapshot.refresh_deltas()
+    return snapshot
+
+
+async def replay_embedding_changes(db: AsyncSession, snapshot: IndexSnapshot) -> bool:
+    """Пометить устаревшими эмбеддинги, изменившиеся после снятия снимка (один раз на снимок).
+
+    False - снимок для первого этапа не годится: он старше срока хранения
+    журнала, снят без позиции журнала или изменений слишком много.
+    """
+    if snapshot.stale_replayed:
+        return True
+    change_id = snapshot.manifest.get("change_id")
+    created_ts = snapshot.manifest.get("created_ts")
+    if change_id is None or created_ts is None:
+        return False
+    if time.time() - created_ts >= settings.search_index_change_retention_seconds:
+        return False
+    
+    limit = settings.search_index_listener_catch_up_limit
+    changed_ids = await SearchIndexChangeRepository(db).get_changed_embedding_ids(change_id, limit)
+    if len(changed_ids) >= limit:
+        return False
+    snapshot.mark_stale(changed_ids)
+    snapshot.stale_replayed = True
+    return True
+
+
+def _first_stage_source(model: str):
+    """Проекция для модели (если обучена) и версия векторов первого этапа"""
+    from app.services.vector_projection import FULL_VERSION, get_vector_projection
+    
+    projection = get_vector_projection(model) if settings.vector_projection_enabled else None
+    return projection, (projection.version if projection else FULL_VERSION)
+
+
+def _first_stage_vector(projection, vector: List[float]) -> np.ndarray:
+    from app.services.vector_projection import first_stage_query
+    return first_stage_query(projection, vector)
+
+
+async def build_index_snapshot(db: AsyncSession, model: Optional[str] = None) -> str:
+    """Построить снимок и атомарно сделать его текущим; возвращает версию"""
+    from app.services.embedding_models import get_active_embedding_model
+    
+    model = model or await get_active_embedding_model(db)
+    projection, vector_version = _first_stage_source(model)
+    
+    # Позиция журнала изменений читается до строк: все, что изменится позже,
+    # индекс поиска применит поверх снимка
+    change_id = await SearchIndexChangeRepository(db).get_last_id()
+    rows, skills_by_employee = await EmployeeRepository(db).get_index_rows()
+    vectors_by_employee = dict(await EmployeeEmbeddingRepository(db).get_eligible_vectors(model))
+    
+    input_dimensions = projection.input_dimensions if projection else max(
+        (len(vector) for vector in vectors_by_employee.values()), default=0
+    )
+    dimensions = projection.dimensions if projection else input_dimensions
+    
+    version = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    path = os.path.join(settings.index_snapshot_dir, version)
+    os.makedirs(path)
+    
+    departments = sorted({row.department for row in rows if row.department})
+    department_code = {department: code for code, department in enumerate(departments)}
+    skills = sorted({skill for names in skills_by_employee.values() for skill in names})
+    skill_code = {skill: code for code, skill in enumerate(skills)}
+    
+    vectors = np.lib.format.open_memmap(
+        os.path.join(path, "vectors.npy"), mode="w+", dtype=np.float32, shape=(len(rows), dimensions)
+    )
+    has_vectors = np.zeros(len(rows), dtype=bool)
+    skill_indptr = [0]
+    skill_indices = []
+    for index, row in enumerate(rows):
+        vector = vectors_by_employee.get(row.id)
+        if vector and len(vector) == input_dimensions:
+            vectors[index] = _first_stage_vector(projection, vector)
+            has_vectors[index] = True
+        skill_indices.extend(sorted(skill_code[name] for name in skills_by_employee.get(row.id, [])))
+        skill_indptr.append(len(skill_indices))
+    vectors.flush()
+    del vectors
+    
+    columns = {
+        "ids": np.array([row.id for row in rows], dtype=np.int64),
+        "has_vectors": has_vectors,
+        "department_codes": np.array([department_code.get(row.department, -1) for row in rows], dtype=np.int32),
+        "experience_years": np.array(
+            [row.experience_years if row.experience_years is not None else -1 for row in rows], dtype=np.int16
+        ),
+        "levels": np.array([row.level or 1 for row in rows], dtype=np.int32),
+        "skill_indptr": np.array(skill_indptr, dtype=np.int64),
+        "skill_indices": np.array(skill_indices, dtype=np.int32)
+    }
+    for name, array in columns.items():
+        np.save(os.path.join(path, f"{name}.npy"), array)
+    
+    manifest = {
+        "version": version,
+        "model": model,
+        "vector_version": vector_version,
+        "rows": len(rows),
+        "vectors": int(has_vectors.sum()),
+        "dimensions": dimensions,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "created_ts": time.time(),
+        "change_id": change_id,
+        "departments": departments,
+        "skills": skills
+    }
+    with open(os.path.join(path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    
+    # Переключение: запись CURRENT через rename атомарна
+    current_path = os.path.join(settings.index_snapshot_dir, CURRENT_FILE)
+    with open(f"{current_path}.tmp", "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(f"{current_path}.tmp", current_path)
+    
+    _prune_snapshots(version)
+    return version
+
+
+def _prune_snapshots(current: str) -> None:
+    """Удалить старые снимки; открытые mmap у читателей остаются валидными"""
+    versions = sorted(
+        name for name in os.listdir(settings.index_snapshot_dir)
+        if os.path.isfile(os.path.join(settings.index_snapshot_dir, name, MANIFEST_FILE))
+    )
+    for name in versions[:-KEEP_SNAPSHOTS]:
+        if name != current:
+            shutil.rmtree(os.path.join(settings.index_snapshot_dir, name), ignore_errors=True)
+
+
+async def append_snapshot_delta(db: AsyncSession, employee_id: int) -> None:
+    """Записать в журнал текущего снимка актуальное состояние сотрудника"""
+    snapshot = get_index_snapshot()
+    if snapshot is None:
+        return
+    
+    rows, skills_by_employee = await EmployeeRepository(db).get_index_rows([employee_id])
+    if not rows:
+        record = {"employee_id": employee_id, "op": OP_DELETE}
+    else:
+        row = rows[0]
+        projection, vector_version = _first_stage_source(snapshot.model)
+        vector = None
+        if vector_version == snapshot.vector_version:
+            embedding = await EmployeeEmbeddingRepository(db).get_embedding_vector(employee_id, snapshot.model)
+            if embedding and (projection is None or len(embedding) == projection.input_dimensions):
+                vector = _first_stage_vector(projection, embedding).tolist()
+        record = {
+            "employee_id": employee_id,
+            "op": OP_UPSERT,
+            "vector": vector,
+            "department": row.department,
+            "experience_years": row.experience_years,
+            "level": row.level or 1,
+            "is_active": row.is_active,
+            "skills": skills_by_employee.get(employee_id, [])
+        }
+    
+    line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+    with open(os.path.join(snapshot.path, DELTA_FILE), "ab") as f:
+        # Журнал дописывают воркеры из разных процессов
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.write(line)
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+async def _build(model: Optional[str]) -> None:
+    from app.core.database import AsyncSessionLocal
+    
+    started = time.monotonic()
+    async with AsyncSessionLocal() as db:
+        version = await build_index_snapshot(db, model)
+    snapshot = IndexSnapshot(os.path.join(settings.index_snapshot_dir, version))
+    print(
+        f"Снимок {version}: {snapshot.manifest['rows']} сотрудников, {snapshot.manifest['vectors']} векторов "
+        f"{snapshot.model} ({snapshot.vector_version}, {snapshot.dimensions}), {time.monotonic() - started:.1f} с"
+    )
+
+
+def _status() -> None:
+    snapshot = get_index_snapshot()
+    if snapshot is None:
+        print("Снимок индекса не построен")
+        return
+    print(json.dumps(
+        {key: value for key, value in snapshot.manifest.items() if key not in ("departments", "skills")},
+        ensure_ascii=False,
+        indent=2
+    ))
+    print(f"Изменений в журнале: {len(snapshot.deltas)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Снимок индекса поиска")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build")
+    build_parser.add_argument("--model", default=None)
+    subparsers.add_parser("status")
+    args = parser.parse_args()
+    
+    if args.command == "build":
+        asyncio.run(_build(args.model))
+    else:
+        _status()
@@ -0,0 +1,187 @@
+"""
+Канонический текст профиля сотрудника для эмбеддингов
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import inspect
+
+from app.core.config import settings
+from app.models.employee import Employee
+from app.utils.content_hash import compute_content_hash
+
+SECTION_HEADER = "header"
+SECTION_SKILLS = "skills"
+SECTION_BIO = "bio"
+SECTION_WORK_EXPERIENCE = "work_experience"
+
+# Порядок секций в документе фиксирован
+SECTIONS = (SECTION_HEADER, SECTION_SKILLS, SECTION_BIO, SECTION_WORK_EXPERIENCE)
+
+
+def _clean(value) -> str:
+    """Нормализовать пробелы, чтобы текст не зависел от форматирования ввода"""
+    return " ".join(str(value).split()) if value is not None else ""
+
+
+def _render_work_experience(company_name: str, position: str, description: str) -> str:
+    work_info = f"Компания: {company_name}"
+    if position:
+        work_info += f", Позиция: {position}"
+    if description:
+        work_info += f", Описание: {description}"
+    return work_info
+
+
+def work_experience_section_key(work_experience_id: int) -> str:
+    """Ключ вектора отдельного места работы"""
+    return f"{SECTION_WORK_EXPERIENCE}:{work_experience_id}"
+
+
+@dataclass(frozen=True)
+class ProfileDocument:
+    """Документ профиля: текст и отдельные секции"""
+    employee_id: int
+    text: str
+    sections: Dict[str, str]
+    
+    def content_hash(self, model: str) -> str:
+        """Хеш документа для заданной модели эмбеддингов"""
+        return compute_content_hash(model, self.text)
+
+
+class ProfileDocumentBuilder:
+    """Единственный построитель текста профиля для всех путей эмбеддинга.
+
+    Секции мемоизируются по (employee_id, секция) вместе с номером версии
+    секции. Пути записи и слушатель изменений увеличивают версию только
+    изменившихся секций, поэтому при сборке сравниваются номера версий,
+    а перерисовываются лишь сброшенные секции.
+    """
+    
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or settings.profile_document_cache_size
+        # employee_id -> {"versions": {секция: версия}, "sections": {секция: (версия, текст)}}
+        self._cache: "OrderedDict[int, dict]" = OrderedDict()
+    
+    def build(self, employee: Employee) -> ProfileDocument:
+        """Построить документ профиля.
+
+        Навыки и опыт работы должны быть загружены заранее (selectinload),
+        иначе текст зависел бы от того, какой путь загрузил сотрудника.
+        """
+        unloaded = inspect(employee).unloaded
+        for relation in ("skills", "work_experiences"):
+            if relation in unloaded:
+                raise ValueError(f"Для построения профиля сотрудника {employee.id} не загружено поле {relation}")
+        
+        renderers: Dict[str, Callable[[Employee], str]] = {
+            SECTION_HEADER: self._render_header,
+            SECTION_SKILLS: self._render_skills,
+            SECTION_BIO: self._render_bio,
+            SECTION_WORK_EXPERIENCE: self._render_work_experience,
+        }
+        
+        entry = self._entry(employee.id)
+        sections = {}
+        for section in SECTIONS:
+            version = entry["versions"].get(section, 0)
+            cached = entry["sections"].get(section)
+            if cached is not None and cached[0] == version:
+                text = cached[1]
+            else:
+                text = renderers[section](employee)
+                entry["sections"][section] = (version, text)
+            if text:
+                sections[section] = text
+        
+        return ProfileDocument(
+            employee_id=employee.id,
+            text=". ".join(sections[section] for section in SECTIONS if section in sections),
+            sections=sections
+        )
+    
+    def build_vector_sections(self, employee: Employee) -> Dict[str, str]:
+        """Тексты для отдельных векторов профиля: навыки, био и каждое место работы.
+
+        Ключи стабильны между пересчетами, поэтому изменение одного
+        места работы пересчитывает только его вектор.
+        """
+        document = self.build(employee)
+        sections = {
+            section: document.sections[section]
+            for section in (SECTION_SKILLS, SECTION_BIO)
+            if section in document.sections
+        }
+        for work_exp in employee.work_experiences:
+            sections[work_experience_section_key(work_exp.id)] = "Опыт работы: " + _render_work_experience(
+                _clean(work_exp.company_name),
+                _clean(work_exp.position),
+                _clean(work_exp.description)
+            )
+        return sections
+    
+    def invalidate(self, employee_id: int, *sections: str) -> None:
+        """Увеличить версии секций профиля (всех, если секции не указаны)"""
+        entry = self._cache.get(employee_id)
+        if entry is None:
+            return
+        versions = entry["versions"]
+        for section in sections or SECTIONS:
+            versions[section] = versions.get(section, 0) + 1
+    
+    def clear(self) -> None:
+        """Очистить кэш целиком"""
+        self._cache.clear()
+    
+    def _entry(self, employee_id: int) -> dict:
+        entry = self._cache.get(employee_id)
+        if entry is not None:
+            self._cache.move_to_end(employee_id)
+            return entry
+        
+        entry = self._cache[employee_id] = {"versions": {}, "sections": {}}
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return entry
+    
+    @staticmethod
+    def _render_header(employee: Employee) -> str:
+        return (
+            f"Должность: {_clean(employee.position) or 'Не указана'}. "
+            f"Отдел: {_clean(employee.department) or 'Не указан'}. "
+            f"Опыт: {employee.experience_years or 0} лет"
+        )
+    
+    @staticmethod
+    def _render_skills(employee: Employee) -> str:
+        # Порядок коллекции навыков не гарантирован - сортируем
+        skills = sorted({_clean(skill.name) for skill in employee.skills}, key=str.lower)
+        return f"Навыки: {', '.join(skills)}" if skills else ""
+    
+    @staticmethod
+    def _render_bio(employee: Employee) -> str:
+        bio = _clean(employee.bio)
+        return f"О себе: {bio}" if bio else ""
+    
+    @staticmethod
+    def _render_work_experience(employee: Employee) -> str:
+        work_experiences = sorted(
+            (
+                work_exp.start_period or "",
+                _clean(work_exp.company_name),
+                _clean(work_exp.position),
+                _clean(work_exp.description)
+            )
+            for work_exp in employee.work_experiences
+        )
+        work_parts = [
+            _render_work_experience(company_name, position, description)
+            for _, company_name, position, description in work_experiences
+        ]
+        return f"Опыт работы: {'; '.join(work_parts)}" if work_parts else ""
+
+
+# Общий построитель на процесс
+profile_document_builder = ProfileDocumentBuilder()
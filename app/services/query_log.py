@@ -0,0 +1,404 @@
+"""
+Журнал запросов поиска и ИИ для воспроизведения реальной нагрузки
+
+Эндпоинты записывают обезличенные метаданные запроса: текст (см.
+anonymize_text), время этапов, попадания в кэши и ID результатов. Записи
+складываются в очередь в памяти и пишутся фоновой задачей пачками в
+append-only JSONL (файл на день), не задерживая ответ; при переполнении
+очереди записи отбрасываются.
+
+Воспроизведение журнала на тестовом стенде с ускорением и отчетом
+о задержках и расхождении выдачи:
+    python -m app.services.query_log replay data/query_log/queries-20261019.jsonl \
+        --base-url http://test:8000 --speedup 10 --token <JWT>
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from fastapi import Request
+
+from app.core.config import settings
+from app.services.query_parser import _morph
+from app.utils.exceptions import SearchOverloadedError
+
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_URL_RE = re.compile(r"(?:https?://|www\.)\S+", re.IGNORECASE)
+_HANDLE_RE = re.compile(r"(?<![\w@])@\w{3,}")
+_PHONE_RE = re.compile(r"\+?\d(?:[\s()-]{0,2}\d){9,10}\b")
+# Номера документов, карт, счетов, ИНН/СНИЛС
+_NUMBER_RE = re.compile(r"\b\d(?:[\s-]?\d){5,}\b")
+_CAPITALIZED_RE = re.compile(r"\b[А-ЯЁ][а-яё]+(?:-[А-ЯЁ][а-яё]+)?\b")
+_PERSON_GRAMMEMES = {"Name", "Surn", "Patr"}
+
+
+def _mask_person(match: re.Match) -> str:
+    tag = _morph.parse(match.group(0))[0].tag
+    return "<name>" if _PERSON_GRAMMEMES & tag.grammemes else match.group(0)
+
+
+def anonymize_text(text: Optional[str]) -> Optional[str]:
+    """Текст запроса без персональных данных.
+
+    Маскируются email, ссылки, @-логины, телефоны, числа от 6 цифр
+    (документы, карты, счета) и русские имена, фамилии и отчества
+    с заглавной буквы (по словарю pymorphy). Имена латиницей и адреса
+    не распознаются: журнал не должен покидать контур компании.
+    """
+    if not text:
+        return text
+    text = _URL_RE.sub("<url>", _EMAIL_RE.sub("<email>", text))
+    text = _NUMBER_RE.sub("<number>", _PHONE_RE.sub("<phone>", _HANDLE_RE.sub("<handle>", text)))
+    return _CAPITALIZED_RE.sub(_mask_person, text)
+
+
+def anonymize_user(user_id: Optional[int]) -> Optional[str]:
+    """Псевдоним пользователя: стабильный в пределах соли, без восстановления ID"""
+    if user_id is None:
+        return None
+    return hashlib.sha256(f"{settings.query_log_salt}:{user_id}".encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class QueryLogEntry:
+    """Метаданные одного запроса; stages и cache заполняются сервисами по ходу запроса"""
+    endpoint: str
+    method: str
+    path: str
+    params: Dict[str, Any] = field(default_factory=dict)
+    body: Optional[Dict[str, Any]] = None
+    user: Optional[str] = None
+    stages: Dict[str, float] = field(default_factory=dict)
+    cache: Dict[str, str] = field(default_factory=dict)
+    result_ids: Optional[List[int]] = None
+    started: float = field(default_factory=time.monotonic)
+    timestamp: float = field(default_factory=time.time)
+
+    def set_results(self, result_ids: List[int]) -> None:
+        self.result_ids = [int(result_id) for result_id in result_ids]
+
+    def to_record(self, status: int) -> Dict[str, Any]:
+        return {
+            "ts": round(self.timestamp, 3),
+            "endpoint": self.endpoint,
+            "method": self.method,
+            "path": self.path,
+            "params": self.params,
+            "body": self.body,
+            "user": self.user,
+            "status": status,
+            "latency_ms": round((time.monotonic() - self.started) * 1000, 2),
+            "stages": self.stages,
+            "cache": self.cache,
+            "result_ids": self.result_ids
+        }
+
+
+# Запись текущего запроса (None - запрос не журналируется)
+_current_entry: ContextVar[Optional[QueryLogEntry]] = ContextVar("query_log_entry", default=None)
+
+
+@contextmanager
+def log_stage(name: str):
+    """Замерить этап запроса (повторные замеры одного этапа суммируются)"""
+    entry = _current_entry.get()
+    if entry is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = (time.perf_counter() - started) * 1000
+        entry.stages[name] = round(entry.stages.get(name, 0.0) + elapsed, 2)
+
+
+def log_cache(name: str, hit: bool) -> None:
+    """Отметить попадание или промах кэша"""
+    entry = _current_entry.get()
+    if entry is not None:
+        entry.cache[name] = "hit" if hit else "miss"
+
+
+class QueryLogWriter:
+    """Фоновая запись журнала пачками"""
+
+    def __init__(self, directory: str, batch_size: int, flush_seconds: float, max_queue: int):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.written = 0
+        self.dropped = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"queued": self._queue.qsize(), "written": self.written, "dropped": self.dropped}
+
+    def submit(self, record: Dict[str, Any]) -> None:
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def run(self) -> None:
+        """Писать пачками до batch_size записей или раз в flush_seconds; None в очереди - остановка"""
+        stopping = False
+        while not stopping:
+            record = await self._queue.get()
+            if record is None:
+                break
+            batch = [record]
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    record = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                if record is None:
+                    stopping = True
+                    break
+                batch.append(record)
+            await self._write(batch)
+
+    async def _write(self, batch: List[Dict[str, Any]]) -> None:
+        try:
+            await asyncio.to_thread(self._append, batch)
+            self.written += len(batch)
+        except Exception as e:
+            self.dropped += len(batch)
+            print(f"Ошибка записи журнала запросов: {e}")
+
+    def _append(self, batch: List[Dict[str, Any]]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"queries-{time.strftime('%Y%m%d')}.jsonl")
+        lines = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in batch)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+    async def stop(self) -> None:
+        """Дописать очередь и остановиться (новые записи после этого не принимаются)"""
+        await self._queue.put(None)
+
+
+_writer: Optional[QueryLogWriter] = None
+_writer_task: Optional[asyncio.Task] = None
+
+
+def start_query_log() -> Optional[QueryLogWriter]:
+    """Запустить фоновую запись журнала (вызывается из lifespan приложения)"""
+    global _writer, _writer_task
+    if _writer is None and settings.query_log_enabled:
+        _writer = QueryLogWriter(
+            settings.query_log_dir,
+            settings.query_log_batch_size,
+            settings.query_log_flush_seconds,
+            settings.query_log_max_queue
+        )
+        _writer_task = asyncio.create_task(_writer.run())
+    return _writer
+
+
+async def stop_query_log() -> None:
+    """Остановить запись, дописав накопленные записи"""
+    global _writer, _writer_task
+    if _writer is None:
+        return
+    writer, _writer = _writer, None
+    await writer.stop()
+    await asyncio.gather(_writer_task, return_exceptions=True)
+    _writer_task = None
+
+
+def get_query_log_stats() -> Optional[Dict[str, Any]]:
+    """Счетчики журнала или None, если он выключен"""
+    return _writer.stats() if _writer is not None else None
+
+
+@asynccontextmanager
+async def log_query(
+    request: Request,
+    endpoint: str,
+    params: Optional[Dict[str, Any]] = None,
+    body: Optional[Dict[str, Any]] = None,
+    user_id: Optional[int] = None
+):
+    """Журналировать запрос эндпоинта.
+
+    Текстовые поля params и body обезличиваются. Запись отправляется
+    в очередь по выходу из блока (с кодом ошибки, если было исключение).
+    Если журнал выключен или запрос не попал в выборку, блок получает
+    пустую запись без обезличивания (оно стоит разбора слов pymorphy).
+    """
+    writer = _writer
+    if writer is None or random.random() >= settings.query_log_sample_rate:
+        yield QueryLogEntry(endpoint=endpoint, method=request.method, path=request.url.path)
+        return
+    
+    entry = QueryLogEntry(
+        endpoint=endpoint,
+        method=request.method,
+        path=request.url.path,
+        params={key: anonymize_text(value) if isinstance(value, str) else value for key, value in (params or {}).items()},
+        body={key: anonymize_text(value) if isinstance(value, str) else value for key, value in body.items()} if body else None,
+        user=anonymize_user(user_id)
+    )
+
+    token = _current_entry.set(entry)
+    status = 200
+    try:
+        yield entry
+    except SearchOverloadedError:
+        status = 503
+        raise
+    except Exception as e:
+        status = getattr(e, "status_code", 500)
+        raise
+    finally:
+        _current_entry.reset(token)
+        if writer is _writer:
+            writer.submit(entry.to_record(status))
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * percent / 100))], 2)
+
+
+def _result_ids(payload: Any) -> Optional[List[int]]:
+    """ID результатов из ответа поиска (список или {"results": [...]})"""
+    items = payload.get("results") if isinstance(payload, dict) else payload
+    if not isinstance(items, list):
+        return None
+    return [item["id"] for item in items if isinstance(item, dict) and "id" in item]
+
+
+def result_drift(original: List[int], replayed: List[int]) -> float:
+    """Расхождение выдачи: 1 - Жаккар по множествам ID (0 - та же выдача)"""
+    original, replayed = set(original), set(replayed)
+    if not original and not replayed:
+        return 0.0
+    return 1 - len(original & replayed) / len(original | replayed)
+
+
+async def replay(
+    records: List[Dict[str, Any]],
+    base_url: str,
+    speedup: float,
+    token: Optional[str] = None,
+    concurrency: int = 32
+) -> Dict[str, Any]:
+    """Повторить запросы журнала с исходными интервалами, сжатыми в speedup раз"""
+    import httpx
+
+    records = sorted(records, key=lambda record: record["ts"])
+    if not records:
+        return {"requests": 0}
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    slots = asyncio.Semaphore(concurrency)
+    latencies: Dict[str, List[float]] = {}
+    drifts: List[float] = []
+    errors = 0
+
+    async def send(client: httpx.AsyncClient, record: Dict[str, Any]) -> None:
+        nonlocal errors
+        async with slots:
+            started = time.perf_counter()
+            try:
+                response = await client.request(
+                    record["method"], record["path"], params=record.get("params") or None, json=record.get("body")
+                )
+            except httpx.HTTPError:
+                errors += 1
+                return
+            latencies.setdefault(record["endpoint"], []).append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+                return
+            replayed_ids = _result_ids(response.json())
+            if record.get("result_ids") is not None and replayed_ids is not None:
+                drifts.append(result_drift(record["result_ids"], replayed_ids))
+
+    first_ts = records[0]["ts"]
+    started = time.monotonic()
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=60.0) as client:
+        tasks = []
+        for record in records:
+            delay = (record["ts"] - first_ts) / speedup - (time.monotonic() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(send(client, record)))
+        await asyncio.gather(*tasks)
+
+    original: Dict[str, List[float]] = {}
+    for record in records:
+        original.setdefault(record["endpoint"], []).append(record["latency_ms"])
+    return {
+        "requests": len(records),
+        "errors": errors,
+        "elapsed_seconds": round(time.monotonic() - started, 1),
+        "latency_ms": {
+            endpoint: {
+                "count": len(values),
+                "p50": _percentile(values, 50),
+                "p95": _percentile(values, 95),
+                "p99": _percentile(values, 99),
+                "original_p50": _percentile(original[endpoint], 50),
+                "original_p95": _percentile(original[endpoint], 95)
+            }
+            for endpoint, values in latencies.items()
+        },
+        "result_drift": {
+            "compared": len(drifts),
+            "mean": round(sum(drifts) / len(drifts), 4) if drifts else 0.0,
+            "changed": sum(1 for drift in drifts if drift > 0)
+        }
+    }
+
+
+def _load_records(paths: List[str], endpoints: Optional[List[str]]) -> List[Dict[str, Any]]:
+    records = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    if not endpoints or record["endpoint"] in endpoints:
+                        records.append(record)
+    return records
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Журнал запросов поиска и ИИ")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    replay_parser = subparsers.add_parser("replay")
+    replay_parser.add_argument("paths", nargs="+")
+    replay_parser.add_argument("--base-url", required=True)
+    replay_parser.add_argument("--speedup", type=float, default=1.0)
+    replay_parser.add_argument("--token", default=None)
+    replay_parser.add_argument("--concurrency", type=int, default=32)
+    replay_parser.add_argument("--endpoint", action="append", default=None)
+
+    args = parser.parse_args()
+    report = asyncio.run(replay(
+        _load_records(args.paths, args.endpoint),
+        args.base_url,
+        args.speedup,
+        args.token,
+        args.concurrency
+    ))
+    print(json.dumps(report, ensure_ascii=False, indent=2))
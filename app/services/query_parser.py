@@ -0,0 +1,224 @@
+"""
+Локальный разбор поисковых запросов HR без обращения к LLM
+"""
+import re
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Tuple, Any
+
+from pymorphy3 import MorphAnalyzer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.skill import Skill
+
+_morph = MorphAnalyzer()
+
+# Токены: буквы, цифры и символы из названий технологий (C++, C#, Node.js)
+_TOKEN_RE = re.compile(r"[a-zа-яё0-9][a-zа-яё0-9+#.]*", re.IGNORECASE)
+
+# Синонимы и сленг -> каноническое название навыка.
+# Применяются, только если навык есть в справочнике.
+SKILL_ALIASES = {
+    "питон": "Python",
+    "пайтон": "Python",
+    "js": "JavaScript",
+    "джаваскрипт": "JavaScript",
+    "ts": "TypeScript",
+    "джава": "Java",
+    "golang": "Go",
+    "голанг": "Go",
+    "k8s": "Kubernetes",
+    "кубер": "Kubernetes",
+    "кубернетес": "Kubernetes",
+    "докер": "Docker",
+    "postgres": "PostgreSQL",
+    "постгрес": "PostgreSQL",
+    "реакт": "React",
+    "vue": "Vue.js",
+    "node": "Node.js",
+    "nodejs": "Node.js",
+    "ml": "Machine Learning",
+    "машинный обучение": "Machine Learning",
+    "джанго": "Django",
+    "пандас": "Pandas",
+    "гит": "Git",
+    "линукс": "Linux",
+    "эджайл": "Agile",
+    "скрам": "Scrum",
+}
+
+# Ключевые слова грейдов (русские и английские), в исходной и нормальной форме
+GRADE_KEYWORDS = {
+    "Junior": {
+        "junior", "jun", "intern", "trainee", "джун", "джуна", "джуниор", "джуниора",
+        "младший", "стажер", "стажёр", "начинающий"
+    },
+    "Middle": {"middle", "mid", "мидл", "мидла", "миддл", "миддла"},
+    "Senior": {"senior", "сеньор", "синьор", "сеньора", "синьора", "старший", "ведущий", "опытный"},
+    "Lead": {
+        "lead", "teamlead", "techlead", "head", "лид", "лида", "тимлид", "тимлида",
+        "техлид", "техлида", "руководитель", "начальник"
+    },
+}
+
+# Слова, которые не несут требований к кандидату и не снижают уверенность разбора
+FILLER_WORDS = {
+    "ищу", "ищем", "искать", "нужен", "нужна", "нужный", "нужно", "требоваться", "требуется",
+    "найти", "подобрать", "кандидат", "сотрудник", "специалист", "разработчик", "программист",
+    "инженер", "опыт", "знание", "знать", "уровень", "команда", "проект", "год", "лет",
+    "developer", "engineer", "dev", "with", "and", "for", "the", "need", "looking", "experience",
+}
+
+STOPWORDS = {
+    "и", "в", "во", "на", "с", "со", "по", "для", "или", "а", "но", "к", "от", "до", "из", "у",
+    "о", "об", "не", "же", "бы", "что", "как", "который", "это", "весь", "мы", "я",
+}
+
+
+@lru_cache(maxsize=50000)
+def normalize_token(token: str) -> str:
+    """Нормальная форма токена (лемма для русских слов)"""
+    token = token.lower().rstrip(".")
+    if re.search(r"[а-яё]", token):
+        return _morph.parse(token)[0].normal_form
+    return token
+
+
+def tokenize(text: str) -> List[Tuple[str, str]]:
+    """Разбить текст на пары (исходный токен в нижнем регистре, нормальная форма)"""
+    tokens = []
+    for match in _TOKEN_RE.finditer(text.lower()):
+        raw = match.group(0).rstrip(".")
+        if raw:
+            tokens.append((raw, normalize_token(raw)))
+    return tokens
+
+
+class SkillTrie:
+    """Префиксное дерево по нормализованным токенам названий навыков.
+
+    Многословные навыки ("Machine Learning", "Google Cloud") находятся
+    за один проход по запросу жадным поиском самого длинного совпадения.
+    """
+    
+    _END = "\x00"
+    
+    def __init__(self):
+        self._root: Dict[str, Any] = {}
+    
+    def add(self, phrase: str, canonical: str) -> None:
+        node = self._root
+        tokens = [norm for _, norm in tokenize(phrase)]
+        if not tokens:
+            return
+        for token in tokens:
+            node = node.setdefault(token, {})
+        node[self._END] = canonical
+    
+    def find_all(self, tokens: List[str]) -> List[Tuple[int, int, str]]:
+        """Найти навыки в последовательности токенов: (начало, конец, навык)"""
+        matches = []
+        position = 0
+        while position < len(tokens):
+            node = self._root
+            best = None
+            index = position
+            while index < len(tokens) and tokens[index] in node:
+                node = node[tokens[index]]
+                index += 1
+                if self._END in node:
+                    best = (position, index, node[self._END])
+            if best:
+                matches.append(best)
+                position = best[1]
+            else:
+                position += 1
+        return matches
+
+
+@dataclass
+class LocalParseResult:
+    """Результат локального разбора запроса"""
+    skills: List[str] = field(default_factory=list)
+    grade: str = "Middle"
+    confidence: float = 0.0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "skills": self.skills,
+            "grade": self.grade,
+            "confidence": round(self.confidence, 3),
+            "source": "local"
+        }
+
+
+class LocalQueryParser:
+    """Разбор запроса по справочнику навыков и правилам грейдов"""
+    
+    def __init__(self, skill_names: List[str]):
+        self.trie = SkillTrie()
+        known = {}
+        for name in skill_names:
+            if name:
+                self.trie.add(name, name)
+                known[name.lower()] = name
+        for alias, canonical in SKILL_ALIASES.items():
+            if canonical.lower() in known:
+                self.trie.add(alias, known[canonical.lower()])
+        
+        self._grade_by_token = {
+            keyword: grade
+            for grade, keywords in GRADE_KEYWORDS.items()
+            for keyword in keywords
+        }
+    
+    def parse(self, query: str) -> LocalParseResult:
+        """Извлечь навыки и грейд; confidence - доля значимых слов, которые удалось распознать"""
+        tokens = tokenize(query)
+        normalized = [norm for _, norm in tokens]
+        
+        skills = []
+        covered = set()
+        for start, end, skill in self.trie.find_all(normalized):
+            if skill not in skills:
+                skills.append(skill)
+            covered.update(range(start, end))
+        
+        grade = None
+        for index, (raw, norm) in enumerate(tokens):
+            token_grade = self._grade_by_token.get(raw) or self._grade_by_token.get(norm)
+            if token_grade:
+                grade = grade or token_grade
+                covered.add(index)
+        
+        significant = [
+            index for index, (raw, norm) in enumerate(tokens)
+            if norm not in STOPWORDS and norm not in FILLER_WORDS and raw not in FILLER_WORDS
+        ]
+        if not skills or not significant:
+            confidence = 0.0
+        else:
+            confidence = sum(1 for index in significant if index in covered) / len(significant)
+        
+        return LocalParseResult(skills=skills, grade=grade or "Middle", confidence=confidence)
+
+
+_parser_cache = {"expires_at": 0.0, "signature": None, "parser": None}
+
+
+async def get_local_query_parser(db: AsyncSession) -> LocalQueryParser:
+    """Парсер по текущему справочнику навыков (пересобирается раз в skill_catalog_ttl_seconds)"""
+    if _parser_cache["parser"] is not None and time.monotonic() < _parser_cache["expires_at"]:
+        return _parser_cache["parser"]
+    
+    result = await db.execute(select(Skill.name))
+    skill_names = sorted(set(result.scalars().all()))
+    signature = hash(tuple(skill_names))
+    if signature != _parser_cache["signature"]:
+        _parser_cache["parser"] = LocalQueryParser(skill_names)
+        _parser_cache["signature"] = signature
+    _parser_cache["expires_at"] = time.monotonic() + settings.skill_catalog_ttl_seconds
+    return _parser_cache["parser"]
@@ -0,0 +1,199 @@
+"""
+Сохраненные поиски с инкрементальным поиском совпадений
+"""
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.saved_search import SavedSearch
+from app.repositories.saved_search import SavedSearchRepository
+from app.repositories.employee import EmployeeRepository
+from app.repositories.employee_embedding import EmployeeEmbeddingRepository
+from app.repositories.search_document import SearchDocumentRepository
+from app.services.embedding_models import get_search_embedding_model
+from app.services.smart_search import SmartSearchService
+from app.utils.exceptions import AIServiceError
+
+# Матрица эмбеддингов сохраненных запросов (по строке на поиск) на процесс.
+# Пересобирается при создании/удалении поиска в этом процессе и по TTL.
+_matrix_cache = {"expires_at": 0.0, "model": None, "ids": None, "thresholds": None, "matrix": None}
+
+
+def invalidate_saved_search_cache() -> None:
+    """Сбросить кэш матрицы сохраненных запросов"""
+    _matrix_cache["expires_at"] = 0.0
+
+
+def _normalize_rows(vectors: List[List[float]]) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class SavedSearchService:
+    """Сервис сохраненных поисков"""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.repo = SavedSearchRepository(db)
+        self.employee_repo = EmployeeRepository(db)
+        self.embedding_repo = EmployeeEmbeddingRepository(db)
+        self.smart_search = SmartSearchService(db)
+    
+    async def create_saved_search(self, name: str, query: str, threshold: Optional[float] = None) -> Dict[str, Any]:
+        """Сохранить поиск и сразу найти совпадения среди текущих профилей.
+
+        Совпадения, найденные при создании, не считаются новыми.
+        """
+        threshold = settings.saved_search_default_threshold if threshold is None else threshold
+        parsed_query = await self.smart_search.prepare_query(query)
+        model = await get_search_embedding_model(self.db)
+        
+        embedding = await self.smart_search._get_embedding(parsed_query["query"], model)
+        if not embedding:
+            raise AIServiceError("Не удалось получить эмбеддинг запроса")
+        
+        saved_search = await self.repo.create({
+            "name": name,
+            "query": query,
+            "parsed_query": parsed_query,
+            "model": model,
+            "query_embedding": embedding,
+            "threshold": threshold
+        })
+        invalidate_saved_search_cache()
+        
+        vectors = await self.embedding_repo.get_eligible_vectors(model)
+        vectors = [(employee_id, vector) for employee_id, vector in vectors if len(vector) == len(embedding)]
+        if vectors:
+            scores = _normalize_rows([vector for _, vector in vectors]) @ _normalize_rows([embedding])[0]
+            await self.repo.upsert_matches([
+                {"saved_search_id": saved_search.id, "employee_id": employee_id, "score": float(score)}
+                for (employee_id, _), score in zip(vectors, scores)
+                if score >= threshold
+            ])
+        await self.repo.mark_viewed(saved_search.id)
+        
+        return self._serialize(saved_search)
+    
+    async def get_saved_searches(self) -> List[Dict[str, Any]]:
+        """Список сохраненных поисков с количеством новых совпадений"""
+        searches = await self.repo.get_all_searches()
+        new_counts = await self.repo.get_new_match_counts()
+        result = []
+        for saved_search in searches:
+            item = self._serialize(saved_search)
+            item["new_matches"] = new_counts.get(saved_search.id, 0)
+            result.append(item)
+        return result
+    
+    async def get_matches(self, saved_search_id: int, only_new: bool = True) -> Optional[Dict[str, Any]]:
+        """Совпадения поиска; по умолчанию - только новые с последнего просмотра"""
+        saved_search = await self.repo.get(saved_search_id)
+        if not saved_search:
+            return None
+        
+        since = saved_search.last_viewed_at if only_new else None
+        matches = await self.repo.get_matches(saved_search_id, since)
+        # Поля профиля - одним запросом к документам поиска, без ORM-связей
+        rows = await SearchDocumentRepository(self.db).get_rows_by_ids([match.employee_id for match in matches])
+        by_id = {row.id: row for row in rows}
+        await self.repo.mark_viewed(saved_search_id)
+        
+        return {
+            "saved_search": self._serialize(saved_search),
+            "since": since,
+            "matches": [
+                {
+                    "id": emp.id,
+                    "full_name": emp.full_name,
+                    "position": emp.position,
+                    "department": emp.department,
+                    "experience_years": emp.experience_years,
+                    "skills": list(emp.skills),
+                    "score": round(match.score, 3),
+                    "matched_at": match.matched_at
+                }
+                for match, emp in ((match, by_id.get(match.employee_id)) for match in matches)
+                # Документ удаленного сотрудника уже убран, совпадение - еще нет
+                if emp is not None
+            ]
+        }
+    
+    async def delete_saved_search(self, saved_search_id: int) -> bool:
+        """Удалить сохраненный поиск вместе с совпадениями"""
+        deleted = await self.repo.delete(saved_search_id)
+        invalidate_saved_search_cache()
+        return deleted is not None
+    
+    async def match_employee(self, employee_id: int, model: str, embedding: List[float]) -> int:
+        """Сравнить новый эмбеддинг профиля со всеми сохраненными запросами.
+
+        Все запросы оцениваются одним умножением матрицы на вектор.
+        Возвращает количество поисков, порог которых пройден.
+        """
+        if model != await get_search_embedding_model(self.db):
+            return 0
+        
+        ids, thresholds, matrix = await self._get_query_matrix(model)
+        if not ids.size or matrix.shape[1] != len(embedding):
+            return 0
+        
+        if not await self.employee_repo.is_search_eligible(employee_id):
+            await self.repo.delete_employee_matches(employee_id, ids.tolist())
+            return 0
+        
+        scores = matrix @ _normalize_rows([embedding])[0]
+        passed = scores >= thresholds
+        
+        await self.repo.upsert_matches([
+            {"saved_search_id": int(search_id), "employee_id": employee_id, "score": float(score)}
+            for search_id, score in zip(ids[passed], scores[passed])
+        ])
+        await self.repo.delete_employee_matches(employee_id, ids[~passed].tolist())
+        return int(passed.sum())
+    
+    async def _get_query_matrix(self, model: str) -> tuple:
+        if _matrix_cache["model"] != model or time.monotonic() >= _matrix_cache["expires_at"]:
+            searches = await self.repo.get_all_searches()
+            await self._reembed_stale(searches, model)
+            
+            _matrix_cache["model"] = model
+            _matrix_cache["ids"] = np.array([s.id for s in searches], dtype=np.int64)
+            _matrix_cache["thresholds"] = np.array([s.threshold for s in searches], dtype=np.float32)
+            _matrix_cache["matrix"] = (
+                _normalize_rows([s.query_embedding for s in searches]) if searches
+                else np.empty((0, 0), dtype=np.float32)
+            )
+            _matrix_cache["expires_at"] = time.monotonic() + settings.saved_search_cache_ttl_seconds
+        
+        return _matrix_cache["ids"], _matrix_cache["thresholds"], _matrix_cache["matrix"]
+    
+    async def _reembed_stale(self, searches: List[SavedSearch], model: str) -> None:
+        """Перестроить эмбеддинги запросов после смены модели поиска"""
+        stale = [s for s in searches if s.model != model]
+        if not stale:
+            return
+        
+        embeddings = await self.smart_search._get_embeddings([s.parsed_query["query"] for s in stale], model)
+        for saved_search, embedding in zip(stale, embeddings):
+            await self.repo.update_embedding(saved_search.id, model, embedding)
+            saved_search.model = model
+            saved_search.query_embedding = embedding
+    
+    def _serialize(self, saved_search: SavedSearch) -> Dict[str, Any]:
+        return {
+            "id": saved_search.id,
+            "name": saved_search.name,
+            "query": saved_search.query,
+            "skills": saved_search.parsed_query.get("skills", []),
+            "grade": saved_search.parsed_query.get("grade"),
+            "threshold": saved_search.threshold,
+            "model": saved_search.model,
+            "last_viewed_at": saved_search.last_viewed_at,
+            "created_at": saved_search.created_at
+        }
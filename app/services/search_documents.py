@@ -0,0 +1,75 @@
+"""
+Эмбеддинги в документах поиска
+
+Поля профиля документов поддерживаются триггерами, эмбеддинг модели
+первого этапа копируется воркером очереди. Полное заполнение
+(после миграции или смены модели):
+    python -m app.services.search_documents rebuild
+"""
+import argparse
+import asyncio
+from typing import List, Optional
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.repositories.employee_embedding import EmployeeEmbeddingRepository
+from app.repositories.search_document import SearchDocumentRepository
+from app.services.embedding_models import get_active_embedding_model
+from app.services.embedding_providers import get_local_embedding_provider
+
+# Размер пачки обновлений при полном заполнении
+REBUILD_BATCH_SIZE = 1000
+
+
+def encode_embedding(vector: List[float]) -> bytes:
+    """Эмбеддинг в байты float32 для документа"""
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+def decode_embedding(data: bytes) -> np.ndarray:
+    """Эмбеддинг документа без копирования"""
+    return np.frombuffer(data, dtype=np.float32)
+
+
+async def get_document_embedding_model(db: AsyncSession) -> str:
+    """Модель первого этапа поиска: её эмбеддинги хранятся в документах"""
+    local = get_local_embedding_provider()
+    if local and settings.embedding_provider in ("local", "hybrid"):
+        return local.model
+    return await get_active_embedding_model(db)
+
+
+async def sync_document_embeddings(db: AsyncSession, employee_ids: Optional[List[int]] = None) -> int:
+    """Скопировать эмбеддинги модели первого этапа в документы.
+
+    Без employee_ids обновляются все документы. Возвращает число
+    обновленных документов.
+    """
+    model = await get_document_embedding_model(db)
+    rows = await EmployeeEmbeddingRepository(db).get_vectors_with_hashes(model, employee_ids)
+    document_repo = SearchDocumentRepository(db)
+    
+    for start in range(0, len(rows), REBUILD_BATCH_SIZE):
+        await document_repo.set_embeddings(model, [
+            {"employee_id": employee_id, "embedding": encode_embedding(vector), "content_hash": content_hash}
+            for employee_id, vector, content_hash in rows[start:start + REBUILD_BATCH_SIZE]
+            if vector
+        ])
+    return len(rows)
+
+
+async def _main(args: argparse.Namespace) -> None:
+    async with AsyncSessionLocal() as db:
+        if args.command == "rebuild":
+            updated = await sync_document_embeddings(db)
+            print(f"Обновлено документов: {updated}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Документы поиска")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("rebuild")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,464 @@
+"""
+Индекс поиска сотрудников в памяти процесса
+
+Строка индекса соответствует сотруднику, допущенному к поиску. Фасеты
+(отдел, грейд по стажу, уровень, навык) хранятся как битовые карты на
+целых числах Python: пересечение - побитовое AND, мощность - bit_count().
+Рядом лежит колоночное хранилище NumPy с теми же строками: условия на
+стаж, отдел, уровень и грейд и оценки ранжирования считаются выражениями
+над массивами, а маска переводится в битовую карту для AND с навыками.
+"""
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.repositories.employee import EmployeeRepository
+from app.repositories.search_index_change import SearchIndexChangeRepository
+from app.services.index_snapshot import IndexSnapshot, get_index_snapshot
+from app.services.query_log import log_cache
+from app.services.skill_matrix import SkillMatrix
+
+FACET_DEPARTMENT = "department"
+FACET_GRADE = "grade"
+FACET_LEVEL = "level"
+FACET_SKILL = "skill"
+
+FACETS = (FACET_DEPARTMENT, FACET_GRADE, FACET_LEVEL, FACET_SKILL)
+
+# Стаж в годах: не фасет, диапазоны в запросах проверяются по колонке experience_years
+FACET_EXPERIENCE = "experience"
+
+NO_DEPARTMENT = "Не указан"
+
+GRADES = ("junior", "middle", "senior", "lead")
+GRADE_CODES = {grade: code for code, grade in enumerate(GRADES)}
+# Оценка по расстоянию между грейдами сотрудника и запроса
+GRADE_DISTANCE_SCORES = np.array([1.0, 0.8, 0.4, 0.1])
+
+# Колонки метаданных: около 20 байт на сотрудника.
+# department - код в SearchIndex.departments, -1 - не указан;
+# experience_years - -1, если стаж не указан
+COLUMN_DTYPE = np.dtype([
+    ("employee_id", np.int64),
+    ("experience_years", np.int16),
+    ("level", np.int16),
+    ("department", np.int32),
+    ("grade", np.int8),
+    ("is_active", np.bool_),
+    ("present", np.bool_),
+])
+
+
+def grade_for_experience(years: Optional[int]) -> str:
+    """Грейд по стажу: junior < 2 лет, middle < 4, senior < 6, иначе lead"""
+    years = years or 0
+    if years < 2:
+        return "junior"
+    if years < 4:
+        return "middle"
+    if years < 6:
+        return "senior"
+    return "lead"
+
+
+def grade_scores(grade_codes: np.ndarray, required_grade: str) -> np.ndarray:
+    """Оценка по грейду для массива кодов грейдов"""
+    required = GRADE_CODES.get(required_grade, GRADE_CODES["middle"])
+    return GRADE_DISTANCE_SCORES[np.abs(grade_codes.astype(np.int64) - required)]
+
+
+def bitmap_from_rows(rows: Iterable[int]) -> int:
+    """Собрать битовую карту из номеров строк"""
+    bitmap = 0
+    for row in rows:
+        bitmap |= 1 << row
+    return bitmap
+
+
+def bitmap_from_mask(mask: np.ndarray) -> int:
+    """Собрать битовую карту из булевой маски строк"""
+    return int.from_bytes(np.packbits(mask, bitorder="little").tobytes(), "little")
+
+
+def iter_rows(bitmap: int) -> Iterator[int]:
+    """Номера установленных битов по возрастанию"""
+    while bitmap:
+        low = bitmap & -bitmap
+        yield low.bit_length() - 1
+        bitmap ^= low
+
+
+class SearchIndex:
+    """Индекс допущенных к поиску сотрудников с фасетными битовыми картами"""
+    
+    def __init__(
+        self,
+        employee_ids: List[int],
+        departments: List[Optional[str]],
+        experience_years: List[Optional[int]],
+        levels: List[Optional[int]],
+        skills: List[List[str]],
+        is_active: Optional[List[Optional[bool]]] = None
+    ):
+        self.employee_ids = list(employee_ids)
+        self.row_of = {employee_id: row for row, employee_id in enumerate(self.employee_ids)}
+        self.all_rows = (1 << len(self.employee_ids)) - 1
+        self.built_at = time.monotonic()
+        # Навыки по строке: вместе с колонками дают значения фасетов, чтобы точечно снять биты при обновлении
+        self.row_skills: List[List[str]] = list(skills)
+        
+        # Колоночное хранилище: отделы кодируются словарем
+        self.departments: List[str] = sorted({department for department in departments if department})
+        self.department_codes = {department: code for code, department in enumerate(self.departments)}
+        count = len(self.employee_ids)
+        self.columns = np.zeros(max(count, 16), dtype=COLUMN_DTYPE)
+        columns = self.columns[:count]
+        columns["employee_id"] = self.employee_ids
+        columns["experience_years"] = [years if years is not None else -1 for years in experience_years]
+        columns["level"] = [level or 1 for level in levels]
+        columns["department"] = [self.department_codes.get(department, -1) for department in departments]
+        columns["grade"] = [GRADE_CODES[grade_for_experience(years)] for years in experience_years]
+        columns["is_active"] = [True if active is None else active for active in is_active] if is_active else True
+        columns["present"] = True
+        self._sorted_lookup: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        
+        # Битовые карты фасетов собираются из масок колонок и групп строк по навыку, без цикла по строкам
+        self.facets: Dict[str, Dict[str, int]] = {
+            FACET_DEPARTMENT: {
+                self.departments[code] if code >= 0 else NO_DEPARTMENT: bitmap_from_mask(columns["department"] == code)
+                for code in np.unique(columns["department"]).tolist()
+            },
+            FACET_GRADE: {
+                GRADES[code]: bitmap_from_mask(columns["grade"] == code)
+                for code in np.unique(columns["grade"]).tolist()
+            },
+            FACET_LEVEL: {
+                str(level): bitmap_from_mask(columns["level"] == level)
+                for level in np.unique(columns["level"]).tolist()
+            },
+            FACET_SKILL: self._skill_bitmaps(self.row_skills)
+        }
+        # Регистронезависимый поиск навыка: нижний регистр -> название в индексе
+        self.skill_keys = {skill.lower(): skill for skill in self.facets[FACET_SKILL]}
+        
+        # TF-IDF матрица навыков с теми же строками
+        self.skill_matrix = SkillMatrix(skills)
+    
+    @staticmethod
+    def _skill_bitmaps(skills: List[List[str]]) -> Dict[str, int]:
+        """Битовые карты навыков: строки группируются по навыку сортировкой кодов"""
+        flat = [skill for row_skills in skills for skill in row_skills]
+        codes = {skill: code for code, skill in enumerate(dict.fromkeys(flat))}
+        flat_codes = np.fromiter(map(codes.__getitem__, flat), dtype=np.int64, count=len(flat))
+        lengths = np.fromiter((len(row_skills) for row_skills in skills), dtype=np.int64, count=len(skills))
+        order = np.argsort(flat_codes, kind="stable")
+        rows = np.repeat(np.arange(len(skills)), lengths)[order]
+        bounds = np.searchsorted(flat_codes[order], np.arange(len(codes) + 1))
+        bitmaps = {}
+        for skill, code in codes.items():
+            mask = np.zeros(len(skills), dtype=bool)
+            mask[rows[bounds[code]:bounds[code + 1]]] = True
+            bitmaps[skill] = bitmap_from_mask(mask)
+        return bitmaps
+    
+    @staticmethod
+    def _facet_values(
+        department: Optional[str],
+        experience_years: Optional[int],
+        level: Optional[int],
+        skills: List[str]
+    ) -> List[tuple]:
+        values = [
+            (FACET_DEPARTMENT, department or NO_DEPARTMENT),
+            (FACET_GRADE, grade_for_experience(experience_years)),
+            (FACET_LEVEL, str(level or 1))
+        ]
+        values.extend((FACET_SKILL, skill) for skill in skills)
+        return values
+    
+    def __len__(self) -> int:
+        return self.all_rows.bit_count()
+    
+    def remove(self, employee_id: int) -> None:
+        """Убрать сотрудника из индекса (строка остается за ним для повторного добавления)"""
+        row = self.row_of.get(employee_id)
+        if row is None or not self.all_rows >> row & 1:
+            return
+        
+        mask = ~(1 << row)
+        self.all_rows &= mask
+        column = self.columns[row]
+        department = int(column["department"])
+        experience_years = int(column["experience_years"])
+        values = self._facet_values(
+            self.departments[department] if department >= 0 else None,
+            experience_years if experience_years >= 0 else None,
+            int(column["level"]),
+            self.row_skills[row]
+        )
+        self.columns["present"][row] = False
+        self.skill_matrix.clear_row(row)
+        for facet, value in values:
+            bitmap = self.facets[facet].get(value, 0) & mask
+            if bitmap:
+                self.facets[facet][value] = bitmap
+            else:
+                self.facets[facet].pop(value, None)
+        self.row_skills[row] = []
+    
+    def upsert(
+        self,
+        employee_id: int,
+        department: Optional[str],
+        experience_years: Optional[int],
+        level: Optional[int],
+        skills: List[str],
+        is_active: Optional[bool] = True
+    ) -> None:
+        """Добавить сотрудника или обновить его значения фасетов и колонок"""
+        self.remove(employee_id)
+        row = self.row_of.get(employee_id)
+        if row is None:
+            row = len(self.employee_ids)
+            self.employee_ids.append(employee_id)
+            self.row_skills.append([])
+            self.row_of[employee_id] = row
+            if row >= len(self.columns):
+                # Емкость растет удвоением, копирование амортизируется
+                grown = np.zeros(len(self.columns) * 2, dtype=COLUMN_DTYPE)
+                grown[:row] = self.columns[:row]
+                self.columns = grown
+            self._sorted_lookup = None
+        
+        if department and department not in self.department_codes:
+            self.department_codes[department] = len(self.departments)
+            self.departments.append(department)
+        self.columns[row] = (
+            employee_id,
+            experience_years if experience_years is not None else -1,
+            level or 1,
+            self.department_codes.get(department, -1),
+            GRADE_CODES[grade_for_experience(experience_years)],
+            True if is_active is None else is_active,
+            True
+        )
+        self.skill_matrix.set_row(row, skills)
+        
+        bit = 1 << row
+        self.all_rows |= bit
+        values = self._facet_values(department, experience_years, level, skills)
+        for facet, value in values:
+            self.facets[facet][value] = self.facets[facet].get(value, 0) | bit
+        self.row_skills[row] = list(skills)
+        for skill in skills:
+            self.skill_keys.setdefault(skill.lower(), skill)
+    
+    def rows_for_ids(self, employee_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Строки колоночного хранилища для массива ID (например, выровненного
+        с матрицей векторов) и маска найденных в индексе"""
+        if self._sorted_lookup is None:
+            count = len(self.employee_ids)
+            order = np.argsort(self.columns["employee_id"][:count], kind="stable")
+            self._sorted_lookup = (self.columns["employee_id"][:count][order], order)
+        sorted_ids, order = self._sorted_lookup
+        
+        employee_ids = np.asarray(employee_ids, dtype=np.int64)
+        if not len(sorted_ids):
+            return np.zeros(len(employee_ids), dtype=np.int64), np.zeros(len(employee_ids), dtype=bool)
+        positions = np.minimum(np.searchsorted(sorted_ids, employee_ids), len(sorted_ids) - 1)
+        rows = order[positions]
+        found = (sorted_ids[positions] == employee_ids) & self.columns["present"][rows]
+        return rows, found
+    
+    def column_mask(
+        self,
+        min_experience: Optional[int] = None,
+        max_experience: Optional[int] = None,
+        departments: Optional[Iterable[str]] = None,
+        levels: Optional[Iterable[str]] = None,
+        grades: Optional[Iterable[str]] = None,
+        active_only: bool = True
+    ) -> np.ndarray:
+        """Маска строк по условиям на колонки (выражения над массивами).
+
+        Внутри списка значений - OR, между условиями - AND; значения отдела,
+        уровня и грейда - как в фасетах (NO_DEPARTMENT - отдел не указан).
+        """
+        columns = self.columns[:len(self.employee_ids)]
+        mask = columns["present"].copy()
+        if active_only:
+            mask &= columns["is_active"]
+        if min_experience is not None:
+            mask &= columns["experience_years"] >= min_experience
+        if max_experience is not None:
+            mask &= (columns["experience_years"] >= 0) & (columns["experience_years"] <= max_experience)
+        if departments is not None:
+            departments = set(departments)
+            codes = [self.department_codes[department] for department in departments if department in self.department_codes]
+            if NO_DEPARTMENT in departments:
+                codes.append(-1)
+            mask &= np.isin(columns["department"], codes)
+        if levels is not None:
+            mask &= np.isin(columns["level"], [int(level) for level in levels if str(level).isdigit()])
+        if grades is not None:
+            mask &= np.isin(columns["grade"], [GRADE_CODES[grade] for grade in grades if grade in GRADE_CODES])
+        return mask
+    
+    def bitmap_from_mask(self, mask: np.ndarray) -> int:
+        """Битовая карта строк по маске колонок"""
+        return bitmap_from_mask(mask) & self.all_rows
+    
+    def bitmap_for_ids(self, employee_ids: Iterable[int]) -> int:
+        """Битовая карта для списка сотрудников (отсутствующие в индексе пропускаются)"""
+        return bitmap_from_rows(
+            self.row_of[emp_id] for emp_id in employee_ids if emp_id in self.row_of
+        ) & self.all_rows
+    
+    def ids_for_bitmap(self, bitmap: int) -> List[int]:
+        """ID сотрудников по битовой карте"""
+        return [self.employee_ids[row] for row in iter_rows(bitmap)]
+    
+    def facet_bitmap(self, facet: str, values: Iterable[str]) -> int:
+        """OR битовых карт значений одного фасета"""
+        bitmap = 0
+        for value in values:
+            bitmap |= self.facets.get(facet, {}).get(value, 0)
+        return bitmap
+    
+    def filter_bitmap(self, filters: Dict[str, List[str]], exclude: Optional[str] = None) -> int:
+        """AND фильтров по разным фасетам (внутри фасета - OR значений).
+
+        Отдел, уровень и грейд проверяются по колонкам, навыки - по битовым картам.
+        """
+        filters = {facet: values for facet, values in filters.items() if values and facet != exclude}
+        bitmap = self.all_rows
+        if filters.keys() & {FACET_DEPARTMENT, FACET_LEVEL, FACET_GRADE}:
+            bitmap = self.bitmap_from_mask(self.column_mask(
+                departments=filters.get(FACET_DEPARTMENT),
+                levels=filters.get(FACET_LEVEL),
+                grades=filters.get(FACET_GRADE)
+            ))
+        if FACET_SKILL in filters:
+            bitmap &= self.facet_bitmap(FACET_SKILL, filters[FACET_SKILL])
+        return bitmap
+    
+    def facet_counts(self, candidates: int, filters: Dict[str, List[str]]) -> Dict[str, Dict[str, int]]:
+        """Количество кандидатов по значениям каждого фасета.
+
+        Для фасета учитываются фильтры всех остальных фасетов, поэтому
+        счетчики показывают, сколько останется при выборе другого значения.
+        """
+        counts = {}
+        for facet in FACETS:
+            base = candidates & self.filter_bitmap(filters, exclude=facet)
+            facet_counts = {}
+            if base:
+                for value, bitmap in self.facets[facet].items():
+                    count = (base & bitmap).bit_count()
+                    if count:
+                        facet_counts[value] = count
+            counts[facet] = dict(sorted(facet_counts.items(), key=lambda item: (-item[1], item[0])))
+        return counts
+
+
+async def _build_from_snapshot(db: AsyncSession, snapshot: IndexSnapshot) -> Optional[SearchIndex]:
+    """Индекс по снимку с примененными поверх изменениями из search_index_changes.
+
+    None - снимок старше срока хранения журнала (изменения могли быть удалены),
+    снят без позиции журнала или изменений слишком много.
+    """
+    change_id = snapshot.manifest.get("change_id")
+    created_ts = snapshot.manifest.get("created_ts")
+    if change_id is None or created_ts is None:
+        return None
+    if time.time() - created_ts >= settings.search_index_change_retention_seconds:
+        return None
+    
+    limit = settings.search_index_listener_catch_up_limit
+    changed_ids = await SearchIndexChangeRepository(db).get_changed_profile_ids(change_id, limit)
+    if len(changed_ids) >= limit:
+        return None
+    
+    index = SearchIndex(**snapshot.metadata_columns())
+    await _patch_index(db, index, changed_ids)
+    return index
+
+
+async def build_search_index(db: AsyncSession) -> SearchIndex:
+    """Построить индекс по снимку на диске, а без него - по базе без загрузки ORM-объектов"""
+    snapshot = get_index_snapshot()
+    if snapshot is not None:
+        index = await _build_from_snapshot(db, snapshot)
+        if index is not None:
+            return index
+    
+    rows, skills_by_employee = await EmployeeRepository(db).get_index_rows()
+    
+    return SearchIndex(
+        employee_ids=[row.id for row in rows],
+        departments=[row.department for row in rows],
+        experience_years=[row.experience_years for row in rows],
+        levels=[row.level for row in rows],
+        skills=[skills_by_employee.get(row.id, []) for row in rows],
+        is_active=[row.is_active for row in rows]
+    )
+
+
+_index_cache = {"index": None, "expires_at": 0.0, "invalidated": False, "listening": False}
+
+
+async def get_search_index(db: AsyncSession) -> SearchIndex:
+    """Индекс текущего процесса.
+
+    Пока слушатель изменений подключен, индекс поддерживается его патчами
+    и перестраивается только после invalidate_search_index; без слушателя -
+    раз в search_index_ttl_seconds.
+    """
+    stale = (
+        _index_cache["index"] is None
+        or _index_cache["invalidated"]
+        or (not _index_cache["listening"] and time.monotonic() >= _index_cache["expires_at"])
+    )
+    log_cache("search_index", not stale)
+    if stale:
+        _index_cache["invalidated"] = False
+        _index_cache["index"] = await build_search_index(db)
+        _index_cache["expires_at"] = time.monotonic() + settings.search_index_ttl_seconds
+    return _index_cache["index"]
+
+
+def invalidate_search_index() -> None:
+    """Пометить индекс устаревшим"""
+    _index_cache["invalidated"] = True
+
+
+def set_search_index_listening(listening: bool) -> None:
+    """Отметить, что слушатель изменений подключен и патчит индекс (TTL не нужен)"""
+    _index_cache["listening"] = listening
+
+
+async def patch_search_index(db: AsyncSession, employee_ids: List[int]) -> None:
+    """Точечно обновить уже построенный индекс процесса по изменившимся сотрудникам"""
+    index = _index_cache["index"]
+    if index is not None:
+        await _patch_index(db, index, employee_ids)
+
+
+async def _patch_index(db: AsyncSession, index: SearchIndex, employee_ids: List[int]) -> None:
+    if not employee_ids:
+        return
+    
+    rows, skills_by_employee = await EmployeeRepository(db).get_index_rows(employee_ids)
+    eligible = set()
+    for row in rows:
+        index.upsert(
+            row.id, row.department, row.experience_years, row.level,
+            skills_by_employee.get(row.id, []), row.is_active
+        )
+        eligible.add(row.id)
+    for employee_id in employee_ids:
+        if employee_id not in eligible:
+            index.remove(employee_id)
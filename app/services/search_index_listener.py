@@ -0,0 +1,176 @@
+"""
+Слушатель изменений индекса поиска (Postgres LISTEN/NOTIFY)
+
+Триггеры на employees, employee_skills, work_experiences и employee_embeddings
+пишут строку в search_index_changes и отправляют NOTIFY. Каждый воркер
+приложения держит отдельное соединение asyncpg с LISTEN и точечно обновляет
+свои кэши: фасетный индекс, секции текстов профилей и векторы первого этапа. После
+переподключения пропущенные изменения дочитываются из журнала.
+"""
+import asyncio
+import json
+import time
+from typing import Dict, Optional, Set
+
+import asyncpg
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.search_index_change import SearchIndexChange
+from app.services.profile_document import (
+    profile_document_builder,
+    SECTION_HEADER,
+    SECTION_SKILLS,
+    SECTION_BIO,
+    SECTION_WORK_EXPERIENCE
+)
+from app.services.search_index import (
+    invalidate_search_index,
+    patch_search_index,
+    set_search_index_listening
+)
+from app.services.vector_projection import mark_first_stage_stale
+
+SOURCE_EMBEDDINGS = SearchIndexChange.SOURCE_EMBEDDINGS
+
+# Секции текста профиля, которые затрагивает изменение таблицы
+SOURCE_SECTIONS = {
+    SearchIndexChange.SOURCE_EMPLOYEES: (SECTION_HEADER, SECTION_BIO),
+    SearchIndexChange.SOURCE_SKILLS: (SECTION_SKILLS,),
+    SearchIndexChange.SOURCE_WORK_EXPERIENCES: (SECTION_WORK_EXPERIENCE,),
+}
+
+
+class SearchIndexListener:
+    """LISTEN на канал изменений с дочитыванием журнала после переподключения"""
+    
+    def __init__(self):
+        self.last_change_id: Optional[int] = None
+        self._pending: Dict[int, Set[str]] = {}
+        self._wakeup = asyncio.Event()
+        self._stop_event = asyncio.Event()
+        self._last_cleanup = 0.0
+    
+    def stop(self) -> None:
+        """Попросить слушатель остановиться"""
+        self._stop_event.set()
+        self._wakeup.set()
+    
+    async def run(self) -> None:
+        """Основной цикл: подключение, дочитывание журнала, применение уведомлений"""
+        while not self._stop_event.is_set():
+            connection = None
+            try:
+                connection = await asyncpg.connect(settings.database_url)
+                lost = asyncio.Event()
+                connection.add_termination_listener(lambda _: lost.set())
+                await connection.add_listener(SearchIndexChange.CHANNEL, self._on_notify)
+                
+                # Подписка раньше дочитывания: изменения между ними не теряются
+                await self._catch_up(connection)
+                set_search_index_listening(True)
+                
+                while not self._stop_event.is_set() and not lost.is_set():
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=settings.search_index_listener_flush_seconds)
+                    except asyncio.TimeoutError:
+                        pass
+                    self._wakeup.clear()
+                    await self._flush()
+                    await self._cleanup(connection)
+            except Exception as e:
+                print(f"Ошибка слушателя изменений индекса поиска: {e}")
+            finally:
+                # Без соединения изменения не приходят: индекс снова живет по TTL
+                set_search_index_listening(False)
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            
+            if not self._stop_event.is_set():
+                try:
+                    await asyncio.wait_for(self._stop_event.wait(), timeout=settings.search_index_listener_reconnect_seconds)
+                except asyncio.TimeoutError:
+                    pass
+    
+    def _on_notify(self, connection, pid, channel, payload: str) -> None:
+        change = json.loads(payload)
+        self._add_change(change["id"], change["employee_id"], change["source"])
+        # Небольшая задержка собирает серию уведомлений в один патч
+        asyncio.get_running_loop().call_later(settings.search_index_listener_batch_delay_seconds, self._wakeup.set)
+    
+    def _add_change(self, change_id: int, employee_id: int, source: str) -> None:
+        self._pending.setdefault(employee_id, set()).add(source)
+        if self.last_change_id is None or change_id > self.last_change_id:
+            self.last_change_id = change_id
+    
+    async def _catch_up(self, connection) -> None:
+        """Дочитать изменения, пропущенные пока соединения не было"""
+        if self.last_change_id is None:
+            # Первый запуск: кэши процесса строятся с нуля, прошлое не нужно.
+            # Индекс, собранный до подписки, перестраивается: изменения до неё не придут
+            self.last_change_id = await connection.fetchval("SELECT coalesce(max(id), 0) FROM search_index_changes")
+            invalidate_search_index()
+            return
+        
+        rows = await connection.fetch(
+            "SELECT id, employee_id, source FROM search_index_changes WHERE id > $1 ORDER BY id LIMIT $2",
+            self.last_change_id - SearchIndexChange.CATCH_UP_OVERLAP,
+            settings.search_index_listener_catch_up_limit
+        )
+        if len(rows) >= settings.search_index_listener_catch_up_limit:
+            # Пропущено слишком много - дешевле перестроить индекс целиком
+            print("Слушатель индекса поиска: пропущено слишком много изменений, индекс будет перестроен")
+            invalidate_search_index()
+            profile_document_builder.clear()
+            self._pending.clear()
+            self.last_change_id = await connection.fetchval("SELECT coalesce(max(id), 0) FROM search_index_changes")
+            return
+        
+        for row in rows:
+            self._add_change(row["id"], row["employee_id"], row["source"])
+        await self._flush()
+    
+    async def _flush(self) -> None:
+        """Применить накопленные изменения к кэшам процесса"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        
+        for employee_id, sources in pending.items():
+            sections = {section for source in sources for section in SOURCE_SECTIONS.get(source, ())}
+            if sections:
+                profile_document_builder.invalidate(employee_id, *sections)
+        mark_first_stage_stale([
+            employee_id for employee_id, sources in pending.items() if SOURCE_EMBEDDINGS in sources
+        ])
+        
+        profile_ids = [employee_id for employee_id, sources in pending.items() if sources - {SOURCE_EMBEDDINGS}]
+        if profile_ids:
+            try:
+                async with AsyncSessionLocal() as db:
+                    await patch_search_index(db, profile_ids)
+            except Exception as e:
+                print(f"Ошибка обновления индекса поиска: {e}")
+                invalidate_search_index()
+    
+    async def _cleanup(self, connection) -> None:
+        """Удалить записи журнала старше срока хранения (раз в час)"""
+        if time.monotonic() - self._last_cleanup < 3600:
+            return
+        self._last_cleanup = time.monotonic()
+        await connection.execute(
+            "DELETE FROM search_index_changes WHERE created_at < now() - make_interval(secs => $1)",
+            settings.search_index_change_retention_seconds
+        )
+
+
+def start_search_index_listener() -> tuple:
+    """Запустить слушатель в текущем event loop (используется в lifespan приложения)"""
+    listener = SearchIndexListener()
+    return listener, asyncio.create_task(listener.run())
+
+
+async def stop_search_index_listener(listener: SearchIndexListener, task: asyncio.Task) -> None:
+    """Остановить слушатель"""
+    listener.stop()
+    await asyncio.gather(task, return_exceptions=True)
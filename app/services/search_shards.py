@@ -0,0 +1,172 @@
+"""
+Шардированный перебор векторов первого этапа в отдельных процессах
+
+Векторы копируются в блок разделяемой памяти (или, если есть снимок индекса,
+открываются из его файла через mmap) и делятся на шарды по строкам.
+Запрос отправляется во все шарды параллельно (ProcessPoolExecutor), каждый
+шард возвращает свой top-k, результаты сливаются через heapq. Event loop
+API-воркера в это время свободен.
+"""
+import asyncio
+import heapq
+import itertools
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+# Источники векторов: блок разделяемой памяти (по имени) или каталог снимка индекса
+SOURCE_SHM = "shm"
+SOURCE_SNAPSHOT = "snapshot"
+
+# Подключенные источники в процессе шарда: ключ -> (блок или None, матрица, маска строк с векторами)
+_attached: Dict[str, Tuple[Optional[shared_memory.SharedMemory], np.ndarray, Optional[np.ndarray]]] = {}
+
+
+def _attach(source: Tuple[str, str], shape: Tuple[int, int]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    kind, key = source
+    if key not in _attached:
+        # Держим не больше двух источников: текущий и предыдущий (на время пересборки)
+        while len(_attached) >= 2:
+            old_block, _, _ = _attached.pop(next(iter(_attached)))
+            if old_block is not None:
+                old_block.close()
+        if kind == SOURCE_SNAPSHOT:
+            _attached[key] = (
+                None,
+                np.load(os.path.join(key, "vectors.npy"), mmap_mode="r"),
+                np.load(os.path.join(key, "has_vectors.npy"), mmap_mode="r")
+            )
+        else:
+            block = shared_memory.SharedMemory(name=key)
+            _attached[key] = (block, np.ndarray(shape, dtype=np.float32, buffer=block.buf), None)
+    _, vectors, valid = _attached[key]
+    return vectors, valid
+
+
+def _score_shard(
+    source: Tuple[str, str],
+    shape: Tuple[int, int],
+    start: int,
+    stop: int,
+    query: np.ndarray,
+    k: int
+) -> List[Tuple[float, int]]:
+    """Top-k шарда: пары (сходство, номер строки). Выполняется в процессе пула"""
+    vectors, valid = _attach(source, shape)
+    scores = vectors[start:stop] @ query
+    if valid is not None:
+        scores[~np.asarray(valid[start:stop])] = -np.inf
+    if k < len(scores):
+        rows = np.argpartition(-scores, k - 1)[:k]
+    else:
+        rows = np.arange(len(scores))
+    return [(score, row) for score, row in zip(scores[rows].tolist(), (rows + start).tolist()) if score > -np.inf]
+
+
+class ShardedVectorIndex:
+    """Векторы первого этапа в разделяемой памяти, разбитые на шарды"""
+    
+    def __init__(self, ids: np.ndarray, vectors: np.ndarray, shards: int, snapshot=None):
+        self.ids = ids
+        self.shape = vectors.shape
+        self.snapshot = snapshot
+        if snapshot is not None:
+            # Файл снимка уже общий через page cache - копировать не нужно
+            self.block = None
+            self.source = (SOURCE_SNAPSHOT, snapshot.path)
+        else:
+            self.block = shared_memory.SharedMemory(create=True, size=max(vectors.nbytes, 1))
+            np.ndarray(self.shape, dtype=np.float32, buffer=self.block.buf)[:] = vectors
+            self.source = (SOURCE_SHM, self.block.name)
+        bounds = np.linspace(0, self.shape[0], max(1, shards) + 1).astype(int)
+        self.shards = [(int(start), int(stop)) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+    
+    def __len__(self) -> int:
+        return self.shape[0]
+    
+    async def top_k(self, query: np.ndarray, k: int) -> np.ndarray:
+        """Scatter-gather: top-k по всем шардам, слияние частичных результатов"""
+        loop = asyncio.get_running_loop()
+        pool = get_search_pool()
+        query = np.ascontiguousarray(query, dtype=np.float32)
+        # Строки снимка, перекрытые журналом изменений, отбрасываются при слиянии
+        shard_k = k + (self.snapshot.masked_count if self.snapshot is not None else 0)
+        partials = await asyncio.gather(*(
+            loop.run_in_executor(pool, _score_shard, self.source, self.shape, start, stop, query, shard_k)
+            for start, stop in self.shards
+        ))
+        if self.snapshot is not None:
+            return self.snapshot.merge(itertools.chain.from_iterable(partials), query, k)
+        merged = heapq.nlargest(k, itertools.chain.from_iterable(partials))
+        return self.ids[[row for _, row in merged]]
+    
+    def close(self) -> None:
+        """Освободить разделяемую память"""
+        if self.block is None:
+            return
+        self.block.close()
+        try:
+            self.block.unlink()
+        except FileNotFoundError:
+            pass
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+# Индексы по модели: текущий и предыдущий (запросы к нему могут еще выполняться)
+_indexes: Dict[str, deque] = {}
+
+
+def get_search_pool() -> ProcessPoolExecutor:
+    """Пул процессов для шардов (создается при первом запросе)"""
+    global _pool
+    if _pool is None:
+        # forkserver: процессы шардов не наследуют состояние event loop API-воркера
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.search_shard_count,
+            mp_context=multiprocessing.get_context("forkserver")
+        )
+    return _pool
+
+
+def get_sharded_index(first_stage: dict) -> Optional[ShardedVectorIndex]:
+    """Шардированный индекс для векторов первого этапа.
+
+    None, если шардирование выключено или строк слишком мало, чтобы
+    межпроцессный обмен окупился.
+    """
+    if settings.search_shard_count <= 0 or len(first_stage["ids"]) < settings.search_shard_min_rows:
+        return None
+    
+    index = first_stage.get("sharded")
+    if index is None:
+        index = ShardedVectorIndex(
+            first_stage["ids"],
+            first_stage["vectors"],
+            settings.search_shard_count,
+            first_stage.get("snapshot")
+        )
+        first_stage["sharded"] = index
+        history = _indexes.setdefault(first_stage["model"], deque())
+        history.append(index)
+        while len(history) > 2:
+            history.popleft().close()
+    return index
+
+
+def shutdown_search_shards() -> None:
+    """Остановить пул и освободить разделяемую память (при остановке приложения)"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+    for history in _indexes.values():
+        while history:
+            history.popleft().close()
@@ -0,0 +1,150 @@
+"""
+Векторы отдельных секций профиля и оценка сотрудника по лучшему из них
+"""
+from typing import List, Dict
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.employee import Employee
+from app.repositories.employee_section_embedding import EmployeeSectionEmbeddingRepository
+from app.services.cpu_pool import run_cpu
+from app.services.embedding_providers import get_embedding_provider
+from app.services.profile_document import profile_document_builder
+from app.utils.content_hash import compute_content_hash
+from app.utils.exceptions import AIServiceError
+
+SCORE_MAX = "max"
+SCORE_SOFTMAX = "softmax"
+
+
+def segment_scores(
+    employee_ids: np.ndarray,
+    vectors: np.ndarray,
+    query: np.ndarray,
+    mode: str = SCORE_MAX,
+    temperature: float = 0.05
+) -> Dict[int, float]:
+    """Оценка сотрудников по их наборам векторов.
+
+    employee_ids упорядочены, строки vectors им соответствуют. Сходства
+    считаются одним умножением матриц, а свертка по сотрудникам -
+    reduceat по границам сегментов, без цикла по сотрудникам.
+    max - лучшая секция; softmax - log-mean-exp с температурой:
+    гладкий максимум, не растущий от числа секций.
+    """
+    if not len(employee_ids):
+        return {}
+    
+    norms = np.linalg.norm(vectors, axis=1)
+    query_norm = np.linalg.norm(query)
+    if query_norm == 0:
+        return {}
+    sims = (vectors @ query) / (np.where(norms == 0, 1.0, norms) * query_norm)
+    
+    starts = np.flatnonzero(np.r_[True, employee_ids[1:] != employee_ids[:-1]])
+    if mode == SCORE_SOFTMAX:
+        # Сдвиг на максимум сегмента защищает exp от переполнения,
+        # а сумму сегмента - от обнуления при низкой температуре
+        shift = np.maximum.reduceat(sims, starts)
+        counts = np.diff(np.r_[starts, len(sims)])
+        sums = np.add.reduceat(np.exp((sims - np.repeat(shift, counts)) / temperature), starts)
+        scores = temperature * np.log(sums / counts) + shift
+    else:
+        scores = np.maximum.reduceat(sims, starts)
+    
+    return dict(zip(employee_ids[starts].tolist(), scores.tolist()))
+
+
+def _score_rows(ids: np.ndarray, vectors: np.ndarray, query: np.ndarray, mode: str, temperature: float) -> Dict[int, float]:
+    order = np.argsort(ids, kind="stable")
+    return segment_scores(ids[order], vectors[order], query, mode, temperature)
+
+
+class SectionEmbeddingService:
+    """Эмбеддинги секций профиля: пересчет и оценка при поиске"""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.section_repo = EmployeeSectionEmbeddingRepository(db)
+    
+    async def refresh(self, employee: Employee, model: str) -> bool:
+        """Пересчитать векторы измененных секций сотрудника.
+
+        Все измененные секции отправляются в API одной пачкой;
+        секции, удаленные из профиля, удаляются. Возвращает False,
+        если ни одна секция не изменилась.
+        """
+        sections = profile_document_builder.build_vector_sections(employee)
+        stored_hashes = await self.section_repo.get_content_hashes(employee.id, model)
+        
+        changed = {}
+        for section, text in sections.items():
+            content_hash = compute_content_hash(model, text)
+            if stored_hashes.get(section) != content_hash:
+                changed[section] = (text, content_hash)
+        
+        if not changed and set(stored_hashes) == set(sections):
+            return False
+        
+        rows = []
+        keys = list(changed)
+        provider = get_embedding_provider(model)
+        batch_size = settings.embedding_batch_size
+        for start in range(0, len(keys), batch_size):
+            batch = keys[start:start + batch_size]
+            vectors = await provider.embed([changed[section][0] for section in batch])
+            for section, vector in zip(batch, vectors):
+                if not vector:
+                    raise AIServiceError(f"Не удалось получить эмбеддинг секции {section} сотрудника {employee.id}")
+                text, content_hash = changed[section]
+                rows.append({
+                    "section": section,
+                    "embedding": vector,
+                    "section_text": text,
+                    "content_hash": content_hash
+                })
+        
+        await self.section_repo.replace_sections(employee.id, model, rows, list(sections))
+        return True
+    
+    async def get_scores(
+        self,
+        employee_ids: List[int],
+        model: str,
+        query_embedding: List[float],
+        profile_embeddings: Dict[int, np.ndarray]
+    ) -> Dict[int, float]:
+        """Семантическая оценка сотрудников, у которых есть векторы секций.
+
+        Общий вектор профиля участвует наравне с секциями. Сотрудники
+        без секций в результат не попадают - для них остается оценка
+        по вектору профиля.
+        """
+        if not query_embedding:
+            return {}
+        
+        dimensions = len(query_embedding)
+        rows = [
+            (employee_id, vector)
+            for employee_id, vector in await self.section_repo.get_vectors(employee_ids, model)
+            if len(vector) == dimensions
+        ]
+        if not rows:
+            return {}
+        
+        with_sections = {employee_id for employee_id, _ in rows}
+        rows.extend(
+            (employee_id, profile_embeddings[employee_id])
+            for employee_id in with_sections
+            if len(profile_embeddings.get(employee_id, ())) == dimensions
+        )
+        # Матрица float32 собирается в event loop: в пул уходят только массивы
+        ids = np.fromiter((employee_id for employee_id, _ in rows), dtype=np.int64, count=len(rows))
+        vectors = np.asarray([vector for _, vector in rows], dtype=np.float32)
+        return await run_cpu(
+            len(rows), _score_rows,
+            ids, vectors, np.asarray(query_embedding, dtype=np.float32),
+            settings.section_score_mode, settings.section_softmax_temperature
+        )
@@ -0,0 +1,95 @@
+"""
+Поиск похожих сотрудников по сохраненным эмбеддингам
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.repositories.employee import EmployeeRepository
+from app.repositories.employee_embedding import EmployeeEmbeddingRepository
+from app.services.embedding_models import get_search_embedding_model
+from app.services.search_shards import get_sharded_index
+from app.services.vector_projection import (
+    get_vector_projection,
+    get_first_stage_vectors,
+    first_stage_query,
+    top_k_ids
+)
+from app.utils.exceptions import EmployeeNotFoundError
+
+
+class SimilarEmployeesService:
+    """Похожие сотрудники: вектор берется из employee_embeddings, API эмбеддингов не вызывается"""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.employee_repo = EmployeeRepository(db)
+        self.embedding_repo = EmployeeEmbeddingRepository(db)
+    
+    async def find_similar(self, employee_id: int, limit: int = 10) -> Optional[List[Dict[str, Any]]]:
+        """Top-k сотрудников, ближайших к заданному (сам сотрудник исключается).
+
+        None - у сотрудника еще нет эмбеддинга текущей модели.
+        """
+        model = await get_search_embedding_model(self.db)
+        vector = await self.embedding_repo.get_embedding_vector(employee_id, model)
+        if not vector:
+            if await self.employee_repo.get(employee_id) is None:
+                raise EmployeeNotFoundError(f"Сотрудник {employee_id} не найден")
+            return None
+        
+        projection = get_vector_projection(model) if settings.vector_projection_enabled else None
+        if projection is not None and projection.input_dimensions != len(vector):
+            projection = None
+        
+        # Первый этап: с проекцией берем шорт-лист для точного пересчета,
+        # без неё векторы полные и top-k сразу точный
+        size = max(settings.vector_projection_shortlist_size, limit) if projection else limit
+        first_stage = await get_first_stage_vectors(self.db, model, len(vector), projection)
+        query = first_stage_query(projection, vector)
+        sharded = get_sharded_index(first_stage)
+        if sharded is not None:
+            candidate_ids = await sharded.top_k(query, size + 1)
+        else:
+            candidate_ids = top_k_ids(first_stage, query, size + 1)
+        candidate_ids = [candidate_id for candidate_id in candidate_ids.tolist() if candidate_id != employee_id]
+        
+        # Точное косинусное сходство по полным векторам
+        embeddings = await self.embedding_repo.get_embeddings_by_employee_ids(candidate_ids, model)
+        embeddings = [emb for emb in embeddings if emb.embedding and len(emb.embedding) == len(vector)]
+        if not embeddings:
+            return []
+        
+        matrix = np.asarray([emb.embedding for emb in embeddings], dtype=np.float32)
+        target = np.asarray(vector, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(target) or 1.0)
+        norms[norms == 0] = 1.0
+        scores = (matrix @ target) / norms
+        
+        order = np.argsort(-scores)[:limit]
+        top = [(embeddings[position].employee_id, float(scores[position])) for position in order]
+        
+        employees = await self.employee_repo.get_with_skills_by_ids([similar_id for similar_id, _ in top] + [employee_id])
+        by_id = {emp.id: emp for emp in employees}
+        own_skills = {skill.name for skill in by_id[employee_id].skills} if employee_id in by_id else set()
+        
+        result = []
+        for similar_id, score in top:
+            emp = by_id.get(similar_id)
+            if emp is None:
+                continue
+            skills = [skill.name for skill in emp.skills]
+            result.append({
+                "id": emp.id,
+                "full_name": emp.full_name,
+                "position": emp.position,
+                "department": emp.department,
+                "experience_years": emp.experience_years,
+                "skills": skills,
+                "shared_skills": [skill for skill in skills if skill in own_skills],
+                "level": emp.level,
+                "similarity": round(score, 3)
+            })
+        return result
@@ -0,0 +1,286 @@
+"""
+Граф связанности навыков для расширения запроса без LLM
+
+Строится офлайн по совместной встречаемости навыков у сотрудников
+(employee_skills): вес ребра - мера Отиаи c_ij / sqrt(c_i * c_j), по желанию
+смешанная с косинусом эмбеддингов названий навыков. Для каждого навыка
+хранятся только top-k соседей в виде CSR (indptr, indices, weights) в .npz.
+Расширение запроса - локальный просмотр соседей найденных навыков.
+
+Сборка графа и просмотр соседей:
+    python -m app.services.skill_graph build --neighbours 20 --embedding-weight 0.3
+    python -m app.services.skill_graph show Python FastAPI
+"""
+import argparse
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from app.core.config import settings
+
+# Сколько навыков обрабатывается за раз при отборе соседей
+BLOCK_SIZE = 512
+
+
+class SkillGraph:
+    """Соседи навыков в CSR: для навыка i - indices[indptr[i]:indptr[i + 1]] с весами"""
+
+    def __init__(self, names: np.ndarray, indptr: np.ndarray, indices: np.ndarray, weights: np.ndarray, version: str):
+        self.names = names
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        self.version = version
+        self.vocabulary: Dict[str, int] = {str(name).lower(): column for column, name in enumerate(names.tolist())}
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.indices)
+
+    @classmethod
+    def build(
+        cls,
+        skill_lists: List[List[str]],
+        neighbours: int,
+        min_cooccurrence: int = 2,
+        name_embeddings: Optional[np.ndarray] = None,
+        embedding_weight: float = 0.0,
+        names: Optional[List[str]] = None
+    ) -> "SkillGraph":
+        """Собрать граф по спискам навыков сотрудников.
+
+        name_embeddings - нормированные векторы названий навыков в порядке names
+        (names обязателен вместе с ними); вес ребра тогда
+        (1 - embedding_weight) * Отиаи + embedding_weight * косинус.
+        """
+        vocabulary: Dict[str, int] = {}
+        names = list(names or [])
+        for column, name in enumerate(names):
+            vocabulary.setdefault(name.lower(), column)
+
+        rows, columns = [], []
+        for row, skills in enumerate(skill_lists):
+            seen = set()
+            for skill in skills:
+                column = vocabulary.get(skill.lower())
+                if column is None:
+                    column = vocabulary[skill.lower()] = len(names)
+                    names.append(skill)
+                if column not in seen:
+                    seen.add(column)
+                    rows.append(row)
+                    columns.append(column)
+
+        count = len(names)
+        matrix = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.int32), (rows, columns)),
+            shape=(len(skill_lists), count)
+        )
+        # Совместная встречаемость: одно разреженное произведение X^T X
+        cooccurrence = (matrix.T @ matrix).tocsr()
+        frequency = cooccurrence.diagonal().astype(np.float64)
+        cooccurrence.setdiag(0)
+        cooccurrence.data[cooccurrence.data < min_cooccurrence] = 0
+        cooccurrence.eliminate_zeros()
+
+        coo = cooccurrence.tocoo()
+        ochiai = sparse.csr_matrix(
+            (coo.data / np.sqrt(frequency[coo.row] * frequency[coo.col]), (coo.row, coo.col)),
+            shape=(count, count)
+        )
+
+        use_embeddings = name_embeddings is not None and embedding_weight > 0
+        if use_embeddings:
+            # Навыки, которых не было в names, остаются без вектора
+            vectors = np.asarray(name_embeddings, dtype=np.float32)[:count]
+            name_embeddings = np.zeros((count, vectors.shape[1]), dtype=np.float32)
+            name_embeddings[:len(vectors)] = vectors
+
+        indptr = np.zeros(count + 1, dtype=np.int64)
+        indices, weights = [], []
+        for start in range(0, count, BLOCK_SIZE):
+            stop = min(start + BLOCK_SIZE, count)
+            block = ochiai[start:stop].toarray()
+            if use_embeddings:
+                block = (1 - embedding_weight) * block + embedding_weight * np.clip(
+                    name_embeddings[start:stop] @ name_embeddings.T, 0, None
+                )
+            block[np.arange(stop - start), np.arange(start, stop)] = 0
+
+            k = min(neighbours, count - 1)
+            if k <= 0:
+                break
+            top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+            top_weights = np.take_along_axis(block, top, axis=1)
+            order = np.argsort(-top_weights, axis=1, kind="stable")
+            top = np.take_along_axis(top, order, axis=1)
+            top_weights = np.take_along_axis(top_weights, order, axis=1)
+            for offset in range(stop - start):
+                keep = top_weights[offset] > 0
+                indices.append(top[offset][keep])
+                weights.append(top_weights[offset][keep])
+                indptr[start + offset + 1] = keep.sum()
+        np.cumsum(indptr, out=indptr)
+
+        indices = np.concatenate(indices).astype(np.int32) if indices else np.zeros(0, dtype=np.int32)
+        weights = np.concatenate(weights).astype(np.float32) if weights else np.zeros(0, dtype=np.float32)
+        version = time.strftime("%Y%m%dT%H%M%S")
+        return cls(np.array(names, dtype=str), indptr, indices, weights, version)
+
+    def neighbours(self, skill: str) -> List[Tuple[str, float]]:
+        """Соседи навыка по убыванию веса"""
+        column = self.vocabulary.get(skill.lower())
+        if column is None:
+            return []
+        start, stop = self.indptr[column], self.indptr[column + 1]
+        return [
+            (str(self.names[neighbour]), float(weight))
+            for neighbour, weight in zip(self.indices[start:stop].tolist(), self.weights[start:stop].tolist())
+        ]
+
+    def expand(self, skills: List[str], limit: int, min_weight: float = 0.0) -> List[Tuple[str, float]]:
+        """Связанные навыки для набора навыков запроса.
+
+        Вес кандидата - максимум по навыкам запроса; сами навыки запроса не возвращаются.
+        """
+        seeds = {self.vocabulary[skill.lower()] for skill in skills if skill.lower() in self.vocabulary}
+        if not seeds or limit <= 0:
+            return []
+
+        related: Dict[int, float] = {}
+        for column in seeds:
+            start, stop = self.indptr[column], self.indptr[column + 1]
+            for neighbour, weight in zip(self.indices[start:stop].tolist(), self.weights[start:stop].tolist()):
+                if neighbour not in seeds and weight >= min_weight and weight > related.get(neighbour, 0.0):
+                    related[neighbour] = weight
+
+        ranked = sorted(related.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [(str(self.names[column]), round(weight, 3)) for column, weight in ranked]
+
+    def save(self, path: str) -> None:
+        """Сохранить граф на диск (атомарная замена файла)"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(
+                f,
+                names=self.names,
+                indptr=self.indptr,
+                indices=self.indices,
+                weights=self.weights,
+                version=np.array(self.version)
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "SkillGraph":
+        """Загрузить граф с диска"""
+        with np.load(path, allow_pickle=False) as artifact:
+            return cls(
+                artifact["names"],
+                artifact["indptr"],
+                artifact["indices"],
+                artifact["weights"],
+                str(artifact["version"])
+            )
+
+
+_graph_cache = {"path": None, "mtime": None, "graph": None}
+
+
+def get_skill_graph() -> Optional[SkillGraph]:
+    """Граф, если он собран; перечитывается при обновлении файла"""
+    if not settings.skill_graph_enabled:
+        return None
+    path = settings.skill_graph_path
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    if _graph_cache["path"] != path or _graph_cache["mtime"] != mtime:
+        try:
+            graph = SkillGraph.load(path)
+        except Exception as e:
+            print(f"Ошибка загрузки графа навыков: {e}")
+            return None
+        _graph_cache.update({"path": path, "mtime": mtime, "graph": graph})
+    return _graph_cache["graph"]
+
+
+def expand_skills(skills: List[str]) -> List[Tuple[str, float]]:
+    """Связанные навыки запроса с весами (пусто, если граф не собран)"""
+    graph = get_skill_graph()
+    if graph is None or not skills:
+        return []
+    return graph.expand(skills, settings.skill_graph_expansion_limit, settings.skill_graph_min_weight)
+
+
+async def _build(neighbours: int, min_cooccurrence: int, embedding_weight: float, model: Optional[str]) -> None:
+    from sqlalchemy import select
+
+    from app.core.database import AsyncSessionLocal
+    from app.models.skill import Skill
+    from app.repositories.employee import EmployeeRepository
+    from app.services.embedding_models import get_active_embedding_model
+    from app.services.embedding_providers import get_embedding_provider
+
+    async with AsyncSessionLocal() as db:
+        _, skills_by_employee = await EmployeeRepository(db).get_index_rows()
+        names = sorted(set((await db.execute(select(Skill.name))).scalars().all()))
+        name_embeddings = None
+        if embedding_weight > 0:
+            model = model or await get_active_embedding_model(db)
+            vectors = np.asarray(await get_embedding_provider(model).embed(names), dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            name_embeddings = vectors / norms
+
+    started = time.monotonic()
+    graph = SkillGraph.build(
+        list(skills_by_employee.values()),
+        neighbours,
+        min_cooccurrence,
+        name_embeddings,
+        embedding_weight,
+        names
+    )
+    graph.save(settings.skill_graph_path)
+    print(
+        f"Граф навыков {graph.version}: {len(graph.names)} навыков, {graph.edge_count} ребер, "
+        f"{len(skills_by_employee)} сотрудников, {time.monotonic() - started:.1f} с"
+    )
+
+
+def _show(skills: List[str]) -> None:
+    graph = get_skill_graph()
+    if graph is None:
+        print(f"Граф навыков не собран: {settings.skill_graph_path}")
+        return
+    for skill in skills:
+        print(f"{skill}: " + ", ".join(f"{name} ({weight:.2f})" for name, weight in graph.neighbours(skill)))
+    print("Расширение: " + ", ".join(f"{name} ({weight:.2f})" for name, weight in expand_skills(skills)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Граф связанности навыков")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build")
+    build_parser.add_argument("--neighbours", type=int, default=settings.skill_graph_neighbours)
+    build_parser.add_argument("--min-cooccurrence", type=int, default=settings.skill_graph_min_cooccurrence)
+    build_parser.add_argument("--embedding-weight", type=float, default=0.0)
+    build_parser.add_argument("--model", default=None)
+
+    show_parser = subparsers.add_parser("show")
+    show_parser.add_argument("skills", nargs="+")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        asyncio.run(_build(args.neighbours, args.min_cooccurrence, args.embedding_weight, args.model))
+    else:
+        _show(args.skills)
@@ -0,0 +1,207 @@
+"""
+Разреженная матрица навыков сотрудников с весами IDF
+
+Строка - сотрудник (строка индекса поиска), столбец - навык. Вес навыка
+idf = ln((1 + N) / (1 + df)) + 1: редкий навык весит больше, чем «Git»
+у половины компании. Строки нормированы, поэтому сходство с запросом -
+косинус TF-IDF векторов (для бинарных векторов без весов - мера Отиаи),
+и для всех сотрудников он считается одним умножением CSR-матрицы на вектор.
+"""
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+
+class SkillMatrix:
+    """Матрица сотрудник × навык, обновляемая по строкам.
+
+    Частоты навыков (df) поддерживаются инкрементально; CSR-матрица
+    с весами собирается заново одной векторной операцией при первом
+    обращении после изменений. Собранная матрица после этого не меняется:
+    изменение строки лишь сбрасывает ссылку на неё.
+    """
+    
+    def __init__(self, skills_by_row: Iterable[List[str]]):
+        self.vocabulary: Dict[str, int] = {}
+        self.names: List[str] = []
+        self.document_frequency = np.zeros(0, dtype=np.int64)
+        self._rows: List[np.ndarray] = []
+        self._active_rows = 0
+        self._weighted: Optional[sparse.csr_matrix] = None
+        
+        # Начальная сборка - пакетом: словарь и столбцы всех пар (строка, навык),
+        # затем уникальные пары одной сортировкой и df через bincount
+        skills_by_row = list(skills_by_row)
+        flat = [skill for skills in skills_by_row for skill in skills]
+        keys = [skill.lower() for skill in flat]
+        # Название столбца - первое написание навыка
+        first_names = dict(zip(reversed(keys), reversed(flat)))
+        for column, key in enumerate(dict.fromkeys(keys)):
+            self.vocabulary[key] = column
+            self.names.append(str(first_names[key]))
+        
+        count = len(skills_by_row)
+        width = max(len(self.names), 1)
+        lengths = np.fromiter((len(skills) for skills in skills_by_row), dtype=np.int64, count=count)
+        pairs = np.repeat(np.arange(count, dtype=np.int64), lengths) * width
+        pairs += np.fromiter(map(self.vocabulary.__getitem__, keys), dtype=np.int64, count=len(keys))
+        pairs.sort()
+        pairs = pairs[np.r_[True, pairs[1:] != pairs[:-1]]] if len(pairs) else pairs
+        pair_columns = (pairs % width).astype(np.int32)
+        
+        indptr = np.zeros(count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pairs // width, minlength=count), out=indptr[1:])
+        self._rows = [pair_columns[start:stop] for start, stop in zip(indptr[:-1].tolist(), indptr[1:].tolist())]
+        self.document_frequency = np.bincount(pair_columns, minlength=len(self.names)).astype(np.int64)
+        self._active_rows = int(np.count_nonzero(np.diff(indptr)))
+    
+    def __len__(self) -> int:
+        return len(self._rows)
+    
+    def _columns_for(self, skills: Iterable[str], add: bool) -> np.ndarray:
+        columns = set()
+        for skill in skills:
+            key = skill.lower()
+            column = self.vocabulary.get(key)
+            if column is None and add:
+                column = len(self.names)
+                self.vocabulary[key] = column
+                self.names.append(str(skill))
+            if column is not None:
+                columns.add(column)
+        return np.array(sorted(columns), dtype=np.int32)
+    
+    def set_row(self, row: int, skills: List[str]) -> None:
+        """Записать навыки строки (row == len(self) - новая строка)"""
+        if row < len(self._rows):
+            self.clear_row(row)
+        else:
+            self._rows.append(np.zeros(0, dtype=np.int32))
+        
+        columns = self._columns_for(skills, add=True)
+        if len(self.names) > len(self.document_frequency):
+            grown = np.zeros(len(self.names), dtype=np.int64)
+            grown[:len(self.document_frequency)] = self.document_frequency
+            self.document_frequency = grown
+        self.document_frequency[columns] += 1
+        self._rows[row] = columns
+        if len(columns):
+            self._active_rows += 1
+        self._weighted = None
+    
+    def clear_row(self, row: int) -> None:
+        """Убрать навыки строки (сотрудник удален из индекса)"""
+        columns = self._rows[row]
+        if len(columns):
+            self.document_frequency[columns] -= 1
+            self._active_rows -= 1
+        self._rows[row] = np.zeros(0, dtype=np.int32)
+        self._weighted = None
+    
+    def idf(self) -> np.ndarray:
+        """Веса IDF по столбцам"""
+        return np.log((1 + self._active_rows) / (1 + self.document_frequency)) + 1
+    
+    def weighted(self) -> sparse.csr_matrix:
+        """Нормированная TF-IDF матрица (собирается заново после изменений)"""
+        weighted = self._weighted
+        if weighted is None:
+            rows = self._rows
+            idf = self.idf()
+            lengths = np.fromiter((len(columns) for columns in rows), dtype=np.int64, count=len(rows))
+            indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=indptr[1:])
+            indices = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int32)
+            data = idf[indices]
+            
+            # L2-нормировка строк без цикла: сумма квадратов по сегментам
+            norms = np.zeros(len(rows))
+            nonempty = lengths > 0
+            if indices.size:
+                norms[nonempty] = np.sqrt(np.add.reduceat(data ** 2, indptr[:-1][nonempty]))
+            data = data / np.repeat(np.where(norms > 0, norms, 1.0), lengths)
+            
+            weighted = sparse.csr_matrix((data, indices, indptr), shape=(len(rows), len(idf)))
+            self._weighted = weighted
+        return weighted
+    
+    def query_vector(self, terms: Iterable[str], weights: Optional[Dict[str, float]] = None) -> Optional[np.ndarray]:
+        """Нормированный вектор запроса по известным навыкам (None - совпадений нет).
+
+        weights - множители IDF для отдельных терминов (например, связанных навыков).
+        """
+        terms = list(terms) + list(weights or {})
+        columns = self._columns_for(terms, add=False)
+        if not len(columns):
+            return None
+        query = np.zeros(len(self.names))
+        query[columns] = self.idf()[columns]
+        for term, weight in (weights or {}).items():
+            column = self.vocabulary.get(term.lower())
+            if column is not None:
+                query[column] *= weight
+        norm = np.linalg.norm(query)
+        return query / norm if norm > 0 else None
+    
+    def score(
+        self,
+        terms: Iterable[str],
+        rows: Optional[np.ndarray] = None,
+        weights: Optional[Dict[str, float]] = None
+    ) -> np.ndarray:
+        """Косинусное сходство навыков запроса со строками (все или выбранные rows)"""
+        count = len(self._rows) if rows is None else len(rows)
+        matrix, query = self.frozen(terms, weights)
+        if query is None:
+            return np.zeros(count)
+        if rows is not None:
+            matrix = matrix[rows]
+        return matrix @ query
+    
+    def frozen(
+        self,
+        terms: Iterable[str],
+        weights: Optional[Dict[str, float]] = None
+    ) -> Tuple[sparse.csr_matrix, Optional[np.ndarray]]:
+        """Неизменяемые данные для расчета сходства вне event loop: собранная
+        CSR-матрица и вектор запроса с IDF на момент вызова (None - совпадений нет)"""
+        matrix = self.weighted()
+        query = self.query_vector(terms, weights)
+        # Навыки, появившиеся после сборки матрицы, в ней не участвуют
+        return matrix, (query[:matrix.shape[1]] if query is not None else None)
+    
+    def score_lists(
+        self,
+        terms: Iterable[str],
+        skill_lists: List[List[str]],
+        weights: Optional[Dict[str, float]] = None
+    ) -> np.ndarray:
+        """То же для сотрудников, которых еще нет в матрице (веса - по текущим df)"""
+        query = self.query_vector(terms, weights)
+        if query is None or not skill_lists:
+            return np.zeros(len(skill_lists))
+        
+        idf = self.idf()
+        # Навык, неизвестный матрице, весит как встреченный ноль раз
+        unknown_weight = math.log(1 + self._active_rows) + 1
+        scores = np.zeros(len(skill_lists))
+        for position, skills in enumerate(skill_lists):
+            columns = self._columns_for(skills, add=False)
+            unknown = len({skill.lower() for skill in skills}) - len(columns)
+            norm = math.sqrt(float(np.sum(idf[columns] ** 2)) + unknown * unknown_weight ** 2)
+            if norm > 0:
+                scores[position] = float(idf[columns] @ query[columns]) / norm
+        return scores
+    
+    def top_skills(self, limit: int = 10, rare: bool = False) -> List[Tuple[str, int, float]]:
+        """Навыки с числом сотрудников и IDF: самые частые или (rare) самые редкие"""
+        idf = self.idf()
+        held = np.flatnonzero(self.document_frequency > 0)
+        key = idf[held] if rare else self.document_frequency[held]
+        order = held[np.argsort(-key, kind="stable")][:limit]
+        return [
+            (self.names[column], int(self.document_frequency[column]), round(float(idf[column]), 3))
+            for column in order.tolist()
+        ]
@@ -0,0 +1,380 @@
+"""
+Язык запросов по навыкам с вычислением на битовых картах индекса
+
+Примеры:
+    (Python OR Go) AND Kubernetes AND NOT 1C
+    python go        - пробел между условиями означает AND
+    "Machine Learning" AND dept:"Data Science" AND exp:3..7
+    Java* AND exp>=5 AND grade:senior
+
+Операторы: AND / OR / NOT (также И / ИЛИ / НЕ, &&, ||, !), скобки.
+Поля: skill, dept (department, отдел), exp (experience, стаж), grade (грейд),
+level (уровень). Стаж задается как exp:3, exp:3..7, exp:3-7, exp:3+, exp>=3.
+Слово без поля - навык (регистр не важен, понимаются синонимы, * - префикс).
+Запрос разбирается в AST и вычисляется как AND / OR / ANDNOT битовых карт
+индекса поиска без обращения к базе: навыки берутся из битовых карт фасетов,
+условия на отдел, стаж, грейд и уровень - из масок колоночного хранилища.
+"""
+import re
+import time
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.repositories.search_document import SearchDocumentRepository
+from app.services.query_parser import SKILL_ALIASES
+from app.services.search_index import (
+    SearchIndex,
+    FACET_DEPARTMENT,
+    FACET_EXPERIENCE,
+    FACET_GRADE,
+    FACET_LEVEL,
+    FACET_SKILL,
+    NO_DEPARTMENT,
+    get_search_index
+)
+from app.services.smart_search import SmartSearchService
+
+FIELD_ALIASES = {
+    "skill": FACET_SKILL,
+    "навык": FACET_SKILL,
+    "dept": FACET_DEPARTMENT,
+    "department": FACET_DEPARTMENT,
+    "отдел": FACET_DEPARTMENT,
+    "exp": FACET_EXPERIENCE,
+    "experience": FACET_EXPERIENCE,
+    "стаж": FACET_EXPERIENCE,
+    "grade": FACET_GRADE,
+    "грейд": FACET_GRADE,
+    "level": FACET_LEVEL,
+    "уровень": FACET_LEVEL,
+}
+
+OPERATORS = {
+    "and": "AND", "и": "AND", "&&": "AND",
+    "or": "OR", "или": "OR", "||": "OR",
+    "not": "NOT", "не": "NOT", "!": "NOT",
+}
+
+_TOKEN_RE = re.compile(r'''
+    (?P<space>\s+)
+  | (?P<lparen>\()
+  | (?P<rparen>\))
+  | (?P<field>(?P<name>[^\W\d]\w*)\s*(?P<op>>=|<=|>|<|=|:)\s*(?:"(?P<quoted_value>[^"]*)"|(?P<value>[^\s()"]+)))
+  | "(?P<phrase>[^"]*)"
+  | (?P<symbol>&&|\|\||!)
+  | (?P<word>[^\s()"]+)
+''', re.VERBOSE)
+
+_RANGE_RE = re.compile(r"^(\d+)(?:\s*(?:\.\.|-)\s*(\d+))?(\+)?$")
+
+_SKILL_ALIASES = {alias.lower(): canonical for alias, canonical in SKILL_ALIASES.items()}
+
+
+class SkillQuerySyntaxError(ValueError):
+    """Ошибка разбора запроса"""
+    pass
+
+
+class Node(ABC):
+    """Узел AST запроса"""
+    
+    @abstractmethod
+    def evaluate(self, index: SearchIndex) -> int:
+        """Битовая карта строк индекса, удовлетворяющих узлу"""
+    
+    def positive_terms(self) -> List[str]:
+        """Навыки вне NOT - из них собирается текст для семантического ранжирования"""
+        return []
+
+
+class Term(Node):
+    """Значение поля (навык, отдел, грейд, уровень)"""
+    
+    def __init__(self, field: str, value: str):
+        self.field = field
+        self.value = value
+    
+    def evaluate(self, index: SearchIndex) -> int:
+        if self.field == FACET_SKILL:
+            return self._skill_bitmap(index)
+        
+        target = self.value.lower()
+        if self.field == FACET_DEPARTMENT:
+            departments = [department for department in index.departments + [NO_DEPARTMENT] if department.lower() == target]
+            return index.bitmap_from_mask(index.column_mask(departments=departments))
+        if self.field == FACET_GRADE:
+            return index.bitmap_from_mask(index.column_mask(grades=[target]))
+        return index.bitmap_from_mask(index.column_mask(levels=[self.value]))
+    
+    def _skill_bitmap(self, index: SearchIndex) -> int:
+        skills = index.facets[FACET_SKILL]
+        value = self.value.lower()
+        if value.endswith("*"):
+            prefix = value[:-1]
+            bitmap = 0
+            for key, skill in index.skill_keys.items():
+                if key.startswith(prefix):
+                    bitmap |= skills.get(skill, 0)
+            return bitmap
+        
+        skill = index.skill_keys.get(value)
+        if skill is None and value in _SKILL_ALIASES:
+            skill = index.skill_keys.get(_SKILL_ALIASES[value].lower())
+        return skills.get(skill, 0) if skill else 0
+    
+    def positive_terms(self) -> List[str]:
+        return [self.value.rstrip("*")] if self.field == FACET_SKILL else []
+    
+    def __repr__(self) -> str:
+        return f"{self.field}:{self.value!r}"
+
+
+class Range(Node):
+    """Диапазон стажа в годах (границы включительно, None - без границы)"""
+    
+    def __init__(self, low: Optional[int], high: Optional[int]):
+        self.low = low
+        self.high = high
+    
+    def evaluate(self, index: SearchIndex) -> int:
+        return index.bitmap_from_mask(index.column_mask(min_experience=self.low, max_experience=self.high))
+    
+    def __repr__(self) -> str:
+        return f"exp:{self.low}..{self.high}"
+
+
+class Not(Node):
+    def __init__(self, child: Node):
+        self.child = child
+    
+    def evaluate(self, index: SearchIndex) -> int:
+        return index.all_rows & ~self.child.evaluate(index)
+    
+    def __repr__(self) -> str:
+        return f"NOT {self.child!r}"
+
+
+class And(Node):
+    def __init__(self, children: List[Node]):
+        self.children = children
+    
+    def evaluate(self, index: SearchIndex) -> int:
+        # Сначала положительные условия, затем ANDNOT - без построения дополнения
+        bitmap = index.all_rows
+        for child in sorted(self.children, key=lambda node: isinstance(node, Not)):
+            if isinstance(child, Not):
+                bitmap &= ~child.child.evaluate(index)
+            else:
+                bitmap &= child.evaluate(index)
+            if not bitmap:
+                break
+        return bitmap
+    
+    def positive_terms(self) -> List[str]:
+        return [term for child in self.children for term in child.positive_terms()]
+    
+    def __repr__(self) -> str:
+        return "(" + " AND ".join(map(repr, self.children)) + ")"
+
+
+class Or(Node):
+    def __init__(self, children: List[Node]):
+        self.children = children
+    
+    def evaluate(self, index: SearchIndex) -> int:
+        bitmap = 0
+        for child in self.children:
+            bitmap |= child.evaluate(index)
+        return bitmap
+    
+    def positive_terms(self) -> List[str]:
+        return [term for child in self.children for term in child.positive_terms()]
+    
+    def __repr__(self) -> str:
+        return "(" + " OR ".join(map(repr, self.children)) + ")"
+
+
+def tokenize_query(query: str) -> List[Tuple[str, Any]]:
+    """Разбить запрос на лексемы: LPAREN, RPAREN, OP, TERM"""
+    tokens = []
+    position = 0
+    while position < len(query):
+        match = _TOKEN_RE.match(query, position)
+        if not match:
+            raise SkillQuerySyntaxError(f"Непонятный символ в позиции {position}: {query[position]!r}")
+        position = match.end()
+        kind = match.lastgroup
+        
+        if kind == "space":
+            continue
+        if kind == "lparen":
+            tokens.append(("LPAREN", None))
+        elif kind == "rparen":
+            tokens.append(("RPAREN", None))
+        elif kind == "phrase":
+            tokens.append(("TERM", Term(FACET_SKILL, match.group("phrase"))))
+        elif kind == "symbol":
+            tokens.append(("OP", OPERATORS[match.group("symbol")]))
+        elif kind == "field":
+            field = FIELD_ALIASES.get(match.group("name").lower())
+            if field is None:
+                # Не поле, а навык с двоеточием (например, "1C:Предприятие")
+                tokens.append(("TERM", Term(FACET_SKILL, match.group(0))))
+                continue
+            value = match.group("quoted_value")
+            if value is None:
+                value = match.group("value")
+            tokens.append(("TERM", _field_node(field, match.group("op"), value)))
+        else:
+            word = match.group("word")
+            operator = OPERATORS.get(word.lower())
+            tokens.append(("OP", operator) if operator else ("TERM", Term(FACET_SKILL, word)))
+    return tokens
+
+
+def _field_node(field: str, op: str, value: str) -> Node:
+    if field != FACET_EXPERIENCE:
+        if op not in (":", "="):
+            raise SkillQuerySyntaxError(f"Сравнение {op} допустимо только для стажа")
+        return Term(field, value)
+    
+    if op in (">=", ">", "<=", "<"):
+        if not value.isdigit():
+            raise SkillQuerySyntaxError(f"Стаж должен быть числом: {value!r}")
+        years = int(value)
+        return {
+            ">=": Range(years, None),
+            ">": Range(years + 1, None),
+            "<=": Range(None, years),
+            "<": Range(None, years - 1),
+        }[op]
+    
+    match = _RANGE_RE.match(value)
+    if not match:
+        raise SkillQuerySyntaxError(f"Неверный диапазон стажа: {value!r}")
+    low = int(match.group(1))
+    if match.group(3):
+        return Range(low, None)
+    high = int(match.group(2)) if match.group(2) else low
+    return Range(low, high)
+
+
+class _Parser:
+    """Рекурсивный спуск: or := and (OR and)*; and := not (AND? not)*; not := NOT not | primary"""
+    
+    def __init__(self, tokens: List[Tuple[str, Any]]):
+        self.tokens = tokens
+        self.position = 0
+    
+    def _peek(self) -> Tuple[Optional[str], Any]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+    
+    def _next(self) -> Tuple[Optional[str], Any]:
+        token = self._peek()
+        self.position += 1
+        return token
+    
+    def parse(self) -> Node:
+        if not self.tokens:
+            raise SkillQuerySyntaxError("Пустой запрос")
+        node = self._parse_or()
+        if self.position < len(self.tokens):
+            raise SkillQuerySyntaxError("Лишняя закрывающая скобка или оператор")
+        return node
+    
+    def _parse_or(self) -> Node:
+        children = [self._parse_and()]
+        while self._peek() == ("OP", "OR"):
+            self._next()
+            children.append(self._parse_and())
+        return children[0] if len(children) == 1 else Or(children)
+    
+    def _parse_and(self) -> Node:
+        children = [self._parse_not()]
+        while True:
+            kind, value = self._peek()
+            if (kind, value) == ("OP", "AND"):
+                self._next()
+            elif kind in ("TERM", "LPAREN") or (kind, value) == ("OP", "NOT"):
+                pass  # Неявный AND
+            else:
+                break
+            children.append(self._parse_not())
+        return children[0] if len(children) == 1 else And(children)
+    
+    def _parse_not(self) -> Node:
+        if self._peek() == ("OP", "NOT"):
+            self._next()
+            return Not(self._parse_not())
+        return self._parse_primary()
+    
+    def _parse_primary(self) -> Node:
+        kind, value = self._next()
+        if kind == "TERM":
+            return value
+        if kind == "LPAREN":
+            node = self._parse_or()
+            if self._next()[0] != "RPAREN":
+                raise SkillQuerySyntaxError("Не закрыта скобка")
+            return node
+        if kind is None:
+            raise SkillQuerySyntaxError("Запрос оборван: ожидалось условие")
+        raise SkillQuerySyntaxError(f"Ожидалось условие, а встретилось {value or kind}")
+
+
+@lru_cache(maxsize=1024)
+def parse_skill_query(query: str) -> Node:
+    """Разобрать запрос в AST (разобранные запросы кэшируются)"""
+    return _Parser(tokenize_query(query)).parse()
+
+
+class SkillQueryService:
+    """Поиск по языку запросов с необязательным семантическим ранжированием"""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def search(self, query: str, rank: bool = False, limit: int = 20) -> Dict[str, Any]:
+        """Вычислить запрос на индексе; при rank - ранжировать найденных умным поиском"""
+        ast = parse_skill_query(query)
+        index = await get_search_index(self.db)
+        
+        started = time.perf_counter()
+        bitmap = ast.evaluate(index)
+        evaluation_us = (time.perf_counter() - started) * 1e6
+        employee_ids = index.ids_for_bitmap(bitmap)
+        
+        if rank and employee_ids:
+            text = ", ".join(dict.fromkeys(ast.positive_terms())) or query
+            results = await SmartSearchService(self.db).smart_search_employees(text, limit, candidate_ids=employee_ids)
+        else:
+            results = await self._hydrate(employee_ids[:limit])
+        
+        return {
+            "query": query,
+            "parsed": repr(ast),
+            "total": len(employee_ids),
+            "evaluation_us": round(evaluation_us, 1),
+            "results": results
+        }
+    
+    async def _hydrate(self, employee_ids: List[int]) -> List[Dict[str, Any]]:
+        employees = await SearchDocumentRepository(self.db).get_rows_by_ids(employee_ids)
+        by_id = {emp.id: emp for emp in employees}
+        return [
+            {
+                "id": emp.id,
+                "full_name": emp.full_name,
+                "position": emp.position,
+                "department": emp.department,
+                "experience_years": emp.experience_years,
+                "skills": list(emp.skills),
+                "level": emp.level,
+                "xp_points": emp.xp_points
+            }
+            for emp in (by_id.get(employee_id) for employee_id in employee_ids)
+            if emp is not None
+        ]
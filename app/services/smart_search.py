@@ -5,23 +5,108 @@ import asyncio
 import json
 import httpx
 import re
+from dataclasses import dataclass
 
 import nltk
 import numpy as np
 from pymorphy3 import MorphAnalyzer
-from typing import List, Dict, Any
+from scipy import sparse
+from typing import List, Dict, Any, Optional, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, exists
 from sqlalchemy.orm import selectinload
 
 from app.core.config import settings
 from app.models.employee import Employee
+from app.models.employee_embedding import EmployeeEmbedding
 from app.models.skill import Skill
 from app.repositories.employee_embedding import EmployeeEmbeddingRepository
 from app.repositories.employee import EmployeeRepository
+from app.repositories.search_document import SearchDocumentRepository
+from app.services.embedding_models import get_active_embedding_model
+from app.services.embedding_providers import get_embedding_provider, get_local_embedding_provider
+from app.services.profile_document import profile_document_builder
+from app.services.query_parser import get_local_query_parser
+from app.services.vector_projection import (
+    get_vector_projection,
+    get_first_stage_vectors,
+    first_stage_query,
+    top_k_ids
+)
+from app.services.search_shards import get_sharded_index
+from app.services.section_embeddings import SectionEmbeddingService
+from app.services.search_documents import decode_embedding
+from app.services.search_index import SearchIndex, GRADE_CODES, grade_scores, get_search_index
+from app.services.cpu_pool import run_cpu
+from app.services.skill_matrix import SkillMatrix
+from app.services.skill_graph import expand_skills
+from app.services.spell_correction import correct_query
+from app.services.query_log import log_cache, log_stage
+from app.utils.exceptions import SearchOverloadedError
 
 nltk.download('stopwords')
 
+_EMPTY_VECTOR = np.zeros(0, dtype=np.float32)
+
+
+@dataclass(frozen=True)
+class RankingInputs:
+    """Массивы кандидатов для ранжирования в пуле потоков.
+
+    Собираются в event loop и не ссылаются на изменяемые структуры процесса:
+    колонки индекса скопированы, CSR-матрица навыков после сборки не меняется,
+    векторы - float32 без промежуточных списков. Слушатель изменений патчит
+    индекс в event loop параллельно с расчетом.
+    """
+    vector_positions: np.ndarray
+    vectors: Tuple[np.ndarray, ...]
+    query: np.ndarray
+    section_positions: np.ndarray
+    section_scores: np.ndarray
+    grade_codes: np.ndarray
+    levels: np.ndarray
+    # Оценки навыков сотрудников вне индекса; для skill_positions считаются по skill_matrix
+    skill_scores: np.ndarray
+    skill_positions: np.ndarray
+    skill_rows: np.ndarray
+    skill_matrix: Optional[sparse.csr_matrix]
+    skill_query: Optional[np.ndarray]
+
+
+def score_candidates(inputs: RankingInputs, required_grade: str) -> Dict[str, np.ndarray]:
+    """Слагаемые релевантности и порядок кандидатов (только операции над массивами)"""
+    # 1. Семантическое сходство (основная метрика, 60% веса)
+    semantic = np.zeros(len(inputs.grade_codes))
+    if len(inputs.vector_positions):
+        matrix = np.stack(inputs.vectors)
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(inputs.query)
+        semantic[inputs.vector_positions] = np.divide(
+            matrix @ inputs.query, norms, out=np.zeros(len(norms), dtype=np.float32), where=norms > 0
+        )
+    semantic[inputs.section_positions] = inputs.section_scores
+    
+    # 2. Метрика по грейду (сходимость грейдов анкеты и вакансии, 20% веса)
+    grade = grade_scores(inputs.grade_codes, required_grade)
+    
+    # 3. Сходство навыков (15% веса)
+    ochiai = inputs.skill_scores.copy()
+    if inputs.skill_query is not None and len(inputs.skill_positions):
+        ochiai[inputs.skill_positions] = inputs.skill_matrix[inputs.skill_rows] @ inputs.skill_query
+    
+    # 4. Кол-во XP (бонус, 5% веса)
+    level = inputs.levels.astype(np.float64)
+    
+    relevance = semantic * 0.6 + grade * 0.2 + ochiai * 0.15 + level * 0.05
+    return {
+        "order": np.argsort(-relevance, kind="stable"),
+        "relevance": relevance,
+        "semantic": semantic,
+        "grade": grade,
+        "ochiai": ochiai,
+        "level": level
+    }
+
+
 class SmartSearchService:
     """Сервис умного поиска сотрудников"""
     
@@ -34,46 +119,56 @@ class SmartSearchService:
         # Простое кэширование парсинга запросов
         self._query_cache = {}
     
-    async def smart_search_employees(self, query: str) -> List[Dict[str, Any]]:
-        """Умный поиск сотрудников с ранжированием"""
+    async def smart_search_employees(
+        self,
+        query: str,
+        limit: int = 20,
+        candidate_ids: Optional[List[int]] = None
+    ) -> List[Dict[str, Any]]:
+        """Умный поиск сотрудников с ранжированием.
+
+        candidate_ids - ранжировать только этих сотрудников (уже отобранных фильтром).
+        """
         try:
             
-            # 1. Парсим запрос с помощью LLM
-            parsed_query = await self._parse_search_query(query)
-            
-            # 2. Обрабатываем текст запроса
-            query_with_skills = f'''
-            Запрос: {query}; Навыки: {', '.join(parsed_query['skills'])} 
-            '''
-            parsed_query['query'] = self._process_text(query_with_skills)
+            # 1-2. Парсим запрос и готовим текст для эмбеддинга
+            with log_stage("prepare_query"):
+                parsed_query = await self.prepare_query(query)
 
-            # 3. Параллельно получаем сотрудников и эмбеддинг запроса
-            employees_task = self._get_all_employees_with_skills()
-            query_embedding_task = self._get_embedding(parsed_query["query"])
-            
-            employees, query_embedding = await asyncio.gather(
-                employees_task, 
-                query_embedding_task
-            )
+            # 3. Получаем сотрудников и эмбеддинги, вычисляем релевантность и ранжируем
+            ranked_employees = await self.rank_semantic(parsed_query, candidate_ids)
             
-            # 4. Получаем эмбеддинги сотрудников
-            employee_embeddings = await self._get_employee_embeddings(employees)
-            
-            # 5. Вычисляем релевантность и ранжируем
-            ranked_employees = self._rank_employees(
-                employees, 
-                employee_embeddings, 
-                query_embedding,
-                parsed_query
-            )
-            
-            # Ограничиваем количество результатов для производительности
-            return ranked_employees[:20]
+            # 4. Поля для выдачи загружаем только для попавших в выдачу
+            with log_stage("hydrate"):
+                return await self.hydrate_results(ranked_employees[:limit])
             
+        except SearchOverloadedError:
+            # Перегрузку не маскируем fallback-поиском: клиент должен повторить запрос
+            raise
         except Exception as e:
             print(f"Ошибка в умном поиске: {e}")
             # Fallback к простому поиску
-            return await self._fallback_search(query)
+            with log_stage("fallback"):
+                return await self._fallback_search(query, limit, candidate_ids)
+    
+    async def prepare_query(self, query: str) -> Dict[str, Any]:
+        """Разобрать запрос и подготовить текст для эмбеддинга (parsed_query['query'])"""
+        # Опечатки исправляются до любого сопоставления: "Pyton" -> "python"
+        query = await correct_query(self.db, query)
+        parsed_query = await self._parse_search_query(query)
+        
+        # Связанные навыки из графа совместной встречаемости - без обращения к LLM.
+        # В текст для эмбеддинга не добавляются: учитываются в сходстве навыков с весом ребра
+        parsed_query['related_skills'] = [
+            {"name": name, "weight": weight}
+            for name, weight in expand_skills(parsed_query['skills'])
+        ]
+        
+        query_with_skills = f'''
+        Запрос: {query}; Навыки: {', '.join(parsed_query['skills'])} 
+        '''
+        parsed_query['query'] = self._process_text(query_with_skills)
+        return parsed_query
     
     def _process_text(self, text: str) -> str:
         stopwords = nltk.corpus.stopwords.words('russian')
@@ -90,10 +185,38 @@ class SmartSearchService:
         return ' '.join(processed_query)
 
     async def _parse_search_query(self, query: str) -> Dict[str, Any]:
-        """Парсинг запроса с помощью LLM"""
+        """Парсинг запроса: локально по справочнику навыков, LLM - только при низкой уверенности"""
+        log_cache("query_parse", query in self._query_cache)
         if query in self._query_cache:
             return self._query_cache[query]
         
+        local_result = None
+        if self.db:
+            try:
+                parser = await get_local_query_parser(self.db)
+                local_result = parser.parse(query).to_dict()
+            except Exception as e:
+                print(f"Ошибка локального парсинга запроса: {e}")
+        
+        if local_result and local_result["confidence"] >= settings.query_parser_confidence_threshold:
+            self._query_cache[query] = local_result
+            return local_result
+        
+        with log_stage("llm_parse"):
+            llm_result = await self._parse_search_query_llm(query)
+        if llm_result:
+            # Навыки, найденные по справочнику, не теряем
+            if local_result:
+                for skill in local_result["skills"]:
+                    if skill not in llm_result["skills"]:
+                        llm_result["skills"].append(skill)
+            self._query_cache[query] = llm_result
+            return llm_result
+        
+        return local_result or {"skills": [], "grade": "Middle", "confidence": 0.0, "source": "local"}
+    
+    async def _parse_search_query_llm(self, query: str) -> Dict[str, Any]:
+        """Парсинг запроса с помощью LLM"""
         prompt = f"""
             Ты HR-специалист. Проанализируй запрос на поиск сотрудника и извлеки мета данные о необходимых и смежных навыках.
             Например, по запросу "Ищу Python-Backend программиста" можно понять, что нужен человек со знанием FastAPI, Django, SQL и т.д.
@@ -118,229 +241,418 @@ class SmartSearchService:
             json_end = response.rfind('}') + 1
             if json_start != -1 and json_end != 0:
                 json_str = response[json_start:json_end]
-                return json.loads(json_str)
+                parsed = json.loads(json_str)
+                return {
+                    "skills": list(parsed.get("skills") or []),
+                    "grade": parsed.get("grade") or "Middle",
+                    "source": "llm"
+                }
         except Exception as e:
             print(f"Ошибка парсинга LLM: {e}")
+        return None
 
-    async def _get_all_employees_with_skills(self) -> List[Employee]:
-        """Получить всех сотрудников с навыками и обязательными полями"""
+    async def _get_search_documents(self, candidate_ids: Optional[List[int]] = None) -> list:
+        """Компактные строки для ранжирования всех допущенных сотрудников (или только кандидатов).
+
+        ID, грейд, уровень, навыки и эмбеддинг - без полей для выдачи,
+        join и ORM-объектов.
+        """
+        return await SearchDocumentRepository(self.db).get_ranking_rows(candidate_ids)
+    
+    async def hydrate_results(self, ranked: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Дополнить отобранные результаты полями для выдачи одним запросом"""
+        rows = await SearchDocumentRepository(self.db).get_rows_by_ids([item["id"] for item in ranked])
+        by_id = {row.id: row for row in rows}
         
-        result = await self.db.execute(
-            select(Employee)
-            .options(selectinload(Employee.skills))
-            .where(
-                Employee.first_name.isnot(None),
-                Employee.last_name.isnot(None),
-                Employee.position.isnot(None),
-                Employee.bio.isnot(None),
-                Employee.first_name != '',
-                Employee.last_name != '',
-                Employee.position != '',
-                Employee.bio != '',
-                Employee.skills.any()
-            )
-        )
-        return result.scalars().all()
+        result = []
+        for item in ranked:
+            emp = by_id.get(item["id"])
+            if emp is None:
+                # Сотрудник удален между ранжированием и загрузкой
+                continue
+            result.append({
+                "id": emp.id,
+                "full_name": emp.full_name,
+                "position": emp.position,
+                "department": emp.department,
+                "experience_years": emp.experience_years,
+                "skills": list(emp.skills),
+                "level": emp.level,
+                "xp_points": emp.xp_points,
+                **{key: value for key, value in item.items() if key != "id"}
+            })
+        return result
     
-    async def _get_embedding(self, text: str) -> List[float]:
+    async def _get_embedding(self, text: str, model: str = None) -> List[float]:
         """Получить эмбеддинг для текста"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.scibox_base_url}/embeddings",
-                    headers={
-                        "Authorization": f"Bearer {self.scibox_api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": "bge-m3",
-                        "input": text
-                    },
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                data = response.json()
-                return data["data"][0]["embedding"]
+            embeddings = await self._get_embeddings([text], model)
+            return embeddings[0]
         except Exception as e:
             print(f"Ошибка получения эмбеддинга: {e}")
             return []
     
-    async def _get_employee_embeddings(self, employees: List[Employee]) -> Dict[int, List[float]]:
-        """Получить эмбеддинги для всех сотрудников из кэша"""
+    async def _get_embeddings(self, texts: List[str], model: str = None) -> List[List[float]]:
+        """Получить эмбеддинги для пачки текстов одним запросом"""
+        return await get_embedding_provider(model).embed(texts)
+    
+    async def _get_query_embedding(self, text: str, model: str) -> List[float]:
+        """Эмбеддинг запроса с ограничением времени ожидания"""
+        try:
+            return await asyncio.wait_for(
+                self._get_embedding(text, model),
+                timeout=settings.search_embedding_timeout_seconds
+            )
+        except asyncio.TimeoutError:
+            print(f"Таймаут получения эмбеддинга запроса ({model})")
+            return []
+    
+    async def rank_semantic(
+        self,
+        parsed_query: Dict[str, Any],
+        candidate_ids: Optional[List[int]] = None
+    ) -> List[Dict[str, Any]]:
+        """Загрузка кандидатов, эмбеддинги и ранжирование.
+
+        remote - эмбеддинги активного поколения, а если SciBox недоступен -
+        локальная модель; local - только локальная модель; hybrid - первый
+        этап по локальной модели и пересчет шорт-листа по активному поколению.
+        """
+        mode = settings.embedding_provider
+        local = get_local_embedding_provider()
+        remote_model = await get_active_embedding_model(self.db)
+        first_model = local.model if local and mode in ("local", "hybrid") else remote_model
+        
+        # Параллельно получаем сотрудников и эмбеддинг запроса
+        with log_stage("candidates"):
+            employees, query_embedding = await asyncio.gather(
+                self._get_search_documents(candidate_ids),
+                self._get_query_embedding(parsed_query["query"], first_model)
+            )
+        
+        if not query_embedding and local and first_model != local.model:
+            # SciBox недоступен - ранжируем по локальной модели
+            first_model = local.model
+            query_embedding = await self._get_query_embedding(parsed_query["query"], first_model)
+        
+        if candidate_ids is None:
+            # Кандидаты, уже отобранные фильтром, первый этап не проходят
+            with log_stage("first_stage"):
+                employees = await self._first_stage_candidates(employees, first_model, query_embedding)
+        with log_stage("embeddings"):
+            employee_embeddings = await self._get_employee_embeddings(employees, first_model)
+            section_scores = await self._get_section_scores(employee_embeddings, first_model, query_embedding)
+        index = await self._get_metadata_index()
+        # Ранжирование большого числа кандидатов уходит в пул, не блокируя event loop
+        with log_stage("ranking"):
+            ranked = await self._rank_employees(
+                employees, employee_embeddings, query_embedding, parsed_query, section_scores, index
+            )
+        
+        if mode != "hybrid" or first_model == remote_model:
+            return ranked
+        
+        # Пересчет шорт-листа по эмбеддингам SciBox
+        shortlist_ids = {item["id"] for item in ranked[:settings.hybrid_shortlist_size]}
+        shortlist = [emp for emp in employees if emp.id in shortlist_ids]
+        remote_query_embedding = await self._get_query_embedding(parsed_query["query"], remote_model)
+        if not remote_query_embedding:
+            return ranked
+        
+        remote_embeddings = await self._get_employee_embeddings(shortlist, remote_model)
+        section_scores = await self._get_section_scores(remote_embeddings, remote_model, remote_query_embedding)
+        return await self._rank_employees(
+            shortlist, remote_embeddings, remote_query_embedding, parsed_query, section_scores, index
+        )
+    
+    async def _get_metadata_index(self) -> Optional[SearchIndex]:
+        """Индекс процесса с колонками метаданных (без него - значения из документов)"""
+        try:
+            return await get_search_index(self.db)
+        except Exception as e:
+            print(f"Ошибка загрузки индекса поиска: {e}")
+            return None
+    
+    async def _first_stage_candidates(
+        self,
+        employees: list,
+        model: str,
+        query_embedding: List[float]
+    ) -> list:
+        """Отбор кандидатов по векторам первого этапа.
+
+        С обученной проекцией сравниваются сокращенные векторы; на больших
+        объемах перебор идет по шардам в пуле процессов. Полные векторы
+        загружаются и сравниваются только для шорт-листа. Сотрудники без
+        вектора первого этапа (появились после сборки) не отсеиваются.
+        """
+        shortlist_size = settings.vector_projection_shortlist_size
+        if not query_embedding or len(employees) <= shortlist_size:
+            return employees
+        
+        projection = get_vector_projection(model) if settings.vector_projection_enabled else None
+        if projection is not None and projection.input_dimensions != len(query_embedding):
+            projection = None
+        if projection is None and settings.search_shard_count <= 0:
+            return employees
+        
+        first_stage = await get_first_stage_vectors(self.db, model, len(query_embedding), projection)
+        query = first_stage_query(projection, query_embedding)
+        sharded = get_sharded_index(first_stage)
+        if sharded is not None:
+            shortlist = await sharded.top_k(query, shortlist_size)
+        elif projection is not None:
+            shortlist = top_k_ids(first_stage, query, shortlist_size)
+        else:
+            # Без проекции и шардов отбор не дает выигрыша
+            return employees
+        
+        shortlist = set(shortlist.tolist())
+        known = first_stage["known"]
+        return [emp for emp in employees if emp.id in shortlist or emp.id not in known]
+    
+    async def _get_employee_embeddings(self, employees: list, model: str = None) -> Dict[int, np.ndarray]:
+        """Получить эмбеддинги сотрудников (float32): из документов поиска, иначе из кэша эмбеддингов"""
         embeddings = {}
         
         if not self.db or not hasattr(self, 'embedding_repo'):
             # Если нет доступа к БД, возвращаем пустые эмбеддинги
             for emp in employees:
-                embeddings[emp.id] = []
+                embeddings[emp.id] = _EMPTY_VECTOR
             return embeddings
         
-        # Получаем все эмбеддинги одним запросом
-        employee_ids = [emp.id for emp in employees]
-        all_embeddings = await self.embedding_repo.get_embeddings_by_employee_ids(employee_ids)
+        model = model or settings.embedding_model
         
-        # Создаем словарь для быстрого поиска
-        cached_embeddings = {emb.employee_id: emb.embedding for emb in all_embeddings}
+        # Эмбеддинги модели первого этапа уже лежат в документах
+        cached_embeddings = {
+            emp.id: decode_embedding(emp.embedding)
+            for emp in employees
+            if getattr(emp, "model", None) == model and emp.embedding
+        }
+        
+        # Остальные получаем одним запросом. Неудачные расчеты без вектора
+        # в поиске не повторяются: их пересчитывает воркер восстановления
+        failed_ids = set()
+        employee_ids = [emp.id for emp in employees if emp.id not in cached_embeddings]
+        if employee_ids:
+            all_embeddings = await self.embedding_repo.get_embeddings_by_employee_ids(employee_ids, model)
+            for emb in all_embeddings:
+                if emb.embedding:
+                    cached_embeddings[emb.employee_id] = np.asarray(emb.embedding, dtype=np.float32)
+                elif emb.status == EmployeeEmbedding.STATUS_FAILED:
+                    failed_ids.add(emb.employee_id)
         
-        # Обрабатываем каждого сотрудника
         for emp in employees:
-            if emp.id in cached_embeddings:
-                embeddings[emp.id] = cached_embeddings[emp.id]
-            else:
-                # Если эмбеддинга нет, создаем его
-                try:
-                    profile_text = self._build_employee_profile_text(emp)
-                    embedding = await self._get_embedding(profile_text)
-                    
-                    # Сохраняем в кэш
-                    await self.embedding_repo.create_or_update_embedding(
-                        emp.id, 
-                        embedding, 
-                        profile_text
-                    )
-                    embeddings[emp.id] = embedding
-                except Exception as e:
-                    print(f"Ошибка при создании эмбеддинга для сотрудника {emp.id}: {e}")
-                    embeddings[emp.id] = []
+            embeddings[emp.id] = cached_embeddings.get(emp.id, _EMPTY_VECTOR)
+        
+        # Если эмбеддинга еще не было, создаем его
+        missing_ids = [emp.id for emp in employees if emp.id not in cached_embeddings and emp.id not in failed_ids]
+        if missing_ids:
+            try:
+                await self._embed_missing_employees(missing_ids, model, embeddings)
+            except Exception as e:
+                print(f"Ошибка при создании эмбеддингов для сотрудников {missing_ids}: {e}")
         
         return embeddings
     
-    def _build_employee_profile_text(self, employee: Employee) -> str:
-        """Создать текстовое описание профиля сотрудника"""
-        skills_text = ", ".join([skill.name for skill in employee.skills])
-        
-        profile_parts = [
-            f"Должность: {employee.position or 'Не указана'}",
-            f"Отдел: {employee.department or 'Не указан'}",
-            f"Опыт: {employee.experience_years} лет",
-            f"Навыки: {skills_text}",
-        ]
+    async def _get_section_scores(
+        self,
+        employee_embeddings: Dict[int, np.ndarray],
+        model: str,
+        query_embedding: List[float]
+    ) -> Dict[int, float]:
+        """Оценка по лучшему из векторов секций (если они включены)"""
+        if not settings.section_embeddings_enabled or not self.db:
+            return {}
+        try:
+            return await SectionEmbeddingService(self.db).get_scores(
+                list(employee_embeddings), model, query_embedding, employee_embeddings
+            )
+        except Exception as e:
+            print(f"Ошибка оценки по векторам секций: {e}")
+            return {}
+    
+    async def _embed_missing_employees(
+        self,
+        employee_ids: List[int],
+        model: str,
+        embeddings: Dict[int, np.ndarray]
+    ) -> None:
+        """Посчитать и сохранить эмбеддинги сотрудников, у которых их еще нет"""
+        result = await self.db.execute(
+            select(Employee)
+            .options(
+                selectinload(Employee.skills),
+                selectinload(Employee.work_experiences)
+            )
+            .where(Employee.id.in_(employee_ids))
+        )
+        documents = [profile_document_builder.build(emp) for emp in result.scalars().all()]
         
-        # Добавляем информацию о себе
-        if employee.bio:
-            profile_parts.append(f"О себе: {employee.bio}")
-        
-        # Добавляем информацию о работе
-        if hasattr(employee, 'work_experiences') and employee.work_experiences:
-            work_parts = []
-            for work_exp in employee.work_experiences:
-                work_info = f"Компания: {work_exp.company_name}"
-                if work_exp.position:
-                    work_info += f", Позиция: {work_exp.position}"
-                if work_exp.description:
-                    work_info += f", Описание: {work_exp.description}"
-                work_parts.append(work_info)
-            if work_parts:
-                profile_parts.append(f"Опыт работы: {'; '.join(work_parts)}")
-        
-        return ". ".join(profile_parts)
+        batch_size = settings.embedding_batch_size
+        for start in range(0, len(documents), batch_size):
+            batch = documents[start:start + batch_size]
+            try:
+                vectors = await self._get_embeddings([document.text for document in batch], model)
+            except Exception as e:
+                # Запоминаем ошибку, чтобы следующие поиски не обращались к API за этими профилями
+                await self.embedding_repo.mark_failed(
+                    [(document.employee_id, document.text) for document in batch],
+                    model,
+                    str(e),
+                    settings.embedding_failure_retry_base_seconds,
+                    settings.embedding_failure_retry_max_seconds
+                )
+                raise
+            
+            failed = [document for document, vector in zip(batch, vectors) if not vector]
+            if failed:
+                await self.embedding_repo.mark_failed(
+                    [(document.employee_id, document.text) for document in failed],
+                    model,
+                    "API вернул пустой эмбеддинг",
+                    settings.embedding_failure_retry_base_seconds,
+                    settings.embedding_failure_retry_max_seconds
+                )
+            for document, vector in zip(batch, vectors):
+                if not vector:
+                    continue
+                # Сохраняем в кэш
+                await self.embedding_repo.create_or_update_embedding(
+                    document.employee_id,
+                    vector,
+                    document.text,
+                    document.content_hash(model),
+                    model
+                )
+                embeddings[document.employee_id] = np.asarray(vector, dtype=np.float32)
     
-    def _get_grade_score(self, employee: Employee, required_grade: str) -> float:
-        grade_to_id = {
-            'junior': 1,
-            'middle': 2,
-            'senior': 3,
-            'lead': 4
+    def _ranking_inputs(
+        self,
+        employees: list,
+        employee_embeddings: Dict[int, np.ndarray],
+        query_embedding: List[float],
+        parsed_query: Dict[str, Any],
+        section_scores: Dict[int, float],
+        index: Optional[SearchIndex]
+    ) -> RankingInputs:
+        """Собрать массивы для ранжирования в event loop.
+
+        Грейды, уровни и навыки берутся из колоночного хранилища и TF-IDF
+        матрицы индекса; сотрудники, которых в индексе еще нет, дополняются
+        значениями из документов поиска.
+        """
+        count = len(employees)
+        ids = np.fromiter((emp.id for emp in employees), dtype=np.int64, count=count)
+        query = np.asarray(query_embedding or [], dtype=np.float32)
+        dimensions = len(query)
+        
+        vector_positions, vectors, section_positions = [], [], []
+        for position, employee_id in enumerate(ids.tolist()):
+            vector = employee_embeddings.get(employee_id)
+            if dimensions and vector is not None and len(vector) == dimensions:
+                vector_positions.append(position)
+                vectors.append(vector)
+            if employee_id in section_scores:
+                section_positions.append(position)
+        
+        # Сходство навыков: косинус TF-IDF векторов - Отиаи с весами IDF.
+        # Связанные навыки входят в запрос с весом ребра графа
+        skill_terms = parsed_query['query'].split() + list(parsed_query.get('skills') or [])
+        direct_terms = {term.lower() for term in skill_terms}
+        skill_weights = {
+            skill["name"]: skill["weight"]
+            for skill in parsed_query.get('related_skills') or []
+            if skill["name"].lower() not in direct_terms
         }
-        years = employee.experience_years
-        grade = ''
-        if 0 <= years < 2:
-            grade = 'junior'
-        elif 2 <= years < 4:
-            grade = 'middle'
-        elif 4 <= years < 6:
-            grade = 'senior'
-        else:
-            grade = 'lead'
-        
-        grade_score = 0
-        if abs(grade_to_id[grade] - grade_to_id[required_grade]) == 0:
-            grade_score = 1.0
-        elif abs(grade_to_id[grade] - grade_to_id[required_grade]) == 1:
-            grade_score = 0.8
-        elif abs(grade_to_id[grade] - grade_to_id[required_grade]) == 2:
-            grade_score = 0.4
-        else:
-            grade_score = 0.1
         
-        return grade_score
-
-    def _get_ochiai_score(self, employee: Employee, key_words: List[str]) -> float:
-        match = 1
-        for skill in employee.skills:
-            if skill in key_words:
-                match += 1
-        ochiai_score = match / np.sqrt(len(employee.skills) * len(key_words))
-        return ochiai_score
-
-    def _rank_employees(
+        grade_codes = np.empty(count, dtype=np.int8)
+        levels = np.empty(count, dtype=np.int16)
+        skill_scores = np.zeros(count)
+        found = np.zeros(count, dtype=bool)
+        skill_matrix, skill_query = None, None
+        skill_rows = np.zeros(0, dtype=np.int64)
+        if index is not None:
+            rows, found = index.rows_for_ids(ids)
+            skill_rows = rows[found]
+            # Индексирование массивом копирует строки: патчи индекса их не затронут
+            columns = index.columns[skill_rows]
+            grade_codes[found] = columns["grade"]
+            levels[found] = columns["level"]
+            skill_matrix, skill_query = index.skill_matrix.frozen(skill_terms, skill_weights)
+        
+        missing = np.flatnonzero(~found).tolist()
+        for position in missing:
+            emp = employees[position]
+            grade_codes[position] = GRADE_CODES[emp.grade]
+            levels[position] = emp.level
+        if missing:
+            skill_lists = [list(employees[position].skills) for position in missing]
+            if index is not None:
+                skill_scores[missing] = index.skill_matrix.score_lists(skill_terms, skill_lists, skill_weights)
+            else:
+                # Без индекса IDF считается по самим кандидатам
+                skill_matrix, skill_query = SkillMatrix(skill_lists).frozen(skill_terms, skill_weights)
+                found[missing] = True
+                skill_rows = np.arange(len(missing))
+        
+        return RankingInputs(
+            vector_positions=np.array(vector_positions, dtype=np.int64),
+            vectors=tuple(vectors),
+            query=query,
+            section_positions=np.array(section_positions, dtype=np.int64),
+            section_scores=np.array([section_scores[employee_id] for employee_id in ids[section_positions].tolist()]),
+            grade_codes=grade_codes,
+            levels=levels,
+            skill_scores=skill_scores,
+            skill_positions=np.flatnonzero(found),
+            skill_rows=skill_rows,
+            skill_matrix=skill_matrix,
+            skill_query=skill_query
+        )
+    
+    async def _rank_employees(
         self, 
-        employees: List[Employee], 
-        employee_embeddings: Dict[int, List[float]], 
+        employees: list, 
+        employee_embeddings: Dict[int, np.ndarray], 
         query_embedding: List[float],
-        parsed_query: Dict[str, Any]
+        parsed_query: Dict[str, Any],
+        section_scores: Optional[Dict[int, float]] = None,
+        index: Optional[SearchIndex] = None
     ) -> List[Dict[str, Any]]:
-        """Ранжирование сотрудников по релевантности"""
-        scored_employees = []
+        """Ранжирование сотрудников по релевантности.
 
-        for emp in employees:
-            # score = 0.6 * cos_sim + 0.2 * grade_score + 0.15 * ochiai_score + 0.05 * level_bonus
-            score = 0.0
-            
-            # 1. Семантическое сходство (основная метрика, 60% веса)
-            if emp.id in employee_embeddings and employee_embeddings[emp.id]:
-                semantic_score = self._cosine_similarity(
-                    query_embedding, 
-                    employee_embeddings[emp.id]
-                )
-                score += semantic_score * 0.6
-            
-            # 2. Метрика по грейду (сходимость грейдов анкеты и вакансии, 20% веса)
-            grade_score = self._get_grade_score(emp, parsed_query['grade'].lower())
-            score += grade_score * 0.2
-
-            # 3. Метрика Отиаи по навыкам (альтернатива Жаккарду, 15% веса)
-            ochiai_score = self._get_ochiai_score(emp, parsed_query['query'].split())
-            score += ochiai_score * 0.15
-
-            # 4. Кол-во XP (бонус, 5% веса)
-            level_bonus = emp.level
-            score += level_bonus * 0.05
-            
-            scored_employees.append({
-                "employee": emp,
-                "score": score,
-                "semantic_score": semantic_score if emp.id in employee_embeddings else 0,
-                "grade_score": grade_score,
-                "ochiai_score": ochiai_score,
-                "level_bonus": level_bonus
-            })
+        score = 0.6 * cos_sim + 0.2 * grade_score + 0.15 * ochiai_score + 0.05 * level_bonus,
+        все слагаемые считаются над массивами. section_scores - семантическая
+        оценка по векторам секций; для этих сотрудников она заменяет сходство
+        с общим вектором профиля. Большие наборы считаются в пуле потоков.
+        """
+        if not employees:
+            return []
+        inputs = self._ranking_inputs(
+            employees, employee_embeddings, query_embedding, parsed_query, section_scores or {}, index
+        )
+        scores = await run_cpu(len(employees), score_candidates, inputs, parsed_query['grade'].lower())
         
-        # Сортируем по убыванию релевантности
-        scored_employees.sort(key=lambda x: x["score"], reverse=True)
+        # Сортируем по убыванию релевантности (при равенстве - в исходном порядке)
+        relevance, semantic, grade, ochiai, level = (
+            np.round(scores[name], 3).tolist()
+            for name in ("relevance", "semantic", "grade", "ochiai", "level")
+        )
         
-        # Формируем результат
-        result = []
-        for item in scored_employees:
-            emp = item["employee"]
-            result.append({
-                "id": emp.id,
-                "full_name": emp.full_name,
-                "position": emp.position,
-                "department": emp.department,
-                "experience_years": emp.experience_years,
-                "skills": [skill.name for skill in emp.skills],
-                "level": emp.level,
-                "xp_points": emp.xp_points,
+        # Формируем результат: только ID и оценки, поля выдачи загружаются позже
+        return [
+            {
+                "id": employees[position].id,
                 "parsed_skills": parsed_query['skills'],
-                "relevance_score": round(item["score"], 3),
-                "semantic_score": round(item["semantic_score"], 3),
-                "grade_score": round(item["grade_score"], 3),
-                "ochiai_score": round(item["ochiai_score"], 3),
-                "level_bonus": round(item["level_bonus"], 3)
-            })
-        
-        return result
+                "relevance_score": relevance[position],
+                "semantic_score": semantic[position],
+                "grade_score": grade[position],
+                "ochiai_score": ochiai[position],
+                "level_bonus": level[position]
+            }
+            for position in scores["order"].tolist()
+        ]
     
     def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
         """Вычисление косинусного сходства"""
@@ -386,55 +698,38 @@ class SmartSearchService:
             print(f"Ошибка вызова LLM: {e}")
             return ""
     
-    async def _fallback_search(self, query: str) -> List[Dict[str, Any]]:
+    async def _fallback_search(
+        self,
+        query: str,
+        limit: int = 20,
+        candidate_ids: Optional[List[int]] = None
+    ) -> List[Dict[str, Any]]:
         """Простой поиск как fallback с фильтрацией по обязательным полям"""
         try:
             # Простой поиск по навыкам с фильтрацией
             repo = EmployeeRepository(self.db)
             
-            # Извлекаем ключевые слова из запроса
+            # Извлекаем ключевые слова из запроса (с исправленными опечатками)
+            query = await correct_query(self.db, query)
             skill_names = [skill.strip() for skill in query.replace(',', ' ').split() if skill.strip()]
             
             # Получаем сотрудников с обязательными полями и навыками
-            result = await self.db.execute(
-                select(Employee)
-                .options(selectinload(Employee.skills))
-                .where(
-                    Employee.first_name.isnot(None),
-                    Employee.last_name.isnot(None),
-                    Employee.position.isnot(None),
-                    Employee.bio.isnot(None),
-                    Employee.first_name != '',
-                    Employee.last_name != '',
-                    Employee.position != '',
-                    Employee.bio != '',
-                    # Проверяем, что у сотрудника есть хотя бы один навык
-                    Employee.skills.any()
-                )
-            )
-            employees = result.scalars().all()
+            employees = await self._get_search_documents(candidate_ids)
             
             # Фильтруем по навыкам, если они указаны
             if skill_names:
                 filtered_employees = []
                 for emp in employees:
-                    emp_skills = [skill.name.lower() for skill in emp.skills]
+                    emp_skills = [skill.lower() for skill in emp.skills]
                     if any(skill.lower() in emp_skills for skill in skill_names):
                         filtered_employees.append(emp)
                 employees = filtered_employees
             
-            # Формируем результат
+            # Формируем результат (ограничиваем до загрузки полей выдачи)
             result = []
-            for emp in employees:
+            for emp in employees[:limit]:
                 result.append({
                     "id": emp.id,
-                    "full_name": emp.full_name,
-                    "position": emp.position,
-                    "department": emp.department,
-                    "experience_years": emp.experience_years,
-                    "skills": [skill.name for skill in emp.skills],
-                    "level": emp.level,
-                    "xp_points": emp.xp_points,
                     "relevance_score": 1.0,
                     "semantic_score": 0.0,
                     "skills_match": 1.0,
@@ -442,7 +737,7 @@ class SmartSearchService:
                     "experience_match": 1.0
                 })
             
-            return result[:20]  # Ограничиваем количество результатов
+            return await self.hydrate_results(result)
             
         except Exception as e:
             print(f"Ошибка в fallback поиске: {e}")
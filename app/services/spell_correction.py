@@ -0,0 +1,167 @@
+"""
+Исправление опечаток в запросах по справочнику навыков и должностей
+
+Индекс симметричного удаления (SymSpell): для каждого слова словаря заранее
+сохраняются все варианты с удалением до max_distance символов из префикса,
+при поиске то же делается для токена запроса, а кандидаты из пересечения
+проверяются расстоянием Дамерау-Левенштейна. Поиск - несколько десятков
+обращений к словарю, без перебора словаря.
+"""
+import time
+from itertools import combinations
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.employee import Employee
+from app.models.skill import Skill
+from app.services.query_parser import (
+    _TOKEN_RE,
+    _morph,
+    FILLER_WORDS,
+    GRADE_KEYWORDS,
+    SKILL_ALIASES,
+    STOPWORDS
+)
+
+
+def edit_distance(source: str, target: str, limit: int) -> int:
+    """Расстояние Дамерау-Левенштейна (с перестановкой соседних символов); limit + 1, если больше limit"""
+    if abs(len(source) - len(target)) > limit:
+        return limit + 1
+    previous_previous = None
+    previous = list(range(len(target) + 1))
+    for i in range(1, len(source) + 1):
+        current = [i] + [0] * len(target)
+        for j in range(1, len(target) + 1):
+            cost = 0 if source[i - 1] == target[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (
+                previous_previous is not None and i > 1 and j > 1
+                and source[i - 1] == target[j - 2] and source[i - 2] == target[j - 1]
+            ):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous_previous, previous = previous, current
+    return previous[-1] if previous[-1] <= limit else limit + 1
+
+
+def _deletes(word: str, max_distance: int) -> Set[str]:
+    """Все варианты слова с удалением от 0 до max_distance символов"""
+    variants = {word}
+    for distance in range(1, min(max_distance, len(word)) + 1):
+        for positions in combinations(range(len(word)), distance):
+            variants.add("".join(char for index, char in enumerate(word) if index not in positions))
+    return variants
+
+
+class SymSpellIndex:
+    """Словарь слов с частотами и индекс их удалений"""
+
+    def __init__(self, words: Iterable[str], max_distance: int, prefix_length: int, known: Iterable[str] = ()):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.frequency: Dict[str, int] = {}
+        for word in words:
+            self.frequency[word] = self.frequency.get(word, 0) + 1
+        # Слова, которые не исправляются (стоп-слова, грейды)
+        self.known = set(known)
+
+        self.deletes: Dict[str, List[str]] = {}
+        for word in self.frequency:
+            for variant in _deletes(word[:prefix_length], max_distance):
+                self.deletes.setdefault(variant, []).append(word)
+
+    def allowed_distance(self, token: str) -> int:
+        """Допустимое число правок: короткие слова и токены с цифрами не исправляются"""
+        if len(token) <= 3 or any(char.isdigit() for char in token):
+            return 0
+        if len(token) <= 5:
+            return min(1, self.max_distance)
+        return self.max_distance
+
+    def lookup(self, token: str) -> Optional[str]:
+        """Ближайшее слово словаря (при равенстве - самое частое); None - исправлять не нужно или нечем"""
+        if token in self.frequency or token in self.known:
+            return None
+        limit = self.allowed_distance(token)
+        if limit == 0:
+            return None
+
+        candidates = set()
+        for variant in _deletes(token[:self.prefix_length], limit):
+            candidates.update(self.deletes.get(variant, ()))
+        
+        best, best_key = None, None
+        for word in candidates:
+            distance = edit_distance(token, word, limit)
+            if distance > limit:
+                continue
+            key = (distance, -self.frequency[word], word)
+            if best_key is None or key < best_key:
+                best, best_key = word, key
+        return best
+
+    def correct(self, text: str) -> str:
+        """Заменить токены с опечатками на слова словаря (остальной текст не меняется)"""
+        def replace(match):
+            token = match.group(0).lower().rstrip(".")
+            if _is_russian_word(token):
+                return match.group(0)
+            corrected = self.lookup(token)
+            return match.group(0) if corrected is None else corrected
+
+        return _TOKEN_RE.sub(replace, text)
+
+
+def _is_russian_word(token: str) -> bool:
+    """Слово русского языка, известное морфологическому словарю, - не опечатка"""
+    return bool(token) and "а" <= token[0] <= "я" and _morph.word_is_known(token)
+
+
+def _vocabulary_words(phrases: Iterable[str]) -> List[str]:
+    return [
+        match.group(0).rstrip(".")
+        for phrase in phrases if phrase
+        for match in _TOKEN_RE.finditer(phrase.lower())
+    ]
+
+
+_corrector_cache = {"expires_at": 0.0, "signature": None, "index": None}
+
+
+async def get_spell_corrector(db: AsyncSession) -> SymSpellIndex:
+    """Индекс по текущим навыкам и должностям (пересобирается раз в skill_catalog_ttl_seconds
+    и только если справочник изменился)"""
+    if _corrector_cache["index"] is not None and time.monotonic() < _corrector_cache["expires_at"]:
+        return _corrector_cache["index"]
+
+    skill_names = (await db.execute(select(Skill.name))).scalars().all()
+    positions = (await db.execute(select(Employee.position).distinct())).scalars().all()
+    words = _vocabulary_words(skill_names) + _vocabulary_words(positions) + _vocabulary_words(SKILL_ALIASES)
+    signature = hash((tuple(sorted(words)), settings.spell_correction_max_distance, settings.spell_correction_prefix_length))
+    if signature != _corrector_cache["signature"]:
+        known = STOPWORDS | FILLER_WORDS | set().union(*GRADE_KEYWORDS.values())
+        _corrector_cache["index"] = SymSpellIndex(
+            words + sorted(known - STOPWORDS),
+            settings.spell_correction_max_distance,
+            settings.spell_correction_prefix_length,
+            known
+        )
+        _corrector_cache["signature"] = signature
+    _corrector_cache["expires_at"] = time.monotonic() + settings.skill_catalog_ttl_seconds
+    return _corrector_cache["index"]
+
+
+async def correct_query(db: AsyncSession, text: str) -> str:
+    """Запрос с исправленными опечатками (при ошибке или выключенной коррекции - как есть)"""
+    if not settings.spell_correction_enabled or not db or not text:
+        return text
+    try:
+        return (await get_spell_corrector(db)).correct(text)
+    except Exception as e:
+        print(f"Ошибка исправления опечаток в запросе: {e}")
+        return text
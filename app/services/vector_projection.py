@@ -0,0 +1,334 @@
+"""
+Проекция эмбеддингов в пространство меньшей размерности для первого этапа поиска
+
+Первый этап сравнивает запрос с сокращенными (128-256) векторами всех
+сотрудников, второй пересчитывает шорт-лист по полным векторам.
+
+Обучение проекции на сохраненных эмбеддингах активной модели и замер
+пропускной способности и recall@20 в зависимости от размерности:
+    python -m app.services.vector_projection fit --dimensions 256
+    python -m app.services.vector_projection benchmark --dimensions 64 128 256 512
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.repositories.employee_embedding import EmployeeEmbeddingRepository
+from app.services.index_snapshot import get_index_snapshot, replay_embedding_changes
+
+METHOD_PCA = "pca"
+METHOD_SVD = "svd"
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class VectorProjection:
+    """Линейная проекция (PCA или TruncatedSVD) векторов одной модели эмбеддингов.
+
+    version однозначно определяет обученную проекцию: сокращенные векторы,
+    посчитанные другой версией, не используются.
+    """
+    
+    def __init__(self, model: str, version: str, mean: np.ndarray, components: np.ndarray):
+        self.model = model
+        self.version = version
+        self.mean = np.ascontiguousarray(mean, dtype=np.float32)
+        self.components = np.ascontiguousarray(components, dtype=np.float32)
+    
+    @property
+    def input_dimensions(self) -> int:
+        return self.components.shape[0]
+    
+    @property
+    def dimensions(self) -> int:
+        return self.components.shape[1]
+    
+    @classmethod
+    def fit(cls, model: str, vectors: np.ndarray, dimensions: int, method: str = METHOD_PCA) -> "VectorProjection":
+        """Обучить проекцию на полных векторах сотрудников"""
+        from sklearn.decomposition import PCA, TruncatedSVD
+        
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.shape[0] < 2:
+            raise ValueError("Для обучения проекции нужно хотя бы два вектора")
+        
+        components = max(1, min(dimensions, vectors.shape[0] - 1, vectors.shape[1] - 1))
+        if method == METHOD_PCA:
+            reducer = PCA(n_components=components, svd_solver="randomized", random_state=42).fit(vectors)
+            mean = reducer.mean_
+        elif method == METHOD_SVD:
+            reducer = TruncatedSVD(n_components=components, random_state=42).fit(vectors)
+            mean = np.zeros(vectors.shape[1], dtype=np.float32)
+        else:
+            raise ValueError(f"Неизвестный метод проекции: {method}")
+        
+        digest = hashlib.sha256(vectors.tobytes())
+        digest.update(f"{method}{components}".encode("utf-8"))
+        version = f"{method}{components}-{digest.hexdigest()[:8]}"
+        return cls(model, version, mean, reducer.components_.T)
+    
+    def transform(self, vectors: np.ndarray) -> np.ndarray:
+        """Сократить векторы (float32, нормированы по L2 для косинусного сходства)"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return _normalize((vectors - self.mean) @ self.components)
+    
+    def save(self, path: str) -> None:
+        """Сохранить проекцию на диск"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        joblib.dump(
+            {"model": self.model, "version": self.version, "mean": self.mean, "components": self.components},
+            tmp_path
+        )
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path: str) -> "VectorProjection":
+        """Загрузить проекцию с диска"""
+        artifact = joblib.load(path)
+        return cls(artifact["model"], artifact["version"], artifact["mean"], artifact["components"])
+
+
+def projection_path(model: str) -> str:
+    """Файл проекции для модели эмбеддингов"""
+    return os.path.join(settings.vector_projection_dir, f"{re.sub(r'[^A-Za-z0-9_.-]', '_', model)}.joblib")
+
+
+_projection_cache: Dict[str, Tuple[float, VectorProjection]] = {}
+
+# Векторы первого этапа по модели (сокращенные или полные нормированные);
+# пересобираются по TTL и при смене версии проекции.
+# Сотрудники, появившиеся после сборки, проходят во второй этап без отбора.
+_first_stage_cache: Dict[str, dict] = {}
+
+# Версия векторов первого этапа без проекции
+FULL_VERSION = "full"
+
+
+def get_vector_projection(model: str) -> Optional[VectorProjection]:
+    """Проекция для модели, если она обучена; перечитывается при обновлении файла"""
+    path = projection_path(model)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    
+    cached = _projection_cache.get(model)
+    if cached is None or cached[0] != mtime:
+        try:
+            projection = VectorProjection.load(path)
+        except Exception as e:
+            print(f"Ошибка загрузки проекции эмбеддингов {model}: {e}")
+            return None
+        _projection_cache[model] = (mtime, projection)
+    return _projection_cache[model][1]
+
+
+def first_stage_query(projection: Optional[VectorProjection], query_embedding: List[float]) -> np.ndarray:
+    """Вектор запроса в пространстве первого этапа"""
+    query = np.asarray([query_embedding], dtype=np.float32)
+    return (projection.transform(query) if projection else _normalize(query))[0]
+
+
+async def get_first_stage_vectors(
+    db: AsyncSession,
+    model: str,
+    dimensions: int,
+    projection: Optional[VectorProjection] = None
+) -> dict:
+    """Векторы участвующих в поиске сотрудников для первого этапа.
+
+    С проекцией - сокращенные, без неё - полные нормированные векторы.
+    Если есть подходящий снимок индекса, векторы берутся из него (mmap);
+    эмбеддинги, изменившиеся после снятия снимка, помечаются в нем
+    устаревшими. Возвращает {"version", "ids", "vectors", "known", ...}.
+    """
+    version = projection.version if projection else FULL_VERSION
+    snapshot = get_index_snapshot()
+    if (
+        snapshot is not None
+        and snapshot.model == model
+        and snapshot.vector_version == version
+        and snapshot.dimensions == (projection.dimensions if projection else dimensions)
+        and await replay_embedding_changes(db, snapshot)
+    ):
+        return snapshot.first_stage
+    
+    cached = _first_stage_cache.get(model)
+    if cached is None or cached["version"] != version or time.monotonic() >= cached["expires_at"]:
+        rows = await EmployeeEmbeddingRepository(db).get_eligible_vectors(model)
+        rows = [(employee_id, vector) for employee_id, vector in rows if len(vector) == dimensions]
+        ids = np.array([employee_id for employee_id, _ in rows], dtype=np.int64)
+        if not rows:
+            vectors = np.empty((0, projection.dimensions if projection else dimensions), dtype=np.float32)
+        elif projection:
+            vectors = projection.transform(np.asarray([vector for _, vector in rows]))
+        else:
+            vectors = _normalize(np.asarray([vector for _, vector in rows], dtype=np.float32))
+        cached = {
+            "model": model,
+            "version": version,
+            "ids": ids,
+            "vectors": vectors,
+            "known": set(ids.tolist()),
+            "expires_at": time.monotonic() + settings.vector_projection_cache_ttl_seconds
+        }
+        _first_stage_cache[model] = cached
+    return cached
+
+
+def mark_first_stage_stale(employee_ids: List[int]) -> None:
+    """Изменившиеся эмбеддинги: такие сотрудники проходят во второй этап без отбора
+    до пересборки векторов или следующего снимка индекса"""
+    if not employee_ids:
+        return
+    for cached in _first_stage_cache.values():
+        cached["known"].difference_update(employee_ids)
+    snapshot = get_index_snapshot()
+    if snapshot is not None:
+        snapshot.mark_stale(employee_ids)
+
+
+def top_k_ids(first_stage: dict, query: np.ndarray, k: int) -> np.ndarray:
+    """Top-k ID сотрудников по векторам первого этапа в текущем процессе"""
+    if "snapshot" in first_stage:
+        return first_stage["snapshot"].top_k(query, k)
+    return first_stage["ids"][_top_k(first_stage["vectors"] @ query, k)]
+
+
+def benchmark(
+    model: str,
+    vectors: np.ndarray,
+    dimensions: List[int],
+    queries: int = 200,
+    k: int = 20,
+    shortlist_size: int = 200,
+    method: str = METHOD_PCA
+) -> List[dict]:
+    """Сравнить полный перебор с двухэтапным поиском для разных размерностей.
+
+    Запросами служат случайные векторы сотрудников, эталон - точный top-k
+    по полным векторам. recall_first_stage - доля эталона в top-k по сокращенным
+    векторам, recall - после пересчета шорт-листа по полным векторам.
+    """
+    full = _normalize(np.asarray(vectors, dtype=np.float32))
+    rng = np.random.default_rng(42)
+    query_rows = rng.choice(len(full), size=min(queries, len(full)), replace=False)
+    query_vectors = full[query_rows]
+    k = min(k, len(full))
+    shortlist_size = min(max(shortlist_size, k), len(full))
+    
+    # Замеряем по одному запросу, как в поиске, включая отбор top-k
+    started = time.perf_counter()
+    truth = np.array([_top_k(full @ query, k) for query in query_vectors])
+    full_elapsed = time.perf_counter() - started
+    
+    report = [{
+        "dimensions": full.shape[1],
+        "queries_per_second": round(len(query_vectors) / max(full_elapsed, 1e-9), 1),
+        "recall_first_stage": 1.0,
+        "recall": 1.0
+    }]
+    
+    for target in dimensions:
+        projection = VectorProjection.fit(model, full, target, method)
+        reduced = projection.transform(full)
+        reduced_queries = projection.transform(query_vectors)
+        
+        started = time.perf_counter()
+        top = []
+        for query, reduced_query in zip(query_vectors, reduced_queries):
+            shortlist = _top_k(reduced @ reduced_query, shortlist_size)
+            top.append(shortlist[_top_k(full[shortlist] @ query, k)])
+        elapsed = time.perf_counter() - started
+        
+        first_stage = np.argpartition(-(reduced_queries @ reduced.T), k - 1, axis=1)[:, :k]
+        report.append({
+            "dimensions": projection.dimensions,
+            "queries_per_second": round(len(query_vectors) / max(elapsed, 1e-9), 1),
+            "recall_first_stage": round(_recall(truth, first_stage), 4),
+            "recall": round(_recall(truth, np.array(top)), 4)
+        })
+    return report
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    if k >= len(scores):
+        return np.arange(len(scores))
+    return np.argpartition(-scores, k - 1)[:k]
+
+
+def _recall(truth: np.ndarray, found: np.ndarray) -> float:
+    hits = sum(len(set(t.tolist()) & set(f.tolist())) for t, f in zip(truth, found))
+    return hits / truth.size
+
+
+async def _load_vectors(model: Optional[str]) -> Tuple[str, np.ndarray]:
+    from app.core.database import AsyncSessionLocal
+    from app.services.embedding_models import get_active_embedding_model
+    
+    async with AsyncSessionLocal() as db:
+        model = model or await get_active_embedding_model(db)
+        rows = await EmployeeEmbeddingRepository(db).get_eligible_vectors(model)
+    
+    vectors = [vector for _, vector in rows if vector]
+    dimensions = max((len(vector) for vector in vectors), default=0)
+    return model, np.asarray([vector for vector in vectors if len(vector) == dimensions], dtype=np.float32)
+
+
+async def _fit(model: Optional[str], dimensions: int, method: str) -> None:
+    model, vectors = await _load_vectors(model)
+    started = time.monotonic()
+    projection = VectorProjection.fit(model, vectors, dimensions, method)
+    projection.save(projection_path(model))
+    print(
+        f"Проекция {projection.version} для {model}: {projection.input_dimensions} -> {projection.dimensions}, "
+        f"{len(vectors)} векторов, {time.monotonic() - started:.1f} с"
+    )
+
+
+async def _benchmark(model: Optional[str], dimensions: List[int], queries: int, shortlist_size: int, method: str) -> None:
+    model, vectors = await _load_vectors(model)
+    print(f"Модель {model}: {len(vectors)} векторов, {queries} запросов, шорт-лист {shortlist_size}")
+    print(f"{'dims':>6} {'qps':>12} {'recall@20 (1 этап)':>20} {'recall@20':>10}")
+    for row in benchmark(model, vectors, dimensions, queries, 20, shortlist_size, method):
+        print(
+            f"{row['dimensions']:>6} {row['queries_per_second']:>12} "
+            f"{row['recall_first_stage']:>20} {row['recall']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Проекция эмбеддингов для первого этапа поиска")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    fit_parser = subparsers.add_parser("fit")
+    fit_parser.add_argument("--model", default=None)
+    fit_parser.add_argument("--dimensions", type=int, default=settings.vector_projection_dimensions)
+    fit_parser.add_argument("--method", choices=[METHOD_PCA, METHOD_SVD], default=METHOD_PCA)
+    
+    benchmark_parser = subparsers.add_parser("benchmark")
+    benchmark_parser.add_argument("--model", default=None)
+    benchmark_parser.add_argument("--dimensions", type=int, nargs="+", default=[64, 128, 256, 512])
+    benchmark_parser.add_argument("--queries", type=int, default=200)
+    benchmark_parser.add_argument("--shortlist", type=int, default=settings.vector_projection_shortlist_size)
+    benchmark_parser.add_argument("--method", choices=[METHOD_PCA, METHOD_SVD], default=METHOD_PCA)
+    
+    args = parser.parse_args()
+    if args.command == "fit":
+        asyncio.run(_fit(args.model, args.dimensions, args.method))
+    else:
+        asyncio.run(_benchmark(args.model, args.dimensions, args.queries, args.shortlist, args.method))
@@ -0,0 +1,16 @@
+"""
+Хеширование содержимого для кэширования эмбеддингов
+"""
+import hashlib
+
+
+def compute_content_hash(model: str, text: str) -> str:
+    """Хеш пары (модель эмбеддингов, текст профиля).
+
+    Если хеш совпадает с сохраненным, эмбеддинг пересчитывать не нужно.
+    """
+    digest = hashlib.sha256()
+    digest.update(model.encode("utf-8"))
+    digest.update(b"\x00")
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
@@ -29,6 +29,20 @@ class AIServiceError(HRConsultantException):
     pass
 
 
+class SearchOverloadedError(HRConsultantException):
+    """Очередь ранжирования переполнена"""
+    pass
+
+
+def search_overloaded_exception(message: str = "Поиск перегружен, повторите запрос позже"):
+    """Исключение для переполненного пула ранжирования"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=message,
+        headers={"Retry-After": "1"}
+    )
+
+
 def employee_not_found_exception():
     """Исключение для случая, когда сотрудник не найден"""
     return HTTPException(
@@ -0,0 +1,138 @@
+"""
+Согласованность битовых карт фасетов, колонок и матрицы навыков индекса поиска
+"""
+import random
+
+import numpy as np
+
+from app.services.search_index import (
+    FACET_DEPARTMENT,
+    FACET_GRADE,
+    FACET_LEVEL,
+    FACET_SKILL,
+    NO_DEPARTMENT,
+    SearchIndex,
+    grade_for_experience
+)
+
+SKILLS = ["Python", "python", "Go", "SQL", "Kafka", "Rust", "Docker"]
+DEPARTMENTS = [None, "", "Backend", "Data", "QA"]
+
+
+def _random_profile(rng: random.Random) -> tuple:
+    return (
+        rng.choice(DEPARTMENTS),
+        rng.choice([None, 0, 1, 3, 5, 9]),
+        rng.choice([None, 1, 2, 3]),
+        rng.sample(SKILLS, rng.randint(0, 4)),
+        rng.random() < 0.8
+    )
+
+
+def _assert_consistent(index: SearchIndex, expected: dict) -> None:
+    """Сверить индекс с эталоном {employee_id: профиль}"""
+    assert set(index.ids_for_bitmap(index.all_rows)) == set(expected)
+    assert len(index) == len(expected)
+
+    facets = {FACET_DEPARTMENT: {}, FACET_GRADE: {}, FACET_LEVEL: {}, FACET_SKILL: {}}
+    for employee_id, (department, years, level, skills, _) in expected.items():
+        values = [
+            (FACET_DEPARTMENT, department or NO_DEPARTMENT),
+            (FACET_GRADE, grade_for_experience(years)),
+            (FACET_LEVEL, str(level or 1)),
+        ] + [(FACET_SKILL, skill) for skill in skills]
+        for facet, value in values:
+            facets[facet].setdefault(value, set()).add(employee_id)
+    for facet, values in facets.items():
+        assert {value: set(index.ids_for_bitmap(bitmap)) for value, bitmap in index.facets[facet].items()} == values
+
+    # Колонки: present совпадает с all_rows, значения - с эталоном
+    columns = index.columns[:len(index.employee_ids)]
+    present_rows = set(np.flatnonzero(columns["present"]).tolist())
+    assert present_rows == {index.row_of[employee_id] for employee_id in expected}
+    for employee_id, (department, years, level, skills, is_active) in expected.items():
+        row = index.columns[index.row_of[employee_id]]
+        assert row["employee_id"] == employee_id
+        assert row["experience_years"] == (years if years is not None else -1)
+        assert row["level"] == (level or 1)
+        assert row["is_active"] == is_active
+        code = row["department"]
+        assert (index.departments[code] if code >= 0 else None) == (department or None)
+
+    # Матрица навыков: df по строкам присутствующих сотрудников (без учета регистра)
+    document_frequency = {}
+    for _, _, _, skills, _ in expected.values():
+        for key in {skill.lower() for skill in skills}:
+            document_frequency[key] = document_frequency.get(key, 0) + 1
+    matrix = index.skill_matrix
+    assert {
+        key: int(matrix.document_frequency[column])
+        for key, column in matrix.vocabulary.items()
+        if matrix.document_frequency[column]
+    } == document_frequency
+
+
+def test_build_matches_profiles():
+    rng = random.Random(1)
+    profiles = {employee_id: _random_profile(rng) for employee_id in range(100, 160)}
+    index = SearchIndex(
+        employee_ids=list(profiles),
+        departments=[profile[0] for profile in profiles.values()],
+        experience_years=[profile[1] for profile in profiles.values()],
+        levels=[profile[2] for profile in profiles.values()],
+        skills=[profile[3] for profile in profiles.values()],
+        is_active=[profile[4] for profile in profiles.values()]
+    )
+    _assert_consistent(index, profiles)
+
+
+def test_upsert_and_remove_keep_bitmaps_and_columns_consistent():
+    rng = random.Random(7)
+    profiles = {employee_id: _random_profile(rng) for employee_id in range(20)}
+    index = SearchIndex(
+        employee_ids=list(profiles),
+        departments=[profile[0] for profile in profiles.values()],
+        experience_years=[profile[1] for profile in profiles.values()],
+        levels=[profile[2] for profile in profiles.values()],
+        skills=[profile[3] for profile in profiles.values()],
+        is_active=[profile[4] for profile in profiles.values()]
+    )
+
+    # Новые ID растят колоночное хранилище за пределы начальной емкости
+    for _ in range(300):
+        employee_id = rng.randrange(40)
+        if rng.random() < 0.3:
+            index.remove(employee_id)
+            profiles.pop(employee_id, None)
+        else:
+            profile = _random_profile(rng)
+            index.upsert(employee_id, *profile)
+            profiles[employee_id] = profile
+        _assert_consistent(index, profiles)
+
+
+def test_removed_row_is_reused():
+    index = SearchIndex([1, 2], ["A", None], [1, 7], [1, 2], [["Go"], ["Rust"]])
+    row = index.row_of[2]
+    index.remove(2)
+    index.remove(2)
+    index.upsert(2, "B", 3, 1, ["Go"])
+    assert index.row_of[2] == row
+    assert index.ids_for_bitmap(index.facets[FACET_SKILL]["Go"]) == [1, 2]
+    assert "Rust" not in index.facets[FACET_SKILL]
+
+
+def test_rows_for_ids_marks_missing_and_removed():
+    index = SearchIndex([5, 3, 9], [None] * 3, [1, 2, 3], [1, 1, 1], [[], [], []])
+    index.remove(9)
+    rows, found = index.rows_for_ids(np.array([3, 9, 4, 5]))
+    assert found.tolist() == [True, False, False, True]
+    assert index.columns["employee_id"][rows[found]].tolist() == [3, 5]
+
+
+def test_empty_index():
+    index = SearchIndex([], [], [], [], [])
+    assert len(index) == 0
+    assert index.facets[FACET_SKILL] == {}
+    index.upsert(1, None, None, None, ["Go"])
+    assert index.ids_for_bitmap(index.filter_bitmap({FACET_SKILL: ["Go"]})) == [1]
@@ -0,0 +1,79 @@
+"""
+Свертка сходств секций профиля в оценку сотрудника
+"""
+import numpy as np
+import pytest
+
+from app.services.section_embeddings import SCORE_MAX, SCORE_SOFTMAX, _score_rows, segment_scores
+
+
+def _cosines(vectors: np.ndarray, query: np.ndarray) -> np.ndarray:
+    return np.array([
+        float(vector @ query) / (np.linalg.norm(vector) * np.linalg.norm(query)) if np.linalg.norm(vector) else 0.0
+        for vector in vectors
+    ])
+
+
+@pytest.fixture
+def rows():
+    rng = np.random.default_rng(3)
+    employee_ids = np.array([1, 1, 1, 4, 7, 7])
+    vectors = rng.normal(size=(len(employee_ids), 8))
+    vectors[4] = 0.0
+    query = rng.normal(size=8)
+    return employee_ids, vectors, query
+
+
+def test_max_takes_best_section(rows):
+    employee_ids, vectors, query = rows
+    sims = _cosines(vectors, query)
+    scores = segment_scores(employee_ids, vectors, query, SCORE_MAX)
+    assert list(scores) == [1, 4, 7]
+    assert scores[1] == pytest.approx(sims[:3].max())
+    assert scores[4] == pytest.approx(sims[3])
+    # Нулевой вектор секции дает сходство 0, а не NaN
+    assert scores[7] == pytest.approx(max(0.0, sims[5]))
+
+
+def test_softmax_is_log_mean_exp(rows):
+    employee_ids, vectors, query = rows
+    sims = _cosines(vectors, query)
+    temperature = 0.1
+    scores = segment_scores(employee_ids, vectors, query, SCORE_SOFTMAX, temperature)
+    for employee_id, segment in ((1, sims[:3]), (4, sims[3:4]), (7, sims[4:])):
+        expected = temperature * np.log(np.mean(np.exp(segment / temperature)))
+        assert scores[employee_id] == pytest.approx(expected)
+
+
+def test_softmax_bounds_and_limit(rows):
+    employee_ids, vectors, query = rows
+    best = segment_scores(employee_ids, vectors, query, SCORE_MAX)
+    soft = segment_scores(employee_ids, vectors, query, SCORE_SOFTMAX, 0.05)
+    cold = segment_scores(employee_ids, vectors, query, SCORE_SOFTMAX, 1e-4)
+    for employee_id in best:
+        assert soft[employee_id] <= best[employee_id] + 1e-9
+        # При низкой температуре - лучшая секция, даже если она далеко от общего максимума
+        assert cold[employee_id] == pytest.approx(best[employee_id], abs=1e-2)
+    # Одна секция - оценка совпадает с ее сходством
+    assert soft[4] == pytest.approx(best[4])
+
+
+def test_softmax_does_not_overflow():
+    vectors = np.array([[1.0, 0.0], [0.9, 0.1]])
+    scores = segment_scores(np.array([2, 2]), vectors, np.array([1.0, 0.0]), SCORE_SOFTMAX, 1e-6)
+    assert np.isfinite(scores[2])
+    assert scores[2] == pytest.approx(1.0, abs=1e-3)
+
+
+def test_zero_query_and_empty_input(rows):
+    employee_ids, vectors, query = rows
+    assert segment_scores(employee_ids, vectors, np.zeros_like(query)) == {}
+    assert segment_scores(np.array([], dtype=np.int64), np.empty((0, 8)), query) == {}
+
+
+def test_score_rows_sorts_unordered_ids(rows):
+    employee_ids, vectors, query = rows
+    order = np.array([5, 0, 3, 2, 4, 1])
+    assert _score_rows(employee_ids[order], vectors[order], query, SCORE_MAX, 0.05) == pytest.approx(
+        segment_scores(employee_ids, vectors, query, SCORE_MAX)
+    )
@@ -0,0 +1,139 @@
+"""
+Сборка графа связанности навыков, расширение запроса и хранение на диске
+"""
+import math
+import random
+from itertools import combinations
+
+import numpy as np
+import pytest
+
+from app.services import skill_graph
+from app.services.skill_graph import SkillGraph
+
+SKILL_LISTS = [
+    ["Python", "Django", "PostgreSQL"],
+    ["Python", "FastAPI", "PostgreSQL"],
+    ["python", "Django", "Docker"],
+    ["Go", "Docker", "Kubernetes"],
+    ["Go", "Kubernetes"],
+    ["Java", "Spring"],
+    ["Python", "Django", "Django"],
+]
+
+
+def _reference_weights(skill_lists, min_cooccurrence):
+    """Мера Отиаи по парам навыков, посчитанная в лоб"""
+    frequency, pairs = {}, {}
+    for skills in skill_lists:
+        keys = sorted({skill.lower() for skill in skills})
+        for key in keys:
+            frequency[key] = frequency.get(key, 0) + 1
+        for pair in combinations(keys, 2):
+            pairs[pair] = pairs.get(pair, 0) + 1
+    weights = {}
+    for (a, b), count in pairs.items():
+        if count >= min_cooccurrence:
+            weight = count / math.sqrt(frequency[a] * frequency[b])
+            weights[(a, b)] = weights[(b, a)] = weight
+    return weights
+
+
+def _edges(graph: SkillGraph) -> dict:
+    return {
+        (str(graph.names[row]).lower(), str(graph.names[column]).lower()): float(weight)
+        for row in range(len(graph.names))
+        for column, weight in zip(
+            graph.indices[graph.indptr[row]:graph.indptr[row + 1]].tolist(),
+            graph.weights[graph.indptr[row]:graph.indptr[row + 1]].tolist()
+        )
+    }
+
+
+@pytest.mark.parametrize("min_cooccurrence", [1, 2, 3])
+def test_ochiai_weights(min_cooccurrence):
+    graph = SkillGraph.build(SKILL_LISTS, neighbours=10, min_cooccurrence=min_cooccurrence)
+    reference = _reference_weights(SKILL_LISTS, min_cooccurrence)
+    edges = _edges(graph)
+    assert set(edges) == set(reference)
+    for pair, weight in reference.items():
+        assert edges[pair] == pytest.approx(weight, rel=1e-6)
+
+
+def test_names_keep_first_spelling():
+    graph = SkillGraph.build(SKILL_LISTS, neighbours=3, min_cooccurrence=1)
+    assert graph.names.tolist()[:3] == ["Python", "Django", "PostgreSQL"]
+    assert graph.neighbours("DJANGO")[0] == ("Python", pytest.approx(3 / math.sqrt(4 * 3)))
+
+
+def test_top_k_neighbours_sorted_by_weight(monkeypatch):
+    rng = random.Random(5)
+    vocabulary = [f"skill{number}" for number in range(12)]
+    skill_lists = [rng.sample(vocabulary, rng.randint(1, 6)) for _ in range(60)]
+    reference = _reference_weights(skill_lists, 1)
+
+    # Маленький блок: отбор соседей идет через границы блоков
+    monkeypatch.setattr(skill_graph, "BLOCK_SIZE", 5)
+    graph = SkillGraph.build(skill_lists, neighbours=3, min_cooccurrence=1)
+    for name in graph.names.tolist():
+        neighbours = graph.neighbours(name)
+        expected = sorted(
+            (weight for (a, _), weight in reference.items() if a == name.lower()),
+            reverse=True
+        )[:3]
+        assert [weight for _, weight in neighbours] == pytest.approx(expected, rel=1e-6)
+        assert name not in [neighbour for neighbour, _ in neighbours]
+
+
+def test_embedding_blend():
+    names = ["Python", "Django", "Rust"]
+    name_embeddings = np.array([[1.0, 0.0], [0.6, 0.8], [1.0, 0.0]])
+    graph = SkillGraph.build(
+        [["Python", "Django"], ["Python"]],
+        neighbours=5,
+        min_cooccurrence=1,
+        name_embeddings=name_embeddings,
+        embedding_weight=0.5,
+        names=names
+    )
+    neighbours = dict(graph.neighbours("Python"))
+    assert neighbours["Django"] == pytest.approx(0.5 * 1 / math.sqrt(2) + 0.5 * 0.6, rel=1e-6)
+    # Rust ни разу не встречался вместе с Python, но близок по названию
+    assert neighbours["Rust"] == pytest.approx(0.5, rel=1e-6)
+
+
+def test_expand_excludes_seeds_and_takes_max_weight():
+    graph = SkillGraph.build(SKILL_LISTS, neighbours=10, min_cooccurrence=1)
+    expanded = graph.expand(["python", "Docker"], limit=10)
+    names = [name for name, _ in expanded]
+    assert "Python" not in names and "Docker" not in names
+    weights = dict(expanded)
+    reference = _reference_weights(SKILL_LISTS, 1)
+    assert weights["Django"] == pytest.approx(
+        max(reference[("python", "django")], reference[("docker", "django")]), abs=1e-3
+    )
+    assert [weight for _, weight in expanded] == sorted(weights.values(), reverse=True)
+    assert graph.expand(["python", "Docker"], limit=2) == expanded[:2]
+    assert all(weight >= 0.5 for _, weight in graph.expand(["Python"], limit=10, min_weight=0.5))
+    assert graph.expand(["Haskell"], limit=5) == []
+    assert graph.expand(["Python"], limit=0) == []
+
+
+def test_empty_and_single_skill():
+    assert SkillGraph.build([], neighbours=5).edge_count == 0
+    graph = SkillGraph.build([["Python"]], neighbours=5, min_cooccurrence=1)
+    assert graph.neighbours("Python") == []
+
+
+def test_save_and_load_round_trip(tmp_path):
+    graph = SkillGraph.build(SKILL_LISTS, neighbours=2, min_cooccurrence=1)
+    path = str(tmp_path / "graphs" / "skill_graph.npz")
+    graph.save(path)
+    loaded = SkillGraph.load(path)
+    assert loaded.version == graph.version
+    assert loaded.names.tolist() == graph.names.tolist()
+    assert np.array_equal(loaded.indptr, graph.indptr)
+    assert np.array_equal(loaded.indices, graph.indices)
+    assert np.array_equal(loaded.weights, graph.weights)
+    assert loaded.expand(["Go"], limit=5) == graph.expand(["Go"], limit=5)
+    assert not (tmp_path / "graphs" / "skill_graph.npz.tmp").exists()
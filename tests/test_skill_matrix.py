@@ -0,0 +1,120 @@
+"""
+Инкрементальные частоты навыков и TF-IDF сходство матрицы навыков
+"""
+import math
+import random
+
+import numpy as np
+import pytest
+
+from app.services.skill_matrix import SkillMatrix
+
+SKILLS = ["Python", "Go", "SQL", "Kafka", "Rust", "Docker", "Git", "React"]
+
+
+def _reference_scores(skills_by_row, terms):
+    """Косинус TF-IDF векторов, посчитанный в лоб по спискам навыков"""
+    rows = [{skill.lower() for skill in skills} for skills in skills_by_row]
+    active = sum(1 for row in rows if row)
+    df = {}
+    for row in rows:
+        for key in row:
+            df[key] = df.get(key, 0) + 1
+    idf = {key: math.log((1 + active) / (1 + count)) + 1 for key, count in df.items()}
+    query = {term.lower(): idf[term.lower()] for term in terms if term.lower() in idf}
+    query_norm = math.sqrt(sum(weight ** 2 for weight in query.values()))
+    scores = []
+    for row in rows:
+        norm = math.sqrt(sum(idf[key] ** 2 for key in row))
+        dot = sum(idf[key] * query.get(key, 0.0) for key in row)
+        scores.append(dot / (norm * query_norm) if norm and query_norm else 0.0)
+    return np.array(scores)
+
+
+def _df(matrix: SkillMatrix) -> dict:
+    return {
+        key: int(matrix.document_frequency[column])
+        for key, column in matrix.vocabulary.items()
+        if matrix.document_frequency[column]
+    }
+
+
+def test_build_deduplicates_case_insensitively():
+    matrix = SkillMatrix([["Python", "python", "Go"], [], ["PYTHON"]])
+    assert len(matrix) == 3
+    assert matrix.names == ["Python", "Go"]
+    assert _df(matrix) == {"python": 2, "go": 1}
+    assert matrix.idf()[matrix.vocabulary["python"]] == pytest.approx(math.log(3 / 3) + 1)
+    assert matrix.idf()[matrix.vocabulary["go"]] == pytest.approx(math.log(3 / 2) + 1)
+
+
+def test_incremental_updates_match_fresh_build():
+    rng = random.Random(11)
+    skills_by_row = [rng.sample(SKILLS, rng.randint(0, 4)) for _ in range(30)]
+    matrix = SkillMatrix(skills_by_row)
+    for step in range(200):
+        row = rng.randrange(len(skills_by_row) + 1)
+        if row < len(skills_by_row) and rng.random() < 0.3:
+            matrix.clear_row(row)
+            skills_by_row[row] = []
+        else:
+            skills = rng.sample(SKILLS + ["Scala", "Elixir"], rng.randint(0, 4))
+            matrix.set_row(row, skills)
+            if row == len(skills_by_row):
+                skills_by_row.append(skills)
+            else:
+                skills_by_row[row] = skills
+        if step % 20 == 0:
+            matrix.score(["Go"])
+
+    fresh = SkillMatrix(skills_by_row)
+    assert _df(matrix) == _df(fresh)
+    idf = matrix.idf()
+    for key, column in fresh.vocabulary.items():
+        if fresh.document_frequency[column]:
+            assert idf[matrix.vocabulary[key]] == pytest.approx(fresh.idf()[column])
+    for terms in (["Python"], ["go", "Kafka"], ["Scala", "Rust", "Git"]):
+        assert matrix.score(terms) == pytest.approx(fresh.score(terms))
+        assert matrix.score(terms) == pytest.approx(_reference_scores(skills_by_row, terms))
+
+
+def test_score_selected_rows_and_unknown_terms():
+    skills_by_row = [["Python", "SQL"], ["Go"], ["Python", "Kafka", "Git"], []]
+    matrix = SkillMatrix(skills_by_row)
+    expected = _reference_scores(skills_by_row, ["python", "kafka"])
+    assert matrix.score(["python", "kafka"], rows=np.array([2, 0])) == pytest.approx(expected[[2, 0]])
+    assert matrix.score(["Haskell"]).tolist() == [0.0] * 4
+    assert matrix.score(["Python", "Haskell"]) == pytest.approx(_reference_scores(skills_by_row, ["Python"]))
+
+
+def test_frozen_matrix_is_not_changed_by_updates():
+    matrix = SkillMatrix([["Python"], ["Go"]])
+    frozen, query = matrix.frozen(["Python"])
+    before = (frozen @ query).tolist()
+    matrix.set_row(0, ["Go", "Zig"])
+    matrix.set_row(2, ["Python"])
+    assert (frozen @ query).tolist() == before
+    assert frozen.shape == (2, 2)
+    assert matrix.frozen(["Python"])[0].shape == (3, 3)
+
+
+def test_score_lists_matches_rows_in_matrix():
+    skills_by_row = [["Python", "SQL"], ["Go", "Kafka"], ["Python", "Git"], ["Rust"]]
+    matrix = SkillMatrix(skills_by_row)
+    assert matrix.score_lists(["Python", "Kafka"], skills_by_row) == pytest.approx(matrix.score(["Python", "Kafka"]))
+    # Неизвестный навык весит как встреченный ноль раз и уменьшает сходство
+    with_unknown, without = matrix.score_lists(["Python"], [["Python", "Zig"], ["Python"]])
+    unknown_weight = math.log(1 + 4) + 1
+    python_weight = matrix.idf()[matrix.vocabulary["python"]]
+    assert with_unknown == pytest.approx(python_weight / math.hypot(python_weight, unknown_weight))
+    assert without == pytest.approx(1.0)
+    assert matrix.score_lists(["Haskell"], [["Python"]]).tolist() == [0.0]
+    assert matrix.score_lists(["Python"], []).tolist() == []
+
+
+def test_top_skills():
+    matrix = SkillMatrix([["Git", "Python"], ["Git", "Go"], ["Git", "Python"], ["Rust"]])
+    assert [name for name, _, _ in matrix.top_skills(2)] == ["Git", "Python"]
+    assert [name for name, _, _ in matrix.top_skills(2, rare=True)] == ["Go", "Rust"]
+    matrix.clear_row(3)
+    assert "Rust" not in [name for name, _, _ in matrix.top_skills(10)]
@@ -0,0 +1,123 @@
+"""
+Разбор и вычисление языка запросов по навыкам
+"""
+import pytest
+
+from app.services.search_index import SearchIndex
+from app.services.skill_query import (
+    And,
+    Node,
+    Not,
+    Or,
+    Range,
+    SkillQuerySyntaxError,
+    Term,
+    parse_skill_query
+)
+
+
+@pytest.fixture
+def index():
+    return SearchIndex(
+        employee_ids=[10, 11, 12, 13, 14],
+        departments=["Backend", "Backend", "Data Science", None, "Frontend"],
+        experience_years=[1, 3, 5, 8, None],
+        levels=[1, 2, 3, 4, 1],
+        skills=[
+            ["Python", "Django"],
+            ["Go", "Kubernetes"],
+            ["Python", "Machine Learning"],
+            ["Java", "JavaScript", "Kubernetes"],
+            ["JavaScript", "React"]
+        ]
+    )
+
+
+def test_node_is_abstract():
+    with pytest.raises(TypeError):
+        Node()
+
+
+@pytest.mark.parametrize("query, expected", [
+    # AND сильнее OR, NOT сильнее AND
+    ("a OR b AND c", "(skill:'a' OR (skill:'b' AND skill:'c'))"),
+    ("a AND b OR c", "((skill:'a' AND skill:'b') OR skill:'c')"),
+    ("NOT a b", "(NOT skill:'a' AND skill:'b')"),
+    ("(a OR b) c", "((skill:'a' OR skill:'b') AND skill:'c')"),
+    ("a || b && !c", "(skill:'a' OR (skill:'b' AND NOT skill:'c'))"),
+    ("a ИЛИ b И НЕ c", "(skill:'a' OR (skill:'b' AND NOT skill:'c'))"),
+    ('"Machine Learning" dept:"Data Science"', "(skill:'Machine Learning' AND department:'Data Science')"),
+    ("1C:Предприятие", "skill:'1C:Предприятие'"),
+])
+def test_precedence(query, expected):
+    assert repr(parse_skill_query(query)) == expected
+
+
+@pytest.mark.parametrize("query, low, high", [
+    ("exp:3", 3, 3),
+    ("exp:3..7", 3, 7),
+    ("exp:3-7", 3, 7),
+    ("exp:3+", 3, None),
+    ("exp>=3", 3, None),
+    ("exp>3", 4, None),
+    ("стаж<=5", None, 5),
+    ("exp<5", None, 4),
+])
+def test_experience_ranges(query, low, high):
+    node = parse_skill_query(query)
+    assert isinstance(node, Range)
+    assert (node.low, node.high) == (low, high)
+
+
+@pytest.mark.parametrize("query", [
+    "",
+    "   ",
+    "(python",
+    "python)",
+    "python AND",
+    "AND python",
+    "NOT",
+    "exp:много",
+    "exp>=три",
+    "grade>senior",
+    "()",
+])
+def test_syntax_errors(query):
+    with pytest.raises(SkillQuerySyntaxError):
+        parse_skill_query(query)
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("python", {10, 12}),
+    ("PYTHON", {10, 12}),
+    ("(Python OR Go) AND NOT Django", {11, 12}),
+    ("kubernetes NOT go", {13}),
+    ("Java*", {13, 14}),
+    ('dept:"Data Science"', {12}),
+    ('dept:"Не указан"', {13}),
+    ("exp:3..5", {11, 12}),
+    ("exp>=5 kubernetes", {13}),
+    ("grade:senior", {12}),
+    ("level:1", {10, 14}),
+    ("NOT python", {11, 13, 14}),
+    ("Rust", set()),
+])
+def test_evaluate(index, query, expected):
+    assert set(index.ids_for_bitmap(parse_skill_query(query).evaluate(index))) == expected
+
+
+def test_evaluate_follows_index_updates(index):
+    node = parse_skill_query("python AND NOT django")
+    index.upsert(15, "Backend", 2, 1, ["Python"])
+    index.remove(12)
+    assert set(index.ids_for_bitmap(node.evaluate(index))) == {15}
+
+
+def test_positive_terms_skip_negations():
+    node = parse_skill_query("(Python OR Go*) AND NOT Django AND exp>=3")
+    assert node.positive_terms() == ["Python", "Go"]
+
+
+def test_tree_nodes_build_directly():
+    node = And([Or([Term("skill", "a"), Term("skill", "b")]), Not(Range(1, None))])
+    assert repr(node) == "((skill:'a' OR skill:'b') AND NOT exp:1..None)"
@@ -0,0 +1,75 @@
+"""
+Поиск по индексу симметричного удаления и расстояние Дамерау-Левенштейна
+"""
+import pytest
+
+from app.services.spell_correction import SymSpellIndex, edit_distance
+
+WORDS = ["python", "django", "kubernetes", "postgresql", "java", "javascript", "react", "kafka", "sql"]
+
+
+@pytest.fixture
+def index():
+    return SymSpellIndex(WORDS, max_distance=2, prefix_length=7, known=["senior", "и"])
+
+
+@pytest.mark.parametrize("source, target, limit, expected", [
+    ("python", "python", 2, 0),
+    ("pyhton", "python", 2, 1),
+    ("pythn", "python", 2, 1),
+    ("pytohn", "python", 2, 1),
+    ("ptyhon", "python", 2, 1),
+    ("pthn", "python", 2, 2),
+    ("pthn", "python", 1, 2),
+    ("go", "python", 2, 3),
+    ("", "sql", 3, 3),
+])
+def test_edit_distance(source, target, limit, expected):
+    assert edit_distance(source, target, limit) == expected
+
+
+@pytest.mark.parametrize("token, expected", [
+    ("pyhton", "python"),
+    ("djnago", "django"),
+    ("kubernets", "kubernetes"),
+    ("kubrnets", "kubernetes"),
+    ("postgersql", "postgresql"),
+    ("reakt", "react"),
+    ("kafak", "kafka"),
+])
+def test_lookup_corrects_typos(index, token, expected):
+    assert index.lookup(token) == expected
+
+
+@pytest.mark.parametrize("token", [
+    "python",   # уже в словаре
+    "senior",   # известное слово вне словаря
+    "sq",       # короткий токен
+    "jav",      # короткий токен
+    "pyth0n",   # токен с цифрами
+    "1c",
+    "haskell",  # ничего близкого
+    "rxacx",    # для слов до 5 символов - не больше одной правки
+])
+def test_lookup_returns_none(index, token):
+    assert index.lookup(token) is None
+
+
+def test_lookup_prefers_frequent_word_on_tie():
+    index = SymSpellIndex(["kotlin", "kotlon", "kotlin"], max_distance=2, prefix_length=7)
+    assert index.lookup("kotlan") == "kotlin"
+
+
+def test_lookup_breaks_full_tie_alphabetically():
+    index = SymSpellIndex(["rusta", "rustb"], max_distance=2, prefix_length=7)
+    assert index.lookup("rustc") == "rusta"
+
+
+def test_lookup_beyond_prefix(index):
+    # Правка после префикса находится по кандидатам префикса
+    index = SymSpellIndex(WORDS, max_distance=2, prefix_length=4)
+    assert index.lookup("javascrpit") == "javascript"
+
+
+def test_correct_keeps_untouched_text(index):
+    assert index.correct("Pyhton и djnago, senior") == "python и django, senior"